@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Message retention benchmark.
+
+Holds a steady-state message list of N retained messages (one per simulated
+second, retention window N seconds) and times the retention step of each
+save - one new message appended, one expired - for the previous full-scan
+prune (strptime every message, sort, trim) and for
+core.retention.RetentionIndex. The index cost should stay flat as N grows.
+
+Usage:
+    python benchmarks/bench_retention.py [--sizes 500,2000,10000,50000] [--saves 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.retention import RetentionIndex  # noqa: E402
+
+START = 1_700_000_000
+
+
+def make_message(i: int) -> dict:
+    return {
+        'id': f'm{i}',
+        'text': f'БПЛА курсом на місто {i % 97}',
+        'date': datetime.fromtimestamp(START + i).strftime('%Y-%m-%d %H:%M:%S'),
+        'lat': 50.45, 'lng': 30.52,
+    }
+
+
+def full_scan_prune(data: list, now: float, retention_minutes: int, max_count: int) -> list:
+    """The pre-index algorithm: parse every date, then sort and trim by count."""
+    if retention_minutes > 0:
+        cutoff = datetime.fromtimestamp(now) - timedelta(minutes=retention_minutes)
+        pruned = []
+        for m in data:
+            if m.get('manual'):
+                pruned.append(m)
+                continue
+            try:
+                dt = datetime.strptime(m.get('date', ''), '%Y-%m-%d %H:%M:%S')
+            except Exception:
+                pruned.append(m)
+                continue
+            if dt >= cutoff:
+                pruned.append(m)
+        data = pruned
+    if max_count > 0 and len(data) > max_count:
+        manual_items = [m for m in data if m.get('manual')]
+        auto_items = [m for m in data if not m.get('manual')]
+        allow_auto = max(0, max_count - len(manual_items))
+        if len(auto_items) > allow_auto:
+            auto_items = sorted(auto_items, key=lambda x: x.get('date', ''))[-allow_auto:]
+        data = sorted(manual_items + auto_items, key=lambda x: x.get('date', ''))
+    return data
+
+
+def run(size: int, saves: int, prune) -> tuple[list[float], int]:
+    data = [make_message(i) for i in range(size)]
+    latencies = []
+    for step in range(saves):
+        i = size + step
+        data = data + [make_message(i)]
+        now = START + i
+        t0 = time.perf_counter()
+        data = prune(data, now)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, len(data)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='500,2000,10000,50000', help='comma-separated retained sizes')
+    parser.add_argument('--saves', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'retained':>9} {'full-scan p50':>14} {'index p50':>10} {'index p99':>10} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        # Window of `size` seconds at one message per second, count cap just above it
+        minutes = size // 60
+        window = minutes * 60
+        cap = size + 10
+
+        legacy, legacy_len = run(size, args.saves,
+                                 lambda data, now: full_scan_prune(data, now, minutes, cap))
+
+        clock = [0.0]
+        index = RetentionIndex(retention_seconds=window, max_count=cap, clock=lambda: clock[0])
+        index.prune([make_message(i) for i in range(size)])  # warm: first save indexes the file
+
+        def incremental(data, now):
+            clock[0] = now
+            return index.prune(data)
+
+        fast, fast_len = run(size, args.saves, incremental)
+        if legacy_len != fast_len:
+            print(f"mismatch at {size}: full-scan kept {legacy_len}, index kept {fast_len}")
+            return 1
+
+        fast.sort()
+        legacy_p50 = statistics.median(legacy) * 1e6
+        fast_p50 = statistics.median(fast) * 1e6
+        fast_p99 = fast[int(len(fast) * 0.99) - 1] * 1e6
+        print(f"{size:>9} {legacy_p50:>12.0f}us {fast_p50:>8.1f}us {fast_p99:>8.1f}us "
+              f"{legacy_p50 / max(fast_p50, 1e-9):>7.0f}x")
+
+    print(f"index stats (last run): {index.stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Startup-time benchmark.
+
+Imports app.py in fresh interpreters and reports:
+  - module import time (what blocks the worker before it can serve)
+  - background warm-up time and per-component init timings (STARTUP registry)
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--no-warm]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+warm = None
+if WARM:
+    t1 = time.perf_counter()
+    app.STARTUP.warm_all()
+    warm = time.perf_counter() - t1
+print('@@' + json.dumps({'import_s': t_import, 'warm_s': warm, 'report': app.STARTUP.report()}))
+"""
+
+
+def run_once(warm: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault('STARTUP_WARM_DELAY', '3600')  # keep the background warm-up out of the import measurement
+    env.setdefault('SNAPSHOTS_ENABLED', '0')
+    code = PROBE.replace('WARM', 'True' if warm else 'False')
+    proc = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=600,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith('@@'):
+            return json.loads(line[2:])
+    raise RuntimeError(f"probe failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-warm', action='store_true', help='measure import only')
+    args = parser.parse_args()
+
+    results = [run_once(not args.no_warm) for _ in range(args.runs)]
+    imports = [r['import_s'] * 1000 for r in results]
+    print(f"import app: median {statistics.median(imports):.0f} ms  "
+          f"min {min(imports):.0f} ms  max {max(imports):.0f} ms  ({args.runs} runs)")
+    if not args.no_warm:
+        warms = [r['warm_s'] * 1000 for r in results]
+        print(f"warm_all:   median {statistics.median(warms):.0f} ms")
+        per_component: dict = {}
+        for r in results:
+            for comp in r['report']['components']:
+                if comp['duration_ms'] is not None:
+                    per_component.setdefault(comp['name'], []).append(comp['duration_ms'])
+        print("\ncomponent                    median ms")
+        for name, values in sorted(per_component.items(), key=lambda kv: -statistics.median(kv[1])):
+            print(f"  {name:<26} {statistics.median(values):>9.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
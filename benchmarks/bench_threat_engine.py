@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Threat engine ingest benchmark.
+
+Feeds a synthetic stream of channel reports (drones, missiles, KAB and
+ballistic over the main Ukrainian cities, several channels reposting the
+same groups) into core.threat_engine.ThreatEngine on a simulated clock and
+reports ingest throughput, per-report latency percentiles, correlation rate
+and the bounded index sizes.
+
+Usage:
+    python benchmarks/bench_threat_engine.py [--rate 3000] [--minutes 60] [--seed 1]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.threat_engine import ThreatEngine  # noqa: E402
+
+CITIES = [
+    ('Київщина', 50.45, 30.52), ('Харківщина', 49.99, 36.23), ('Одещина', 46.48, 30.72),
+    ('Дніпропетровщина', 48.46, 35.05), ('Львівщина', 49.84, 24.03), ('Запоріжжя', 47.84, 35.14),
+    ('Миколаївщина', 46.97, 31.99), ('Полтавщина', 49.59, 34.55), ('Сумщина', 50.91, 34.80),
+    ('Чернігівщина', 51.49, 31.29), ('Херсонщина', 46.64, 32.62), ('Вінниччина', 49.23, 28.47),
+]
+TEMPLATES = [
+    '{n}х БПЛА курсом на {city}',
+    'Шахеди в районі {city}',
+    'Крилаті ракети курсом на {city}',
+    'КАБ на {city}',
+    'Загроза балістики! {city}',
+    'Збито {n} БПЛА над {city}',
+]
+CHANNELS = [f'channel_{i}' for i in range(8)]
+
+
+def make_stream(rate_per_min: int, minutes: int, seed: int):
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    total = rate_per_min * minutes
+    step = 60.0 / rate_per_min
+    for i in range(total):
+        region, lat, lng = rng.choice(CITIES)
+        template = rng.choice(TEMPLATES)
+        yield start + i * step, {
+            'id': f'm{i}',
+            'channel': rng.choice(CHANNELS),
+            'text': template.format(n=rng.randint(1, 12), city=region),
+            'lat': lat + rng.uniform(-0.4, 0.4),
+            'lng': lng + rng.uniform(-0.4, 0.4),
+            'region': region,
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=int, default=3000, help='reports per simulated minute')
+    parser.add_argument('--minutes', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    clock = [0.0]
+    engine = ThreatEngine(clock=lambda: clock[0])
+    latencies = []
+    wall = time.perf_counter()
+    for ts, msg in make_stream(args.rate, args.minutes, args.seed):
+        clock[0] = ts
+        t0 = time.perf_counter()
+        engine.ingest(msg, ts=ts)
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - wall
+
+    latencies.sort()
+    n = len(latencies)
+    stats = engine.stats()
+    print(f"reports: {n} ({args.rate}/min for {args.minutes} simulated min)")
+    print(f"wall: {wall:.2f} s  throughput: {n / wall:,.0f} reports/s")
+    print(f"latency: p50 {latencies[n // 2] * 1e6:.1f} us  p99 {latencies[int(n * 0.99)] * 1e6:.1f} us  "
+          f"max {latencies[-1] * 1e6:.1f} us  mean {statistics.fmean(latencies) * 1e6:.1f} us")
+    print(f"correlated: {stats['correlated']} / {stats['reports']}  "
+          f"tracks: {stats['tracks']}  expired: {stats['expired']}")
+    print(f"index: messages {stats['messages_indexed']}  cells {stats['grid_cells']}  "
+          f"regions {stats['region_keys']}  heap {stats['heap_entries']}")
+    t0 = time.perf_counter()
+    events = engine.active_events()
+    summary = engine.summary()
+    print(f"read: active_events ({len(events)}) + summary in {(time.perf_counter() - t0) * 1000:.2f} ms; "
+          f"types {sorted(summary['by_type'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""JSON vs compact MessagePack wire format benchmark.
+
+Builds synthetic payloads shaped like /data (markers with message text),
+/api/events and /api/alarms/all, encodes each as JSON (the way the endpoints
+do) and with core.wire, and reports body sizes (raw and gzip) and encode
+latency. Uses the msgpack package when installed, the built-in packer
+otherwise (shown in the header).
+
+Each body is also decoded and checked against its JSON: every field must come
+back with the same value (coordinates to 1e-5 degree, times as epoch
+seconds), and only SERVER_ONLY fields may be missing. A failed check is
+printed and the exit status is 1.
+
+Usage:
+    python benchmarks/bench_wire.py [--markers 400] [--events 100] [--regions 60] [--repeat 50]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import wire  # noqa: E402
+
+PLACES = [
+    ('Київ', 50.4501, 30.5234), ('Харків', 49.9935, 36.2304), ('Одеса', 46.4825, 30.7233),
+    ('Дніпро', 48.4647, 35.0462), ('Львів', 49.8397, 24.0297), ('Запоріжжя', 47.8388, 35.1396),
+    ('Миколаїв', 46.9750, 31.9946), ('Полтава', 49.5883, 34.5514), ('Суми', 50.9077, 34.7981),
+    ('Чернігів', 51.4982, 31.2893), ('Херсон', 46.6354, 32.6169), ('Вінниця', 49.2331, 28.4682),
+]
+THREATS = ['shahed', 'raketa', 'kab', 'avia', 'pvo', 'artillery']
+TEXTS = [
+    '{n}х БПЛА курсом на {place}. Будьте уважні!',
+    'Шахеди в районі {place}, рухаються на захід',
+    'Крилаті ракети курсом на {place}',
+    'Загроза застосування КАБ: {place} та околиці',
+]
+DIRECTIONS = ['північ', 'південь', 'схід', 'захід', 'північний схід', 'південний захід']
+# Fields the map and admin clients never read; they are allowed to be left off the wire
+SERVER_ONLY = {'source_match'}
+
+
+def make_payloads(markers: int, events: int, regions: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    tracks = []
+    for i in range(markers):
+        place, lat, lng = rng.choice(PLACES)
+        threat = rng.choice(THREATS)
+        tracks.append({
+            'id': f'{rng.randint(100000, 999999)}_{i % 3}',
+            'text': rng.choice(TEXTS).format(n=rng.randint(1, 12), place=place),
+            'date': f'2026-10-19 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}',
+            'channel': f'channel_{rng.randint(0, 7)}',
+            'lat': round(lat + rng.uniform(-0.4, 0.4), 6),
+            'lng': round(lng + rng.uniform(-0.4, 0.4), 6),
+            'place': place,
+            'threat_type': threat,
+            'count': rng.randint(1, 12),
+            'marker_icon': f'{threat}.png',
+            'source_match': 'city_parse',
+        })
+        if rng.random() < 0.4:
+            target = rng.choice(PLACES)[0]
+            tracks[-1].update({
+                'course_direction': f'на {target}',
+                'course_source': place,
+                'course_target': target,
+                'course_type': rng.choice(['to_target', 'directional']),
+                'course_bearing': round(rng.uniform(0, 360), 1),
+            })
+        elif rng.random() < 0.05:
+            tracks[-1].update({'manual': True, 'rotation': rng.randint(0, 359),
+                               'course_direction': rng.choice(DIRECTIONS)})
+    event_list = [{
+        'timestamp': f'2026-10-19T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00',
+        'channel': 'air_alert_ua',
+        'emoji': rng.choice(['🔴', '🟢']),
+        'region': rng.choice(PLACES)[0] + 'ська область',
+        'status': rng.choice(['Повітряна тривога', 'Відбій тривоги']),
+        'text': 'Повітряна тривога в ' + rng.choice(PLACES)[0],
+    } for _ in range(events)]
+    alarms = [{
+        'regionId': str(1000 + i),
+        'regionName': f'{rng.choice(PLACES)[0]} громада {i}',
+        'regionType': rng.choice(['State', 'District', 'Community']),
+        'activeAlerts': [{'regionId': str(1000 + i), 'type': 'AIR',
+                          'lastUpdate': '2026-10-19T10:15:00Z'}],
+    } for i in range(regions)]
+    data = {
+        'tracks': tracks,
+        'events': event_list[:50],
+        'all_sources': [f'channel_{i}' for i in range(8)],
+        '_meta': {'tracks_total': markers, 'tracks_returned': markers, 'tracks_truncated': False,
+                  'events_total': events, 'events_returned': min(events, 50), 'events_truncated': False,
+                  'time_range_minutes': 50},
+    }
+    return {'data': data, 'events': event_list, 'alarms': alarms}
+
+
+def _expected(kind: str, value):
+    if kind == 'time':
+        return wire.epoch_seconds(value)
+    if kind == 'coord':
+        return wire.fixed_point(value) / wire.COORD_SCALE
+    return value
+
+
+def _check_items(label: str, schema, sent: list, received: list) -> list[str]:
+    problems = []
+    if len(sent) != len(received):
+        return [f'{label}: {len(sent)} items sent, {len(received)} decoded']
+    kinds = {field: kind for _, field, kind in schema.fields}
+    for i, (item, packed) in enumerate(zip(sent, received)):
+        back = schema.decode(packed)
+        for field, value in item.items():
+            if field not in kinds:
+                if field not in SERVER_ONLY:
+                    problems.append(f'{label}[{i}].{field}: not in the {schema.name} schema')
+                continue
+            if value in (None, '', False, []):
+                continue
+            if back.get(field) != _expected(kinds[field], value):
+                problems.append(f'{label}[{i}].{field}: sent {value!r}, decoded {back.get(field)!r}')
+    return problems
+
+
+def round_trip(document, payload, body: bytes) -> list[str]:
+    """Decode ``body`` and compare it field by field with ``payload``; returns the mismatches."""
+    decoded = wire.unpackb(body)
+    if decoded.get(0) != wire.SCHEMA_VERSION:
+        return [f'{document.name}: schema version {decoded.get(0)!r}']
+    if document.root_list is not None:
+        return _check_items(document.name, document.root_list, payload, decoded.get(1, []))
+    problems = []
+    for tag, key, schema in document.parts:
+        value = payload.get(key)
+        if value is None:
+            continue
+        label = f'{document.name}.{key}'
+        if schema is None:
+            if decoded.get(tag) != value:
+                problems.append(f'{label}: value changed on the wire')
+        elif isinstance(value, list):
+            problems += _check_items(label, schema, value, decoded.get(tag, []))
+        else:
+            problems += _check_items(label, schema, [value], [decoded.get(tag, {})])
+    return problems
+
+
+def timed(fn, repeat: int) -> tuple[bytes, float]:
+    samples = []
+    body = b''
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        body = fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return body, samples[len(samples) // 2]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--markers', type=int, default=400)
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--regions', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.markers, args.events, args.regions, args.seed)
+    packer = 'msgpack' if wire.msgpack is not None else 'built-in packer'
+    print(f"encoder: {packer}; {args.markers} markers, {args.events} events, {args.regions} alarm regions")
+    print(f"{'document':<8} {'json':>9} {'json.gz':>9} {'mp':>9} {'mp.gz':>9} {'ratio':>6} {'ratio.gz':>8}"
+          f" {'json ms':>8} {'mp ms':>7}")
+    problems = []
+    for name, payload in payloads.items():
+        document = wire.DOCUMENTS[name]
+        as_json, json_t = timed(lambda: json.dumps(payload, separators=(',', ':')).encode('utf-8'), args.repeat)
+        as_mp, mp_t = timed(lambda: wire.encode(document, payload), args.repeat)
+        json_gz = len(gzip.compress(as_json, 6))
+        mp_gz = len(gzip.compress(as_mp, 6))
+        print(f"{name:<8} {len(as_json):>9,} {json_gz:>9,} {len(as_mp):>9,} {mp_gz:>9,} "
+              f"{len(as_mp) / len(as_json):>6.2f} {mp_gz / json_gz:>8.2f} {json_t * 1000:>8.2f} {mp_t * 1000:>7.2f}")
+        problems += round_trip(document, payload, as_mp)
+    if problems:
+        print(f"round trip: {len(problems)} mismatches")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        return 1
+    print("round trip: ok")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
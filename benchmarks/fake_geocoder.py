@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""Offline stand-in for the geocoding, AI and air-alarm providers.
+
+Answers OpenCage, Nominatim, Photon and Groq chat-completion requests from
+the recorded geocoder caches (geocode_cache.json, nominatim_cache.json,
+opencage_cache.json when present), so ingest can be load-tested without
+network access, rate limits or changing results. Unknown places get an empty
+result, as do places recorded only in negative_geocode_cache.json. The
+ukrainealarm ``/alerts`` endpoint returns oblast alarms that change every
+``--alarm-period`` seconds (deterministic per period).
+
+Provider behaviour can be injected:
+  --latency/--jitter   response delay in ms (seeded, so runs are reproducible)
+  --error-rate         fraction of 503 responses
+  --hang-rate          fraction of requests held for --hang seconds (client timeouts)
+  --rate-limit         requests/s per provider before 429
+  --quota              OpenCage requests before 402 (daily quota exceeded)
+
+Point the app at it with the base-URL overrides printed on start:
+  OPENCAGE_URL, NOMINATIM_URL, PHOTON_URL, GROQ_BASE_URL, ALARM_API_BASE
+(set OPENCAGE_API_KEY / GROQ_API_KEY to any value to enable those paths).
+GET /_stats returns per-provider counters, POST /_reset clears them.
+
+Usage:
+    python benchmarks/fake_geocoder.py [--port 8089] [--latency 150] [--jitter 50] [--error-rate 0.01]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.geometry import OBLAST_NAMES  # noqa: E402
+
+CACHE_FILES = ('geocode_cache.json', 'nominatim_cache.json', 'opencage_cache.json')
+NEGATIVE_FILES = ('negative_geocode_cache.json',)
+PROVIDERS = ('opencage', 'nominatim', 'photon', 'groq', 'alerts')
+_COUNTRY = frozenset({'ukraine', 'україна', 'ua'})
+_APOSTROPHES = str.maketrans({'’': "'", 'ʼ': "'", '`': "'", '‘': "'"})
+
+
+def _name(text: str) -> str:
+    return ' '.join(text.lower().translate(_APOSTROPHES).split())
+
+
+def _region_stem(text: Optional[str]) -> str:
+    """'Харківська область' / 'харківська обл.' / 'харківська' -> 'харківська'."""
+    words = _name(text or '').replace('обл.', ' ').split()
+    words = [w for w in words if w not in ('область', 'обл')]
+    return words[0] if words else ''
+
+
+class Gazetteer:
+    """Recorded coordinates keyed by (place, region stem); region '' is the place without context."""
+
+    def __init__(self) -> None:
+        self._places: dict[tuple[str, str], tuple[float, float]] = {}
+        self._by_place: dict[str, list[str]] = {}
+        self._negative: set[str] = set()
+
+    def load(self, path: str, negative: bool = False) -> int:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        count = 0
+        for key, value in (data.items() if isinstance(data, dict) else ()):
+            place, _, region = key.partition('|')
+            place, region = _name(place), _region_stem(region)
+            coords = value.get('coords') if isinstance(value, dict) else value
+            if negative or not coords:
+                self._negative.add(place)
+                continue
+            if (place, region) not in self._places:
+                self._places[(place, region)] = (float(coords[0]), float(coords[1]))
+                self._by_place.setdefault(place, []).append(region)
+                count += 1
+        return count
+
+    def lookup(self, query: str) -> list[tuple[str, str, float, float]]:
+        """Matches for a free-text query ('Лозова, Харківська область, Україна'), best first."""
+        parts = [_name(p) for p in query.split(',') if p.strip()]
+        parts = [p for p in parts if p not in _COUNTRY]
+        if not parts or (parts[0] in self._negative and parts[0] not in self._by_place):
+            return []
+        place = parts[0]
+        region = _region_stem(parts[1]) if len(parts) > 1 else ''
+        regions = self._by_place.get(place, [])
+        ordered = sorted(regions, key=lambda r: (r != region, r != '', r))
+        return [(place, r, *self._places[(place, r)]) for r in ordered]
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+
+class Faults:
+    """Seeded latency/error/rate-limit injection shared by all handler threads."""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, hang_rate: float,
+                 hang_seconds: float, rate_limit: float, quota: int, seed: int) -> None:
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.rate_limit = rate_limit
+        self.quota = quota
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}   # provider -> (tokens, last refill)
+        self.stats = {}
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self.stats = {p: {'requests': 0, 'hits': 0, 'misses': 0, 'errors': 0, 'hangs': 0,
+                              'rate_limited': 0, 'quota_exceeded': 0} for p in PROVIDERS}
+
+    def decide(self, provider: str) -> tuple[float, Optional[int]]:
+        """(delay seconds, forced status or None) for one request."""
+        with self._lock:
+            stats = self.stats[provider]
+            stats['requests'] += 1
+            roll = self._rng.random()
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            if self.rate_limit > 0:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(provider, (self.rate_limit, now))
+                tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+                if tokens < 1:
+                    self._buckets[provider] = (tokens, now)
+                    stats['rate_limited'] += 1
+                    return delay, 429
+                self._buckets[provider] = (tokens - 1, now)
+            if provider == 'opencage' and self.quota and stats['requests'] > self.quota:
+                stats['quota_exceeded'] += 1
+                return delay, 402
+            if roll < self.hang_rate:
+                stats['hangs'] += 1
+                return self.hang_seconds, None
+            if roll < self.hang_rate + self.error_rate:
+                stats['errors'] += 1
+                return delay, 503
+            return delay, None
+
+    def count(self, provider: str, hit: bool) -> None:
+        with self._lock:
+            self.stats[provider]['hits' if hit else 'misses'] += 1
+
+
+# ----- Provider response shapes -----
+def _state(region: str) -> Optional[str]:
+    return f'{region.capitalize()} область' if region else None
+
+
+def opencage_body(matches, limit: int) -> dict:
+    results = [{
+        'geometry': {'lat': lat, 'lng': lng},
+        'components': {k: v for k, v in {'_type': 'city', 'city': place.capitalize(), 'state': _state(region),
+                                          'country': 'Україна', 'country_code': 'ua'}.items() if v},
+        'formatted': ', '.join(p for p in (place.capitalize(), _state(region), 'Україна') if p),
+        'confidence': 7,
+    } for place, region, lat, lng in matches[:limit]]
+    return {'results': results, 'total_results': len(results), 'status': {'code': 200, 'message': 'OK'}}
+
+
+def nominatim_body(matches, limit: int) -> list:
+    return [{
+        'lat': f'{lat:.7f}', 'lon': f'{lng:.7f}', 'class': 'place', 'type': 'town', 'importance': 0.5,
+        'display_name': ', '.join(p for p in (place.capitalize(), _state(region), 'Україна') if p),
+        'address': {k: v for k, v in {'town': place.capitalize(), 'state': _state(region),
+                                      'country': 'Україна', 'country_code': 'ua'}.items() if v},
+    } for place, region, lat, lng in matches[:limit]]
+
+
+def photon_body(matches, limit: int) -> dict:
+    return {'type': 'FeatureCollection', 'features': [{
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+        'properties': {k: v for k, v in {'name': place.capitalize(), 'state': _state(region), 'country': 'Україна',
+                                         'countrycode': 'UA', 'osm_key': 'place', 'osm_value': 'town',
+                                         'type': 'city'}.items() if v},
+    } for place, region, lat, lng in matches[:limit]]}
+
+
+def groq_body(model: str) -> dict:
+    # Deterministic "no hint" answer: the app parses the JSON and falls back to its own logic
+    content = json.dumps({'city': None, 'region': None, 'raion': None, 'query': None, 'confidence': 0})
+    return {
+        'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+    }
+
+
+def alerts_body(period: float) -> list:
+    """About a third of the oblasts under an air alarm, reshuffled every ``period`` seconds."""
+    bucket = int(time.time() // period) if period > 0 else 0
+    started = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(bucket * period))
+    out = []
+    for region_id, name in sorted(OBLAST_NAMES.items(), key=lambda kv: int(kv[0])):
+        if int(hashlib.md5(f'{region_id}:{bucket}'.encode()).hexdigest()[:4], 16) % 3:
+            continue
+        out.append({'regionId': region_id, 'regionName': name, 'regionType': 'State', 'activeAlerts': [
+            {'regionId': region_id, 'regionType': 'State', 'type': 'AIR', 'lastUpdate': started}]})
+    return out
+
+
+def _provider(path: str) -> Optional[str]:
+    path = path.rstrip('/')
+    if path.endswith('/geocode/v1/json'):
+        return 'opencage'
+    if path.endswith('/search'):
+        return 'nominatim'
+    if path.endswith('/api'):
+        return 'photon'
+    if path.endswith('/chat/completions'):
+        return 'groq'
+    if path.endswith('/alerts'):
+        return 'alerts'
+    return None
+
+
+def make_handler(gazetteer: Gazetteer, faults: Faults, verbose: bool = False, alarm_period: float = 60.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, fmt, *args):
+            if verbose:
+                super().log_message(fmt, *args)
+
+        def _send(self, status: int, payload, headers: Optional[dict] = None) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _serve(self, provider: str, params: dict, model: str = '') -> None:
+            delay, forced = faults.decide(provider)
+            if delay:
+                time.sleep(delay)
+            if forced == 429:
+                return self._send(429, {'error': 'rate limited'}, {'Retry-After': '1'})
+            if forced is not None:
+                return self._send(forced, {'status': {'code': forced, 'message': 'injected failure'}})
+            if provider == 'groq':
+                faults.count(provider, True)
+                return self._send(200, groq_body(model))
+            if provider == 'alerts':
+                faults.count(provider, True)
+                return self._send(200, alerts_body(alarm_period))
+            query = (params.get('q') or [''])[0]
+            limit = int((params.get('limit') or ['5'])[0] or 5)
+            matches = gazetteer.lookup(query)
+            faults.count(provider, bool(matches))
+            if provider == 'opencage':
+                return self._send(200, opencage_body(matches, limit))
+            if provider == 'nominatim':
+                return self._send(200, nominatim_body(matches, limit))
+            return self._send(200, photon_body(matches, limit))
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/_stats':
+                return self._send(200, {'places': len(gazetteer), 'providers': faults.stats})
+            provider = _provider(url.path)
+            if provider is None or provider == 'groq':
+                return self._send(404, {'error': 'unknown endpoint'})
+            self._serve(provider, parse_qs(url.query))
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            if url.path == '/_reset':
+                faults.reset()
+                return self._send(200, {'ok': True})
+            if _provider(url.path) != 'groq':
+                return self._send(404, {'error': 'unknown endpoint'})
+            try:
+                model = json.loads(raw or b'{}').get('model', '')
+            except ValueError:
+                model = ''
+            self._serve('groq', {}, model)
+
+    return Handler
+
+
+def serve(host: str = '127.0.0.1', port: int = 8089, caches: Optional[list] = None, verbose: bool = False,
+          alarm_period: float = 60.0, **fault_options) -> ThreadingHTTPServer:
+    """Build the server (not started); ``fault_options`` are the :class:`Faults` arguments."""
+    gazetteer = Gazetteer()
+    for path in caches if caches is not None else [os.path.join(ROOT, n) for n in CACHE_FILES]:
+        if os.path.exists(path):
+            gazetteer.load(path)
+    for name in NEGATIVE_FILES:
+        path = os.path.join(ROOT, name)
+        if os.path.exists(path):
+            gazetteer.load(path, negative=True)
+    options = {'latency_ms': 0.0, 'jitter_ms': 0.0, 'error_rate': 0.0, 'hang_rate': 0.0, 'hang_seconds': 10.0,
+               'rate_limit': 0.0, 'quota': 0, 'seed': 1}
+    options.update(fault_options)
+    server = ThreadingHTTPServer((host, port), make_handler(gazetteer, Faults(**options), verbose, alarm_period))
+    server.daemon_threads = True
+    server.gazetteer = gazetteer
+    return server
+
+
+def env_for(base: str) -> dict:
+    """Environment that points the app's providers at a stand-in at ``base`` (http://host:port)."""
+    return {
+        'OPENCAGE_URL': f'{base}/geocode/v1/json',
+        'NOMINATIM_URL': f'{base}/search',
+        'PHOTON_URL': f'{base}/api/',
+        'GROQ_BASE_URL': base,
+        'ALARM_API_BASE': base,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--cache', action='append', help='recorded cache file (repeatable; default: repo caches)')
+    parser.add_argument('--latency', type=float, default=0.0, help='mean response delay, ms')
+    parser.add_argument('--jitter', type=float, default=0.0, help='delay standard deviation, ms')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    parser.add_argument('--hang', type=float, default=10.0, help='seconds a hung request is held')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests/s per provider (0 = off)')
+    parser.add_argument('--quota', type=int, default=0, help='OpenCage requests before 402 (0 = off)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--alarm-period', type=float, default=60.0, help='seconds between alarm set changes')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.cache, args.verbose, args.alarm_period,
+                   latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate,
+                   hang_rate=args.hang_rate, hang_seconds=args.hang, rate_limit=args.rate_limit,
+                   quota=args.quota, seed=args.seed)
+    base = f'http://{args.host}:{server.server_address[1]}'
+    print(f"fake providers on {base} ({len(server.gazetteer)} recorded places)")
+    for key, value in env_for(base).items():
+        print(f"  export {key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Load-test entry point: the real app with the Telegram fetch replaced by a replayed feed.
+
+benchmarks/loadtest.py starts it as ``gunicorn load_app:app`` (with
+``--pythonpath benchmarks``). Without TELEGRAM_API_ID the app has no Telegram
+client, so this module stands in for the fetch loop: every
+60 / LOAD_INGEST_RATE seconds it takes the next text from LOAD_INGEST_SOURCE
+(messages.json or an /admin/export NDJSON dump), runs it through
+process_message, stores new tracks with save_messages (no push
+notifications) and broadcasts them to /stream subscribers, as a fetch cycle
+does. The geocoders reach whatever OPENCAGE_URL / NOMINATIM_URL / ... point
+at (benchmarks/fake_geocoder.py during load tests).
+
+Environment:
+    LOAD_INGEST_RATE     messages per minute per worker (0 = no ingest, default 30)
+    LOAD_INGEST_SOURCE   message source (default: the repo's messages.json)
+"""
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import app as neptun  # noqa: E402
+from parser_corpus import read_messages  # noqa: E402
+
+app = neptun.app
+log = logging.getLogger(__name__)
+
+INGEST_RATE = float(os.getenv('LOAD_INGEST_RATE', '30'))
+INGEST_SOURCE = os.getenv('LOAD_INGEST_SOURCE', os.path.join(os.path.dirname(HERE), 'messages.json'))
+INGEST_STATS = {'messages': 0, 'tracks': 0, 'errors': 0, 'parse_seconds': 0.0}
+
+
+def _texts():
+    seen = set()
+    out = []
+    for msg in read_messages(INGEST_SOURCE):
+        key = (msg.get('text'), msg.get('channel'))
+        if msg.get('text') and key not in seen:
+            seen.add(key)
+            out.append(key)
+    return out
+
+
+def ingest_one(n: int, text: str, channel: str) -> int:
+    date_str = datetime.now(neptun.pytz.timezone('Europe/Kyiv')).strftime('%Y-%m-%d %H:%M:%S')
+    t0 = time.perf_counter()
+    tracks = neptun.process_message(text, f'load{os.getpid()}_{n}', date_str, channel or 'loadtest')
+    INGEST_STATS['parse_seconds'] += time.perf_counter() - t0
+    INGEST_STATS['messages'] += 1
+    if not isinstance(tracks, list) or not tracks:
+        return 0
+    all_data = neptun.load_messages()
+    existing = {m.get('id') for m in all_data}
+    new = [t for t in tracks if t.get('id') not in existing]
+    if new:
+        neptun.save_messages(all_data + new, send_notifications=False)
+        neptun.broadcast_new(new)
+        INGEST_STATS['tracks'] += len(new)
+    return len(new)
+
+
+def _ingest_loop() -> None:
+    texts = _texts()
+    if not texts:
+        log.warning(f'load ingest: no messages in {INGEST_SOURCE}')
+        return
+    interval = 60.0 / INGEST_RATE
+    for n, (text, channel) in enumerate(itertools.cycle(texts)):
+        time.sleep(interval)
+        try:
+            ingest_one(n, text, channel)
+        except Exception as e:
+            INGEST_STATS['errors'] += 1
+            log.warning(f'load ingest failed: {e}')
+
+
+@app.route('/_load/ingest')
+def load_ingest_stats():
+    return neptun.jsonify({'pid': os.getpid(), 'rate_per_min': INGEST_RATE, **INGEST_STATS})
+
+
+if INGEST_RATE > 0:
+    threading.Thread(target=_ingest_loop, name='load-ingest', daemon=True).start()
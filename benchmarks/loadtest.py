@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""HTTP + SSE load test against a locally booted app.
+
+Boots the app the way production runs it (gunicorn, gevent workers; the
+worker count, class and connection limit are options), with the Telegram fetch
+replaced by a replayed message feed (benchmarks/load_app.py) and every
+external provider (geocoders, Groq, ukrainealarm) served by
+benchmarks/fake_geocoder.py at a configurable latency. Data files are copied
+into a scratch directory, so the tree is never modified. ``--url`` targets an
+already running server instead.
+
+Traffic:
+  - closed-loop virtual users (own keep-alive connection, client IP and device
+    id), each picking requests from a weighted mix of /data, /api/alarms/all,
+    /api/chat/messages, /api/chat/send, / and static files, with exponential
+    think time; conditional requests reuse ETags. /presence is sent on its own
+    timer like the web client (on load, then every 30 s)
+  - long-lived SSE clients on /stream and /api/chat/stream (open streams,
+    time to response headers and to the first event, rejections when the
+    subscriber limits are hit, events received)
+
+Report: throughput, latency percentiles, error and 429 rates per endpoint;
+server RSS/CPU/threads/fds sampled from /proc (booted server, or --server-pid);
+app-side counters (/startup_diag, ingest, provider stand-in).
+
+Usage:
+    python benchmarks/loadtest.py [--users 100] [--sse 120] [--duration 60] [--workers 1]
+    python benchmarks/loadtest.py --mix data=50,alarms=30,static=20 --provider-latency 300 --json out.json
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --server-pid 1234
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+import fake_geocoder  # noqa: E402
+
+DEFAULT_MIX = 'data=35,alarms=15,chat_messages=10,chat_send=1,static=15,page=4'
+# The web client pings /presence on load and then every 30 s (setInterval(pingPresence, 30000));
+# the server allows 3 per 30 s per IP, so presence must not be drawn from the mix
+PRESENCE_INTERVAL = 30.0
+DATA_FILES = ('.json', '.db')
+STATIC_EXTENSIONS = ('.png', '.webp', '.svg', '.json', '.txt')
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+# ----- Recording -----
+class Recorder:
+    """Per-endpoint latencies and status counts (thread-safe); samples before ``start`` are dropped."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.start: Optional[float] = None
+        self.endpoints: dict[str, dict] = {}
+
+    def add(self, name: str, status: int, seconds: float, nbytes: int = 0) -> None:
+        if self.start is None or time.monotonic() < self.start:
+            return
+        with self._lock:
+            ep = self.endpoints.setdefault(name, {'latencies': [], 'status': {}, 'bytes': 0})
+            ep['latencies'].append(seconds)
+            ep['status'][status] = ep['status'].get(status, 0) + 1
+            ep['bytes'] += nbytes
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+# ----- Virtual users -----
+class User:
+    def __init__(self, n: int, host: str, port: int, statics: list[str], rng: random.Random) -> None:
+        self.n = n
+        self.host, self.port = host, port
+        self.statics = statics
+        self.rng = rng
+        self.ip = f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'
+        self.device = f'load-device-{n}'
+        self.conn: Optional[http.client.HTTPConnection] = None
+        self.etags: dict[str, str] = {}
+
+    def request(self, method: str, path: str, body: Optional[dict] = None, etag_key: Optional[str] = None):
+        headers = {'X-Forwarded-For': self.ip, 'Accept-Encoding': 'gzip', 'User-Agent': 'neptun-loadtest/1.0'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        if etag_key and etag_key in self.etags:
+            headers['If-None-Match'] = self.etags[etag_key]
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+            data = resp.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        if etag_key and resp.getheader('ETag'):
+            self.etags[etag_key] = resp.getheader('ETag')
+        if resp.getheader('Connection', '').lower() == 'close':
+            self.conn.close()
+            self.conn = None
+        return resp.status, len(data)
+
+    # One method per mix entry
+    def data(self):
+        return self.request('GET', '/data', etag_key='data')
+
+    def presence(self):
+        return self.request('POST', '/presence', {'id': self.device, 'platform': 'web'})
+
+    def alarms(self):
+        return self.request('GET', '/api/alarms/all', etag_key='alarms')
+
+    def chat_messages(self):
+        return self.request('GET', '/api/chat/messages?limit=50')
+
+    def chat_send(self):
+        return self.request('POST', '/api/chat/send', {'userId': f'load{self.n}', 'deviceId': self.device,
+                                                       'message': f'load test {self.rng.randint(0, 1 << 30)}'})
+
+    def static(self):
+        return self.request('GET', self.rng.choice(self.statics))
+
+    def page(self):
+        return self.request('GET', '/')
+
+
+def user_loop(user: User, mix: list[tuple[str, float]], think: float, stop: threading.Event,
+              recorder: Recorder, delay: float, presence_interval: float = PRESENCE_INTERVAL) -> None:
+    if stop.wait(delay):
+        return
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    next_presence = time.monotonic() if presence_interval > 0 else None
+    while not stop.is_set():
+        t0 = time.monotonic()
+        if next_presence is not None and t0 >= next_presence:
+            name = 'presence'
+            next_presence = t0 + presence_interval
+        else:
+            name = user.rng.choices(names, weights)[0]
+        try:
+            status, nbytes = getattr(user, name)()
+        except (OSError, http.client.HTTPException):
+            status, nbytes = 0, 0   # connection error / timeout
+        recorder.add(name, status, time.monotonic() - t0, nbytes)
+        if think > 0:
+            stop.wait(user.rng.expovariate(1.0 / think))
+
+
+def sse_client(path: str, name: str, host: str, port: int, n: int, stop: threading.Event,
+               recorder: Recorder, counters: dict, lock: threading.Lock, delay: float,
+               header_timeout: float = 60.0) -> None:
+    """One SSE subscriber, reconnecting until ``stop``.
+
+    A stream counts as open once the request is on the wire: the app sends the
+    response headers with the first chunk its generator yields, which on a quiet
+    /api/chat/stream is the 25 s ping. Time to headers is recorded under ``name``
+    (status as for any request); time to the first ``data:`` event goes to
+    ``counters['first_event']``.
+    """
+    if stop.wait(delay):
+        return
+    while not stop.is_set():
+        t0 = time.monotonic()
+        opened = streaming = False
+        sock = None
+        try:
+            sock = socket.create_connection((host, port), timeout=30)
+            sock.sendall(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n'
+                         f'X-Forwarded-For: 10.200.{n // 256 % 256}.{n % 256}\r\n\r\n'.encode())
+            opened = True
+            with lock:
+                counters['connected'] += 1
+            # Raw recv with a short timeout so the client notices ``stop``; events are
+            # counted as lines starting with "data:" (chunk-size lines do not match)
+            sock.settimeout(1.0)
+            head = b''
+            while b'\r\n\r\n' not in head and not stop.is_set():
+                if time.monotonic() - t0 > header_timeout:
+                    raise socket.timeout('no response headers')
+                try:
+                    chunk = sock.recv(4096)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                head += chunk
+            if stop.is_set():
+                break
+            status_line = head.split(b'\r\n', 1)[0].split()
+            status = int(status_line[1]) if len(status_line) > 1 else 0
+            recorder.add(name, status, time.monotonic() - t0)
+            if status != 200:
+                sock.close()
+                sock = None
+                opened = False
+                with lock:
+                    counters['connected'] -= 1
+                    counters['rejected'] += 1
+                stop.wait(5)   # what the web client does before falling back to polling
+                continue
+            streaming = True
+            first_event = False
+            pending = b'\n' + head.split(b'\r\n\r\n', 1)[-1]
+            while True:
+                events = pending.count(b'\ndata:')
+                if events:
+                    with lock:
+                        counters['events'] += events
+                        if not first_event and recorder.start is not None and t0 >= recorder.start:
+                            counters['first_event'].append(time.monotonic() - t0)
+                    first_event = True
+                pending = pending[pending.rfind(b'\n'):]
+                if stop.is_set():
+                    break
+                try:
+                    chunk = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    break
+                pending += chunk
+        except OSError:
+            if not streaming:   # a reset mid-stream is counted as dropped below
+                recorder.add(name, 0, time.monotonic() - t0)
+            stop.wait(1)
+        finally:
+            if sock is not None:
+                sock.close()
+            if opened:
+                with lock:
+                    counters['connected'] -= 1
+                    if streaming and not stop.is_set():
+                        counters['dropped'] += 1
+
+
+# ----- Server -----
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get_json(base: str, path: str, timeout: float = 10) -> Optional[dict]:
+    url = urlparse(base)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        resp = conn.getresponse()
+        body = resp.read()
+        return json.loads(body) if resp.status == 200 else None
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+
+
+def boot(args, fake_base: str) -> tuple[subprocess.Popen, str, str]:
+    scratch = tempfile.mkdtemp(prefix='neptun-load-')
+    for name in os.listdir(ROOT):
+        if name.endswith(DATA_FILES) and os.path.isfile(os.path.join(ROOT, name)):
+            shutil.copy(os.path.join(ROOT, name), scratch)
+    port = free_port()
+    env = dict(os.environ)
+    env.update(fake_geocoder.env_for(fake_base))
+    env.update({
+        'PERSISTENT_DATA_DIR': scratch,
+        'TELEGRAM_API_ID': '0', 'TELEGRAM_API_HASH': '', 'TELEGRAM_SESSION': '', 'TELEGRAM_BOT_TOKEN': '',
+        'OPENCAGE_API_KEY': 'loadtest',
+        'GROQ_API_KEY': 'loadtest' if args.groq else '',
+        'SNAPSHOTS_ENABLED': '0',
+        'LOAD_INGEST_RATE': str(args.ingest_rate),
+        'LOAD_INGEST_SOURCE': os.path.join(ROOT, 'messages.json'),
+        'PYTHONPATH': ROOT,
+    })
+    cmd = [sys.executable, '-m', 'gunicorn', 'load_app:app', '--pythonpath', HERE,
+           '--workers', str(args.workers), '--worker-class', args.worker_class,
+           '--worker-connections', str(args.worker_connections), '--timeout', '120', '--keep-alive', '5',
+           '--bind', f'127.0.0.1:{port}', '--access-logfile', '/dev/null']
+    log = open(os.path.join(scratch, 'server.log'), 'wb')
+    proc = subprocess.Popen(cmd, cwd=scratch, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + args.boot_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited ({proc.returncode}); see {scratch}/server.log")
+        if get_json(base, '/healthz', timeout=2) is not None:
+            return proc, base, scratch
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"server not healthy after {args.boot_timeout:.0f}s; see {scratch}/server.log")
+
+
+def process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    try:
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                with open(f'/proc/{entry}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                if int(fields[1]) in pids:
+                    pids.append(int(entry))
+    except OSError:
+        pass
+    return pids
+
+
+def sample_process(pids: list[int]) -> Optional[dict]:
+    """Summed RSS (bytes), CPU seconds, threads and open fds of ``pids`` from /proc."""
+    total = {'rss': 0, 'cpu': 0.0, 'threads': 0, 'fds': 0}
+    found = False
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{pid}/status') as f:
+                rss = next((int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:')), 0)
+            total['fds'] += len(os.listdir(f'/proc/{pid}/fd'))
+        except (OSError, ValueError):
+            continue
+        found = True
+        total['cpu'] += (int(fields[11]) + int(fields[12])) / CLK_TCK
+        total['threads'] += int(fields[17])
+        total['rss'] += rss
+    return total if found else None
+
+
+def resource_sampler(pid: int, stop: threading.Event, samples: list, interval: float) -> None:
+    while not stop.is_set():
+        sample = sample_process(process_tree(pid))
+        if sample is not None:
+            sample['t'] = time.monotonic()
+            samples.append(sample)
+        stop.wait(interval)
+
+
+# ----- Report -----
+def report(recorder: Recorder, elapsed: float, sse: dict, samples: list, extra: dict) -> dict:
+    result = {'duration_s': elapsed, 'endpoints': {}, 'sse': sse, 'server': {}, 'app': extra}
+    print(f"\n{'endpoint':<15} {'req':>7} {'req/s':>7} {'err%':>6} {'429%':>6} {'304%':>5} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'KB/s':>8}")
+    total_req = total_err = 0
+    for name, ep in sorted(recorder.endpoints.items()):
+        lat = sorted(ep['latencies'])
+        n = len(lat)
+        errors = sum(c for s, c in ep['status'].items() if s == 0 or s >= 500)
+        limited = ep['status'].get(429, 0)
+        not_modified = ep['status'].get(304, 0)
+        total_req += n
+        total_err += errors
+        row = {'requests': n, 'rps': n / elapsed, 'error_rate': errors / n, 'rate_limited': limited / n,
+               'not_modified': not_modified / n, 'p50_ms': percentile(lat, 0.5) * 1000,
+               'p90_ms': percentile(lat, 0.9) * 1000, 'p99_ms': percentile(lat, 0.99) * 1000,
+               'max_ms': lat[-1] * 1000, 'mean_ms': statistics.fmean(lat) * 1000,
+               'status': {str(k): v for k, v in sorted(ep['status'].items())}, 'kb_per_s': ep['bytes'] / 1024 / elapsed}
+        result['endpoints'][name] = row
+        print(f"{name:<15} {n:>7} {row['rps']:>7.1f} {row['error_rate'] * 100:>6.2f} {row['rate_limited'] * 100:>6.2f} "
+              f"{row['not_modified'] * 100:>5.1f} {row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+              f"{row['max_ms']:>8.1f} {row['kb_per_s']:>8.1f}")
+    if total_req:
+        print(f"{'total':<15} {total_req:>7} {total_req / elapsed:>7.1f} {total_err / total_req * 100:>6.2f}")
+    for path, counters in sse.items():
+        first = sorted(counters.pop('first_event'))
+        counters['first_event_streams'] = len(first)
+        counters['first_event_p50_ms'] = percentile(first, 0.5) * 1000
+        counters['first_event_p90_ms'] = percentile(first, 0.9) * 1000
+        print(f"SSE {path}: open at end {counters['connected']}, rejected {counters['rejected']}, "
+              f"dropped {counters['dropped']}, events {counters['events']} ({counters['events'] / elapsed:.1f}/s), "
+              f"first event p50 {counters['first_event_p50_ms']:.0f} ms p90 {counters['first_event_p90_ms']:.0f} ms "
+              f"({len(first)} streams)")
+        if path == '/api/chat/stream':
+            print("  (headers go out with the first chunk: without chat traffic that is the 25 s ping, "
+                  "so sse_chat latency is time to headers, not connect time)")
+    if len(samples) >= 2:
+        first, last = samples[0], samples[-1]
+        cpu = (last['cpu'] - first['cpu']) / max(last['t'] - first['t'], 1e-9) * 100
+        rss = [s['rss'] for s in samples]
+        result['server'] = {'cpu_percent': cpu, 'rss_start_mb': rss[0] / 2**20, 'rss_peak_mb': max(rss) / 2**20,
+                            'rss_end_mb': rss[-1] / 2**20, 'threads_peak': max(s['threads'] for s in samples),
+                            'fds_peak': max(s['fds'] for s in samples)}
+        srv = result['server']
+        print(f"server: CPU {cpu:.0f}% (of one core)  RSS {srv['rss_start_mb']:.0f} -> {srv['rss_end_mb']:.0f} MB "
+              f"(peak {srv['rss_peak_mb']:.0f})  threads peak {srv['threads_peak']}  fds peak {srv['fds_peak']}")
+    diag = extra.get('startup_diag') or {}
+    if diag:
+        print(f"app: subscribers {diag.get('subscribers')}  response cache {diag.get('cache_stats', {}).get('hit_rate')}  "
+              f"messages {diag.get('messages_count')}")
+    if extra.get('ingest'):
+        ing = extra['ingest']
+        print(f"ingest: {ing['messages']} messages, {ing['tracks']} tracks, {ing['errors']} errors, "
+              f"parse {ing['parse_seconds'] / max(ing['messages'], 1) * 1000:.1f} ms/msg")
+    if extra.get('providers'):
+        used = {p: s for p, s in extra['providers'].items() if s['requests']}
+        print('providers: ' + ('  '.join(f"{p} {s['requests']} req ({s['hits']} hit)" for p, s in used.items()) or 'none called'))
+    return result
+
+
+def parse_mix(text: str) -> list[tuple[str, float]]:
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if not hasattr(User, name) or name.startswith('_') or name == 'request':
+            raise SystemExit(f"unknown mix entry: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='target a running server instead of booting one')
+    parser.add_argument('--server-pid', type=int, help='pid to sample with --url')
+    parser.add_argument('--users', type=int, default=100, help='closed-loop HTTP users')
+    parser.add_argument('--think', type=float, default=1.0, help='mean think time between requests, s')
+    parser.add_argument('--sse', type=int, default=50, help='/stream clients')
+    parser.add_argument('--chat-sse', type=int, default=20, help='/api/chat/stream clients')
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--presence-interval', type=float, default=PRESENCE_INTERVAL,
+                        help='seconds between /presence pings per user (0 disables)')
+    parser.add_argument('--duration', type=float, default=60.0, help='measured seconds (after warm-up)')
+    parser.add_argument('--warmup', type=float, default=10.0)
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds to start all users')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--worker-class', default='gevent')
+    parser.add_argument('--worker-connections', type=int, default=1000)
+    parser.add_argument('--ingest-rate', type=float, default=30.0, help='replayed messages per minute per worker')
+    parser.add_argument('--provider-latency', type=float, default=200.0, help='stand-in provider latency, ms')
+    parser.add_argument('--provider-jitter', type=float, default=50.0)
+    parser.add_argument('--provider-errors', type=float, default=0.0, help='stand-in provider error rate')
+    parser.add_argument('--groq', action='store_true', help='enable the Groq paths (answered by the stand-in)')
+    parser.add_argument('--boot-timeout', type=float, default=180.0)
+    parser.add_argument('--keep', action='store_true', help='keep the scratch directory (server.log, data)')
+    parser.add_argument('--json', help='write the full result here')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    statics = ['/static/' + n for n in sorted(os.listdir(os.path.join(ROOT, 'static')))
+               if n.endswith(STATIC_EXTENSIONS)] or ['/robots.txt']
+
+    fake = proc = scratch = None
+    pid = args.server_pid
+    if args.url:
+        base = args.url.rstrip('/')
+    else:
+        fake = fake_geocoder.serve(port=0, latency_ms=args.provider_latency, jitter_ms=args.provider_jitter,
+                                   error_rate=args.provider_errors, seed=args.seed)
+        threading.Thread(target=fake.serve_forever, daemon=True).start()
+        fake_base = f'http://127.0.0.1:{fake.server_address[1]}'
+        print(f"booting {args.workers} x {args.worker_class} worker(s), {args.worker_connections} connections ...")
+        t0 = time.monotonic()
+        proc, base, scratch = boot(args, fake_base)
+        pid = proc.pid
+        print(f"healthy after {time.monotonic() - t0:.1f}s at {base} (scratch {scratch})")
+
+    url = urlparse(base)
+    host, port = url.hostname, url.port or 80
+    recorder = Recorder()
+    stop = threading.Event()
+    rng = random.Random(args.seed)
+    threads = []
+    for n in range(args.users):
+        user = User(n, host, port, statics, random.Random(rng.random()))
+        threads.append(threading.Thread(target=user_loop, daemon=True,
+                                        args=(user, mix, args.think, stop, recorder, args.ramp * n / max(args.users, 1),
+                                              args.presence_interval)))
+    lock = threading.Lock()
+    sse = {}
+    for path, count, name in (('/stream', args.sse, 'sse_stream'), ('/api/chat/stream', args.chat_sse, 'sse_chat')):
+        if count:
+            sse[path] = {'connected': 0, 'rejected': 0, 'dropped': 0, 'events': 0, 'first_event': []}
+            for n in range(count):
+                threads.append(threading.Thread(target=sse_client, daemon=True, args=(
+                    path, name, host, port, n, stop, recorder, sse[path], lock, args.ramp * n / count)))
+    samples: list = []
+    if pid:
+        threads.append(threading.Thread(target=resource_sampler, args=(pid, stop, samples, 1.0), daemon=True))
+
+    print(f"{args.users} users (think {args.think}s, presence every {args.presence_interval:.0f}s), "
+          f"{args.sse}+{args.chat_sse} SSE clients; "
+          f"warm-up {args.warmup:.0f}s, measuring {args.duration:.0f}s")
+    recorder.start = time.monotonic() + args.warmup
+    for t in threads:
+        t.start()
+    try:
+        time.sleep(args.warmup)
+        samples.clear()   # resource deltas over the measured window only
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    elapsed = max(time.monotonic() - recorder.start, 1e-9)
+    extra = {'startup_diag': get_json(base, '/startup_diag'), 'ingest': get_json(base, '/_load/ingest'),
+             'providers': None}
+    if fake is not None:
+        extra['providers'] = (get_json(f'http://127.0.0.1:{fake.server_address[1]}', '/_stats') or {}).get('providers')
+    stop.set()
+    result = report(recorder, elapsed, sse, samples, extra)
+    result['config'] = {k: v for k, v in vars(args).items()}
+
+    if proc is not None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    if fake is not None:
+        fake.shutdown()
+    if scratch and not args.keep:
+        shutil.rmtree(scratch, ignore_errors=True)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=1, default=str)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""Parser regression corpus and differential harness for process_message.
+
+The corpus (JSONL, one channel message per line) stores the message text,
+channel and date together with the normalized tracks the parser produced when
+it was recorded: markers, coordinates, threat types, trajectories. Every run
+happens offline in a worker subprocess:
+  - outbound sockets are refused, so the geocoders answer only from their
+    JSON caches (copied into a scratch directory, so runs never modify the tree)
+  - the Groq and OpenCage keys are cleared
+  - PERSISTENT_DATA_DIR points at the scratch directory
+
+Commands:
+  record  build a corpus from messages.json and/or /admin/export?type=messages&format=ndjson
+          dumps (one entry per distinct text+channel) and store the current output
+  check   re-parse the corpus, print exact diffs against the stored output and
+          per-message parse time; --accept rewrites the expectations
+  diff    run two implementations side by side (another checkout or git ref,
+          or another function) and report differing outputs and timing
+
+Usage:
+    python benchmarks/parser_corpus.py record --source export.ndjson --source messages.json
+    python benchmarks/parser_corpus.py check [--show 20] [--accept]
+    python benchmarks/parser_corpus.py diff --ref-b HEAD~1
+    python benchmarks/parser_corpus.py diff --impl-b app:process_message_v2
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(ROOT, 'benchmarks', 'corpus', 'parser.jsonl')
+DEFAULT_IMPL = 'app:process_message'
+
+# Geocoder caches the parser reads; copied into the scratch dir of each worker
+CACHE_FILES = ('geocode_cache.json', 'nominatim_cache.json', 'negative_geocode_cache.json')
+OFFLINE_ENV = {
+    'GROQ_API_KEY': '',
+    'OPENCAGE_API_KEY': '',
+    'STARTUP_WARM_DELAY': '3600',   # no background warm-up while parsing
+    'SNAPSHOTS_ENABLED': '0',
+}
+# Track fields that echo the input or depend on wall-clock time
+VOLATILE = frozenset({'id', 'text', 'date', 'channel', 'timestamp', 'ttl_expires', 'expires_at', 'created_at'})
+COORD_DIGITS = 5
+
+
+# ----- Corpus -----
+def entry_id(text: str, channel: str) -> str:
+    return hashlib.sha1(f'{channel}\n{text}'.encode('utf-8')).hexdigest()[:12]
+
+
+def read_messages(path: str):
+    """Messages from a messages.json list or an NDJSON export (envelope lines are skipped)."""
+    with open(path, encoding='utf-8') as f:
+        head = f.read(1)
+        f.seek(0)
+        if head == '[':
+            yield from json.load(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                if isinstance(row, dict) and row.get('text'):
+                    yield row
+
+
+def load_corpus(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_corpus(path: str, entries: list[dict]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False, sort_keys=True) + '\n')
+    os.replace(tmp, path)
+
+
+def normalize(tracks) -> list:
+    """Comparable form of a process_message result: volatile fields dropped, floats rounded, stable order."""
+    if not isinstance(tracks, list):
+        return [] if tracks is None else [repr(tracks)]
+
+    def clean(value):
+        if isinstance(value, float):
+            return round(value, COORD_DIGITS)
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        return value
+
+    out = [clean({k: v for k, v in t.items() if k not in VOLATILE}) if isinstance(t, dict) else clean(t)
+           for t in tracks]
+    return sorted(out, key=lambda t: json.dumps(t, ensure_ascii=False, sort_keys=True))
+
+
+# ----- Worker (subprocess) -----
+def _block_network(counter: list) -> None:
+    import socket
+
+    def refuse(*args, **kwargs):
+        counter[0] += 1
+        raise OSError('network disabled in parser corpus run')
+
+    socket.socket.connect = refuse
+    socket.socket.connect_ex = refuse
+    socket.create_connection = refuse
+
+
+def worker(root: str, impl: str, corpus: str, results: str, cache_dir: str) -> int:
+    scratch = tempfile.mkdtemp(prefix='parser-corpus-')
+    for name in CACHE_FILES:
+        if os.path.exists(os.path.join(cache_dir, name)):
+            shutil.copy(os.path.join(cache_dir, name), scratch)
+    os.environ.update(OFFLINE_ENV)
+    os.environ['PERSISTENT_DATA_DIR'] = scratch
+    os.chdir(scratch)
+    blocked = [0]
+    _block_network(blocked)
+    sys.path.insert(0, root)
+
+    import importlib
+    module_name, _, attr = impl.partition(':')
+    fn = getattr(importlib.import_module(module_name), attr or 'process_message')
+    with open(results, 'w', encoding='utf-8') as out:
+        for entry in load_corpus(corpus):
+            before = blocked[0]
+            error = None
+            t0 = time.perf_counter()
+            try:
+                tracks = fn(entry['text'], entry['id'], entry.get('date') or '', entry.get('channel') or '')
+            except Exception as e:
+                tracks, error = None, f'{type(e).__name__}: {e}'
+            seconds = time.perf_counter() - t0
+            out.write(json.dumps({'id': entry['id'], 'output': normalize(tracks), 'error': error,
+                                  'seconds': seconds, 'network': blocked[0] - before}, ensure_ascii=False) + '\n')
+    shutil.rmtree(scratch, ignore_errors=True)
+    return 0
+
+
+def run_impl(root: str, impl: str, corpus: str) -> dict:
+    """Parse the corpus with ``impl`` from checkout ``root``; returns {entry id: result}."""
+    fd, results = tempfile.mkstemp(suffix='.jsonl', prefix='parser-results-')
+    os.close(fd)
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '_worker', '--root', root, '--impl', impl,
+             '--corpus', corpus, '--results', results, '--cache-dir', ROOT],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"worker failed for {impl} in {root} (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+        return {r['id']: r for r in load_corpus(results)}
+    finally:
+        os.remove(results)
+
+
+def checkout(ref: str) -> str:
+    """Export ``ref`` into a temp directory (git archive, leaves the working tree alone)."""
+    target = tempfile.mkdtemp(prefix='parser-ref-')
+    archive = subprocess.run(['git', 'archive', ref], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+    return target
+
+
+# ----- Reporting -----
+def _pretty(output, error) -> list[str]:
+    doc = {'error': error, 'tracks': output} if error else output
+    return json.dumps(doc, ensure_ascii=False, indent=1, sort_keys=True).splitlines()
+
+
+def print_diff(entry: dict, a_label: str, a, b_label: str, b) -> None:
+    print(f"--- {entry['id']} [{entry.get('channel', '')}] {entry['text'][:120]!r}")
+    for line in difflib.unified_diff(_pretty(*a), _pretty(*b), a_label, b_label, lineterm='', n=2):
+        print(line)
+
+
+def timing_summary(label: str, results: dict) -> list[float]:
+    times = sorted(r['seconds'] * 1000 for r in results.values())
+    if not times:
+        return times
+    n = len(times)
+    network = sum(r['network'] for r in results.values())
+    print(f"{label}: {n} messages in {sum(times):.0f} ms  p50 {times[n // 2]:.2f} ms  "
+          f"p90 {times[int(n * 0.9)]:.2f} ms  p99 {times[int(n * 0.99)]:.2f} ms  max {times[-1]:.2f} ms"
+          + (f"  (refused network calls: {network})" if network else ''))
+    return times
+
+
+def print_slowest(entries: list[dict], results: dict, count: int) -> None:
+    by_id = {e['id']: e for e in entries}
+    slowest = sorted(results.values(), key=lambda r: -r['seconds'])[:count]
+    for r in slowest:
+        print(f"  {r['seconds'] * 1000:9.2f} ms  {r['id']}  {by_id[r['id']]['text'][:80]!r}")
+
+
+# ----- Commands -----
+def cmd_record(args) -> int:
+    if os.path.exists(args.corpus) and not args.force:
+        print(f"{args.corpus} exists; use check --accept to update expectations or --force to rebuild")
+        return 1
+    entries: dict[str, dict] = {}
+    for source in args.source:
+        for msg in read_messages(source):
+            text = (msg.get('text') or '').strip()
+            if not text:
+                continue
+            channel = msg.get('channel') or msg.get('source') or ''
+            eid = entry_id(text, channel)
+            entries.setdefault(eid, {'id': eid, 'text': text, 'channel': channel, 'date': msg.get('date') or ''})
+            if args.limit and len(entries) >= args.limit:
+                break
+    corpus = list(entries.values())
+    if not corpus:
+        print('no messages with text in the sources')
+        return 1
+    save_corpus(args.corpus, corpus)
+    results = run_impl(args.root, args.impl, args.corpus)
+    for entry in corpus:
+        result = results[entry['id']]
+        entry['expected'] = result['output']
+        entry['error'] = result['error']
+    save_corpus(args.corpus, corpus)
+    print(f"recorded {len(corpus)} messages into {args.corpus}")
+    timing_summary(args.impl, results)
+    return 0
+
+
+def cmd_check(args) -> int:
+    corpus = load_corpus(args.corpus)
+    results = run_impl(args.root, args.impl, args.corpus)
+    changed = []
+    for entry in corpus:
+        result = results[entry['id']]
+        if (entry.get('expected'), entry.get('error')) != (result['output'], result['error']):
+            changed.append(entry)
+            if len(changed) <= args.show:
+                print_diff(entry, 'expected', (entry.get('expected'), entry.get('error')),
+                           args.impl, (result['output'], result['error']))
+    print(f"\n{len(corpus) - len(changed)}/{len(corpus)} unchanged, {len(changed)} differ")
+    timing_summary(args.impl, results)
+    if args.slowest:
+        print_slowest(corpus, results, args.slowest)
+    if changed and args.accept:
+        for entry in changed:
+            result = results[entry['id']]
+            entry['expected'], entry['error'] = result['output'], result['error']
+        save_corpus(args.corpus, corpus)
+        print(f"accepted {len(changed)} new expectations")
+        return 0
+    return 1 if changed else 0
+
+
+def cmd_diff(args) -> int:
+    corpus = load_corpus(args.corpus)
+    root_b = checkout(args.ref_b) if args.ref_b else (args.root_b or args.root)
+    label_a = f"A {args.impl}"
+    label_b = f"B {args.impl_b or args.impl}" + (f"@{args.ref_b}" if args.ref_b else '')
+    try:
+        results_a = run_impl(args.root, args.impl, args.corpus)
+        results_b = run_impl(root_b, args.impl_b or args.impl, args.corpus)
+    finally:
+        if args.ref_b:
+            shutil.rmtree(root_b, ignore_errors=True)
+    differ = 0
+    for entry in corpus:
+        a, b = results_a[entry['id']], results_b[entry['id']]
+        if (a['output'], a['error']) != (b['output'], b['error']):
+            differ += 1
+            if differ <= args.show:
+                print_diff(entry, label_a, (a['output'], a['error']), label_b, (b['output'], b['error']))
+    print(f"\n{len(corpus) - differ}/{len(corpus)} identical, {differ} differ")
+    times_a = timing_summary(label_a, results_a)
+    times_b = timing_summary(label_b, results_b)
+    if times_a and times_b:
+        ratios = [results_b[e['id']]['seconds'] / max(results_a[e['id']]['seconds'], 1e-9) for e in corpus]
+        print(f"B/A per message: median {statistics.median(ratios):.2f}x  total {sum(times_b) / max(sum(times_a), 1e-9):.2f}x")
+    return 1 if differ else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p):
+        p.add_argument('--corpus', default=CORPUS)
+        p.add_argument('--root', default=ROOT, help='checkout to import the implementation from')
+        p.add_argument('--impl', default=DEFAULT_IMPL, help='module:function taking (text, mid, date, channel)')
+        p.add_argument('--show', type=int, default=20, help='diffs to print')
+        return p
+
+    p = common(sub.add_parser('record', help='build a corpus and store the current output'))
+    p.add_argument('--source', action='append', required=True, help='messages.json or NDJSON export (repeatable)')
+    p.add_argument('--limit', type=int, default=0, help='max distinct messages')
+    p.add_argument('--force', action='store_true', help='overwrite an existing corpus')
+    p.set_defaults(func=cmd_record)
+
+    p = common(sub.add_parser('check', help='compare against the stored output'))
+    p.add_argument('--accept', action='store_true', help='store the new output as expected')
+    p.add_argument('--slowest', type=int, default=10, help='slowest messages to list')
+    p.set_defaults(func=cmd_check)
+
+    p = common(sub.add_parser('diff', help='compare two implementations'))
+    p.add_argument('--root-b', help='second checkout (default: same as --root)')
+    p.add_argument('--ref-b', help='git ref to export as the second checkout')
+    p.add_argument('--impl-b', help='module:function for B (default: --impl)')
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser('_worker')
+    for name in ('--root', '--impl', '--corpus', '--results', '--cache-dir'):
+        p.add_argument(name, required=True)
+    p.set_defaults(func=lambda a: worker(a.root, a.impl, a.corpus, a.results, a.cache_dir))
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
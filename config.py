@@ -114,6 +114,9 @@ class GeocodingConfig:
     opencage_api_key: Optional[str] = field(
         default_factory=lambda: os.getenv('OPENCAGE_API_KEY')
     )
+    opencage_url: str = field(
+        default_factory=lambda: os.getenv('OPENCAGE_URL', 'https://api.opencagedata.com/geocode/v1/json')
+    )
 
     # Google Maps
     google_maps_key: Optional[str] = field(
@@ -0,0 +1,360 @@
+"""
+Transactional air-alarm state (oblast / raion) decoupled from message parsing.
+
+The parser only reports transitions - :meth:`AlarmStateEngine.start`,
+:meth:`~AlarmStateEngine.cancel`, :meth:`~AlarmStateEngine.cancel_all` -
+which are applied in memory under one lock. Each alarm sits in a timer-wheel
+slot keyed by its expiry tick; advancing the wheel pops only the slots that
+came due, so expiry costs O(expired) instead of a sweep over every active
+alarm on each message and each read. Reads return an immutable snapshot
+rebuilt once per change.
+
+Every transition emits a change event to subscribers and queues its
+persistence: the latest row per alarm (upsert or delete) plus the event-log
+row. :meth:`~AlarmStateEngine.flush` writes the whole batch in a single
+SQLite transaction; a failed flush is re-queued for the next one.
+
+Usage:
+    from core.alarm_state import AlarmStateEngine
+
+    ALARMS = AlarmStateEngine(ttl_seconds=65 * 60, conn_factory=db_conn)
+    ALARMS.load()                          # restore persisted alarms at startup
+    ALARMS.subscribe(lambda ev: print(ev)) # {'level', 'name', 'event', 'ts', 'since'}
+    ALARMS.start('oblast', 'київська', now)
+    ALARMS.cancel_matching('oblast', 'київ', now)
+    ALARMS.snapshot()                      # {'oblast': {...}, 'raion': {...}, 'version': 7}
+    ALARMS.tick()                          # periodic job: expire + flush
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+LEVELS = ('oblast', 'raion')
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS alarms ("
+    " id TEXT PRIMARY KEY, level TEXT NOT NULL, name TEXT NOT NULL,"
+    " since REAL NOT NULL, last REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS alarm_events ("
+    " id TEXT PRIMARY KEY, level TEXT NOT NULL, name TEXT NOT NULL,"
+    " event TEXT NOT NULL, ts REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_alarm_events_ts ON alarm_events(ts)",
+)
+
+
+def alarm_key(level: str, name: str) -> str:
+    return f"{level}:{name}".lower()
+
+
+class _Alarm:
+    __slots__ = ('level', 'name', 'since', 'last', 'tick')
+
+    def __init__(self, level: str, name: str, since: float, last: float, tick: int) -> None:
+        self.level = level
+        self.name = name
+        self.since = since
+        self.last = last
+        self.tick = tick
+
+
+class AlarmStateEngine:
+    """In-memory alarm state with timer-wheel expiry and batched SQLite persistence."""
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        conn_factory: Optional[Callable[[], Any]] = None,
+        resolution: float = 10.0,
+        max_pending_events: int = 5000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.resolution = resolution
+        self.max_pending_events = max_pending_events
+        self._conn_factory = conn_factory
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._active: dict[str, dict[str, _Alarm]] = {level: {} for level in LEVELS}
+        # Timer wheel: expiry tick -> alarms due in that tick
+        self._wheel: dict[int, set[tuple[str, str]]] = {}
+        self._wheel_pos = self._tick_of(clock())
+        self._listeners: list[Callable[[dict], None]] = []
+        # Pending persistence: latest row per alarm (None = delete) + event-log rows
+        self._dirty: dict[tuple[str, str], Optional[tuple[float, float]]] = {}
+        self._events: list[tuple[str, str, str, float]] = []
+        self._snapshot: Optional[dict] = None
+        self.version = 0
+        self.transitions = {'start': 0, 'cancel': 0, 'expire': 0}
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_written = 0
+        self.dropped_events = 0
+        self.last_flush: Optional[float] = None
+        self.last_flush_ms: Optional[float] = None
+
+    def subscribe(self, fn: Callable[[dict], None]) -> None:
+        """``fn(event)`` is called (outside the lock) for every start/cancel/expire."""
+        self._listeners.append(fn)
+
+    # ----- Timer wheel -----
+    def _tick_of(self, ts: float) -> int:
+        return int(ts // self.resolution)
+
+    def _schedule(self, alarm: _Alarm) -> None:
+        tick = self._tick_of(alarm.last + self.ttl_seconds)
+        if tick == alarm.tick:
+            return
+        self._unschedule(alarm)
+        alarm.tick = tick
+        self._wheel.setdefault(tick, set()).add((alarm.level, alarm.name))
+
+    def _unschedule(self, alarm: _Alarm) -> None:
+        slot = self._wheel.get(alarm.tick)
+        if slot is not None:
+            slot.discard((alarm.level, alarm.name))
+            if not slot:
+                del self._wheel[alarm.tick]
+
+    def _advance(self, now: float, events: list) -> None:
+        """Expire every alarm whose slot is due; the current tick's slot is checked per alarm."""
+        now_tick = self._tick_of(now)
+        if now_tick - self._wheel_pos > len(self._wheel):
+            due = sorted(t for t in self._wheel if t < now_tick)
+        else:
+            due = [t for t in range(self._wheel_pos, now_tick) if t in self._wheel]
+        for tick in due:
+            for level, name in self._wheel.pop(tick):
+                self._remove(level, name, 'expire', now, events)
+        self._wheel_pos = now_tick
+        current = self._wheel.get(now_tick)
+        if current:
+            cutoff = now - self.ttl_seconds
+            for level, name in list(current):
+                if self._active[level][name].last < cutoff:
+                    self._remove(level, name, 'expire', now, events)
+
+    # ----- Transitions (called with the lock held) -----
+    def _record(self, level: str, name: str, event: str, ts: float, since: float, events: list) -> None:
+        self.transitions[event] += 1
+        self.version += 1
+        self._snapshot = None
+        self._events.append((level, name, event, ts))
+        if len(self._events) > self.max_pending_events:
+            overflow = len(self._events) - self.max_pending_events
+            del self._events[:overflow]
+            self.dropped_events += overflow
+        events.append({'level': level, 'name': name, 'event': event, 'ts': ts, 'since': since})
+
+    def _remove(self, level: str, name: str, event: str, now: float, events: list) -> bool:
+        alarm = self._active[level].pop(name, None)
+        if alarm is None:
+            return False
+        self._unschedule(alarm)
+        self._dirty[(level, name)] = None
+        self._record(level, name, event, now, alarm.since, events)
+        return True
+
+    def _emit(self, events: list) -> None:
+        for event in events:
+            for fn in self._listeners:
+                try:
+                    fn(event)
+                except Exception as exc:
+                    log.debug(f"Alarm state: listener failed: {exc}")
+
+    # ----- Public transitions -----
+    def start(self, level: str, name: str, now: Optional[float] = None) -> bool:
+        """Raise (or refresh) an alarm; returns True if it was not active before."""
+        now = self._clock() if now is None else now
+        events: list = []
+        with self._lock:
+            self._advance(now, events)
+            alarm = self._active[level].get(name)
+            is_new = alarm is None
+            if is_new:
+                alarm = _Alarm(level, name, now, now, -1)
+                self._active[level][name] = alarm
+                self._record(level, name, 'start', now, now, events)
+            else:
+                alarm.since = min(alarm.since, now)
+                alarm.last = max(alarm.last, now)
+            self._schedule(alarm)
+            self._dirty[(level, name)] = (alarm.since, alarm.last)
+        self._emit(events)
+        return is_new
+
+    def cancel(self, level: str, name: str, now: Optional[float] = None) -> bool:
+        now = self._clock() if now is None else now
+        events: list = []
+        with self._lock:
+            self._advance(now, events)
+            removed = self._remove(level, name, 'cancel', now, events)
+        self._emit(events)
+        return removed
+
+    def cancel_matching(self, level: str, prefix: str, now: Optional[float] = None) -> list[str]:
+        """Cancel every active alarm of ``level`` whose name starts with ``prefix``."""
+        now = self._clock() if now is None else now
+        events: list = []
+        with self._lock:
+            self._advance(now, events)
+            names = [n for n in self._active[level] if n.startswith(prefix)]
+            for name in names:
+                self._remove(level, name, 'cancel', now, events)
+        self._emit(events)
+        return names
+
+    def cancel_all(self, now: Optional[float] = None, levels: Iterable[str] = LEVELS) -> int:
+        now = self._clock() if now is None else now
+        events: list = []
+        removed = 0
+        with self._lock:
+            self._advance(now, events)
+            for level in levels:
+                for name in list(self._active[level]):
+                    removed += self._remove(level, name, 'cancel', now, events)
+        self._emit(events)
+        return removed
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Advance the timer wheel; returns the number of alarms expired."""
+        now = self._clock() if now is None else now
+        events: list = []
+        with self._lock:
+            self._advance(now, events)
+        self._emit(events)
+        return len(events)
+
+    # ----- Reads -----
+    def snapshot(self) -> dict:
+        """Immutable view ``{'oblast': {name: {'since', 'last'}}, 'raion': {...}, 'version'}``."""
+        events: list = []
+        with self._lock:
+            self._advance(self._clock(), events)
+            snap = self._snapshot
+            if snap is None:
+                snap = {level: {a.name: {'since': a.since, 'last': a.last} for a in alarms.values()}
+                        for level, alarms in self._active.items()}
+                snap['version'] = self.version
+                self._snapshot = snap
+        self._emit(events)
+        return snap
+
+    def count(self, level: str) -> int:
+        return len(self._active[level])
+
+    # ----- Persistence -----
+    def load(self) -> 'AlarmStateEngine':
+        """Restore alarms persisted by a previous process; stale rows are expired.
+
+        Runs in the background, so ingest may already have touched a region:
+        a live alarm is merged (earliest ``since``, latest ``last``) and one
+        cancelled since startup is not brought back.
+        """
+        if self._conn_factory is None:
+            return self
+        try:
+            with self._conn_factory() as conn:
+                for stmt in SCHEMA:
+                    conn.execute(stmt)
+                rows = conn.execute("SELECT level, name, since, last FROM alarms").fetchall()
+        except Exception as exc:
+            log.warning(f"Alarm state: restore failed: {exc}")
+            return self
+        now = self._clock()
+        cutoff = now - self.ttl_seconds
+        restored = 0
+        with self._lock:
+            for level, name, since, last in rows:
+                if level not in self._active:
+                    continue
+                current = self._active[level].get(name)
+                if current is not None:
+                    current.since = min(current.since, since)
+                    current.last = max(current.last, last)
+                    self._schedule(current)
+                    self._dirty[(level, name)] = (current.since, current.last)
+                    restored += 1
+                    continue
+                if (level, name) in self._dirty:
+                    continue  # cancelled or expired since startup; the pending delete stands
+                if last < cutoff:
+                    self._dirty[(level, name)] = None
+                    self._events.append((level, name, 'expire', now))
+                    continue
+                alarm = _Alarm(level, name, since, last, -1)
+                self._active[level][name] = alarm
+                self._schedule(alarm)
+                restored += 1
+            self.version += 1
+            self._snapshot = None
+        log.info(f"Alarm state: restored {restored} active alarms ({len(rows) - restored} stale)")
+        return self
+
+    def flush(self) -> int:
+        """Write pending rows and events in one transaction; returns rows written."""
+        with self._lock:
+            if not self._dirty and not self._events:
+                return 0
+            dirty, self._dirty = self._dirty, {}
+            events, self._events = self._events, []
+        if self._conn_factory is None:
+            return 0
+        start = time.perf_counter()
+        upserts = [(alarm_key(level, name), level, name, row[0], row[1])
+                   for (level, name), row in dirty.items() if row is not None]
+        deletes = [(alarm_key(level, name),) for (level, name), row in dirty.items() if row is None]
+        log_rows = [(uuid.uuid4().hex[:12], level, name, event, ts) for level, name, event, ts in events]
+        try:
+            with self._conn_factory() as conn:
+                if deletes:
+                    conn.executemany("DELETE FROM alarms WHERE id=?", deletes)
+                if upserts:
+                    conn.executemany("INSERT OR REPLACE INTO alarms (id,level,name,since,last) VALUES (?,?,?,?,?)",
+                                     upserts)
+                if log_rows:
+                    conn.executemany("INSERT INTO alarm_events (id,level,name,event,ts) VALUES (?,?,?,?,?)",
+                                     log_rows)
+        except Exception as exc:
+            self.flush_failures += 1
+            log.warning(f"Alarm state: flush of {len(dirty)} rows / {len(events)} events failed: {exc}")
+            with self._lock:
+                # Re-queue; transitions recorded since take precedence
+                for key, row in dirty.items():
+                    self._dirty.setdefault(key, row)
+                self._events[:0] = events
+            return 0
+        written = len(upserts) + len(deletes) + len(log_rows)
+        self.flushes += 1
+        self.rows_written += written
+        self.last_flush = self._clock()
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+        return written
+
+    def tick(self) -> int:
+        """Periodic job: expire due alarms, then flush the pending batch."""
+        self.expire()
+        return self.flush()
+
+    # ----- Introspection -----
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'active': {level: len(alarms) for level, alarms in self._active.items()},
+                'wheel_slots': len(self._wheel),
+                'version': self.version,
+                'transitions': dict(self.transitions),
+                'pending_rows': len(self._dirty),
+                'pending_events': len(self._events),
+                'dropped_events': self.dropped_events,
+                'flushes': self.flushes,
+                'flush_failures': self.flush_failures,
+                'rows_written': self.rows_written,
+                'last_flush': self.last_flush,
+                'last_flush_ms': self.last_flush_ms,
+            }
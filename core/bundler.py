@@ -0,0 +1,273 @@
+"""
+Server-side asset bundling for rendered templates.
+
+The map pages carry ~200 KB of inline ``<script>``/``<style>``, which browsers
+cannot cache apart from the HTML. :meth:`AssetBundler.extract` takes a
+rendered page, moves every inline block above ``min_size`` into a
+content-addressed bundle (``/bundles/<sha256[:16]>.js|.css``, with gzip and
+brotli variants built once) and leaves a ``<script src>`` / ``<link>`` in its
+place, so the HTML becomes a small shell and the bundles are cached as
+immutable.
+
+Execution order is unchanged: an external classic script without
+``async``/``defer`` blocks the parser exactly where the inline one ran.
+Scripts are therefore kept whole (one bundle per block - splitting would
+break hoisting and ``let``/``const`` scoping between pieces). Stylesheets
+are split at top-level rule boundaries with content-defined chunking, so the
+rules the template variants have in common land in byte-identical chunks and
+are downloaded once for all of them. Identical scripts across variants share
+a bundle the same way.
+
+Bundle names depend on content only, so every worker (and every restart)
+produces the same URLs for the same templates.
+
+Usage:
+    from core.bundler import AssetBundler
+
+    BUNDLER = AssetBundler(url_prefix='/bundles/')
+    shell = BUNDLER.extract(render_template('index.html'), page='index')
+    bundle = BUNDLER.get('1a2b3c4d5e6f7a8b.js')
+    body, encoding = BUNDLER.select(bundle, request.headers.get('Accept-Encoding', ''))
+"""
+
+import gzip
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from core.static_manifest import _parse_accept_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+MIMETYPES = {'js': 'application/javascript; charset=utf-8', 'css': 'text/css; charset=utf-8'}
+JS_TYPES = frozenset({'', 'text/javascript', 'application/javascript', 'module'})
+
+_BLOCK = re.compile(r'<(script|style)\b([^>]*)>(.*?)</\1\s*>', re.S | re.I)
+_ATTR = re.compile(r'''([^\s=/]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+))?''')
+# Attributes that only mean something on external scripts (would change timing) or on inline blocks
+_DROP_ATTRS = frozenset({'src', 'async', 'defer', 'type'})
+
+
+def _attrs(raw: str) -> dict[str, Optional[str]]:
+    out: dict[str, Optional[str]] = {}
+    for name, value in _ATTR.findall(raw):
+        out[name.lower()] = value.strip('"\'') if value else None
+    return out
+
+
+def _render_attrs(attrs: dict[str, Optional[str]]) -> str:
+    return ''.join(f' {k}' if v is None else f' {k}="{v}"' for k, v in attrs.items())
+
+
+def css_rules(css: str) -> list[str]:
+    """Split a stylesheet into top-level statements (rules, at-rules), keeping every byte."""
+    rules = []
+    depth = 0
+    start = 0
+    i = 0
+    n = len(css)
+    while i < n:
+        ch = css[i]
+        if ch == '/' and css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if ch in '"\'':
+            end = i + 1
+            while end < n and css[end] != ch:
+                end += 2 if css[end] == '\\' else 1
+            i = end + 1
+            continue
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth = max(0, depth - 1)
+            if depth == 0:
+                rules.append(css[start:i + 1])
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            rules.append(css[start:i + 1])  # @import / @charset
+            start = i + 1
+        i += 1
+    if css[start:].strip():
+        rules.append(css[start:])
+    return rules
+
+
+def chunk_rules(rules: list[str], target: int, min_size: int) -> list[str]:
+    """Group rules into chunks whose boundaries depend only on rule content."""
+    chunks = []
+    current: list[str] = []
+    size = 0
+    divisor = max(1, target // 256)  # fixed, so boundaries do not depend on the rest of the sheet
+    for rule in rules:
+        current.append(rule)
+        size += len(rule)
+        boundary = int(hashlib.md5(rule.strip().encode('utf-8')).hexdigest()[:8], 16) % divisor == 0
+        if size >= min_size and (boundary or size >= target * 4):
+            chunks.append(''.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+
+class Bundle:
+    __slots__ = ('name', 'kind', 'body', 'gzip', 'br', 'etag', 'mimetype', 'created', 'retired')
+
+    def __init__(self, name: str, kind: str, body: bytes, now: float) -> None:
+        self.name = name
+        self.kind = kind
+        self.body = body
+        self.gzip: Optional[bytes] = None
+        self.br: Optional[bytes] = None
+        self.etag = name.split('.')[0]
+        self.mimetype = MIMETYPES[kind]
+        self.created = now
+        self.retired: Optional[float] = None  # no longer referenced by any page since
+
+
+class AssetBundler:
+    """Content-addressed JS/CSS bundles extracted from rendered pages."""
+
+    def __init__(
+        self,
+        url_prefix: str = '/bundles/',
+        min_size: int = 1024,
+        css_chunk_size: int = 8 * 1024,
+        retain_seconds: float = 86400.0,
+        gzip_level: int = 9,
+        brotli_quality: int = 11,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.url_prefix = url_prefix
+        self.min_size = min_size
+        self.css_chunk_size = css_chunk_size
+        self.retain_seconds = retain_seconds
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._bundles: dict[str, Bundle] = {}
+        self._pages: dict[str, set[str]] = {}   # page -> bundle names it references
+        self.extractions = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    # ----- Extraction -----
+    def extract(self, html: str, page: str) -> str:
+        """Replace large inline scripts/styles in ``html`` with bundle references."""
+        names: list[str] = []
+
+        def replace(match: re.Match) -> str:
+            tag, raw_attrs, content = match.group(1).lower(), match.group(2), match.group(3)
+            attrs = _attrs(raw_attrs)
+            # Blocks with an id may be looked up or rewritten by page code - keep them inline
+            if len(content.strip()) < self.min_size or 'src' in attrs or 'id' in attrs:
+                return match.group(0)
+            if tag == 'script':
+                script_type = (attrs.get('type') or '').lower()
+                if script_type not in JS_TYPES:
+                    return match.group(0)  # JSON-LD, templates, etc. stay inline
+                name = self._store(content, 'js')
+                names.append(name)
+                kept = {k: v for k, v in attrs.items() if k not in _DROP_ATTRS}
+                type_attr = ' type="module"' if script_type == 'module' else ''
+                return f'<script{type_attr} src="{self.url_prefix}{name}"{_render_attrs(kept)}></script>'
+            links = []
+            kept = {k: v for k, v in attrs.items() if k not in _DROP_ATTRS}
+            for chunk in chunk_rules(css_rules(content), self.css_chunk_size, self.min_size):
+                name = self._store(chunk, 'css')
+                names.append(name)
+                links.append(f'<link rel="stylesheet" href="{self.url_prefix}{name}"{_render_attrs(kept)}>')
+            return ''.join(links)
+
+        shell = _BLOCK.sub(replace, html)
+        now = self._clock()
+        with self._lock:
+            previous = self._pages.get(page, set())
+            self._pages[page] = set(names)
+            referenced = set().union(*self._pages.values())
+            for name in previous - referenced:
+                bundle = self._bundles.get(name)
+                if bundle is not None and bundle.retired is None:
+                    bundle.retired = now
+            for name in names:
+                self._bundles[name].retired = None
+            self._prune(now)
+            self.extractions += 1
+            self.bytes_in += len(html)
+            self.bytes_out += len(shell)
+        if names:
+            log.info(f"Bundler: {page} {len(html) // 1024} KB -> {len(shell) // 1024} KB shell + {len(names)} bundles")
+        return shell
+
+    def _store(self, content: str, kind: str) -> str:
+        data = content.strip().encode('utf-8')
+        name = f"{hashlib.sha256(data).hexdigest()[:16]}.{kind}"
+        with self._lock:
+            if name in self._bundles:
+                return name
+        bundle = Bundle(name, kind, data, self._clock())
+        gz = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        if len(gz) < len(data) * 0.95:
+            bundle.gzip = gz
+        if brotli is not None:
+            br = brotli.compress(data, quality=self.brotli_quality)
+            if len(br) < len(gz if bundle.gzip else data):
+                bundle.br = br
+        with self._lock:
+            self._bundles.setdefault(name, bundle)
+        return name
+
+    def _prune(self, now: float) -> None:
+        # Retired bundles stay servable for a while: clients may hold an older shell
+        for name in [n for n, b in self._bundles.items()
+                     if b.retired is not None and now - b.retired > self.retain_seconds]:
+            del self._bundles[name]
+
+    # ----- Serving -----
+    def get(self, name: str) -> Optional[Bundle]:
+        return self._bundles.get(name)
+
+    @staticmethod
+    def select(bundle: Bundle, accept_encoding: str) -> tuple[bytes, Optional[str]]:
+        """Pick the best stored body for the client's Accept-Encoding."""
+        if bundle.gzip is None and bundle.br is None:
+            return bundle.body, None
+        accepted = _parse_accept_encoding(accept_encoding)
+        if bundle.br is not None and accepted.get('br', 0) > 0:
+            return bundle.br, 'br'
+        if bundle.gzip is not None and accepted.get('gzip', accepted.get('*', 0)) > 0:
+            return bundle.gzip, 'gzip'
+        return bundle.body, None
+
+    # ----- Introspection -----
+    def memory_bytes(self) -> int:
+        return sum(len(b.body) + len(b.gzip or b'') + len(b.br or b'') for b in list(self._bundles.values()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            shared = {}
+            for names in self._pages.values():
+                for name in names:
+                    shared[name] = shared.get(name, 0) + 1
+            return {
+                'bundles': len(self._bundles),
+                'retired': sum(1 for b in self._bundles.values() if b.retired is not None),
+                'shared': sum(1 for count in shared.values() if count > 1),
+                'pages': {page: len(names) for page, names in self._pages.items()},
+                'memory_bytes': sum(len(b.body) + len(b.gzip or b'') + len(b.br or b'') for b in self._bundles.values()),
+                'extractions': self.extractions,
+                'html_bytes_in': self.bytes_in,
+                'html_bytes_out': self.bytes_out,
+                'brotli_available': brotli is not None,
+            }
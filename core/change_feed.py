@@ -0,0 +1,175 @@
+"""
+Versioned change feed for polling map clients.
+
+The feed holds the current state of a few keyed collections (markers, alarm
+regions, trajectories). Producers publish whole collections
+(:meth:`ChangeFeed.replace`) or single items (:meth:`ChangeFeed.put` /
+:meth:`ChangeFeed.remove`); only items whose content actually changed are
+recorded. Every publish that changes something bumps ``version`` once and
+appends its changes to a bounded replay buffer.
+
+A client sends the ``version`` (and ``epoch``) of its last response;
+:meth:`ChangeFeed.since` answers with the items upserted and the keys
+removed after that version, coalesced per key. When the version is older
+than the replay buffer, newer than the feed, or from another process
+(``epoch`` differs - version counters restart with the process), the answer
+is a full snapshot instead. Encoded answers are cached per
+``(since, version)``, so a crowd of clients at the same version costs one
+serialization.
+
+Wire format (compact keys)::
+
+    {"e": epoch, "v": 42, "u": {"m": [...], "a": [...]}, "r": {"t": ["id", ...]}}
+    {"e": epoch, "v": 42, "full": 1, "u": {...every item...}}
+
+Usage:
+    from core.change_feed import ChangeFeed
+
+    FEED = ChangeFeed(('m', 'a', 't'), buffer_size=4096)
+    FEED.replace('a', {'14': {'i': '14', 'k': 'S'}})   # diff against current alarms
+    FEED.put('t', track_id, {...}); FEED.remove('t', track_id)
+    body, version = FEED.since(client_version, client_epoch)
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Optional
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class ChangeFeed:
+    """Keyed collections with a version counter and a bounded replay log of changes."""
+
+    def __init__(
+        self,
+        collections: tuple[str, ...],
+        buffer_size: int = 4096,
+        cache_size: int = 64,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.collections = collections
+        self.epoch = uuid.uuid4().hex[:8]
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state: dict[str, dict[str, Any]] = {name: {} for name in collections}
+        self._log: deque[tuple[int, str, str, bool]] = deque(maxlen=buffer_size)  # (version, coll, key, removed)
+        self._bodies: dict[int, bytes] = {}   # since -> body, for the current version
+        self._cache_size = cache_size
+        self.version = 0
+        self._floor = 0
+        self.updated_at: Optional[float] = None
+        self.publishes = 0
+        self.deltas_served = 0
+        self.snapshots_served = 0
+        self.body_builds = 0
+
+    # ----- Publishing -----
+    def _commit(self, changes: list[tuple[str, str, bool]]) -> int:
+        # caller holds the lock
+        if not changes:
+            return 0
+        self.version += 1
+        self.updated_at = self._clock()
+        for coll, key, removed in changes:
+            if len(self._log) == self._log.maxlen:
+                self._floor = self._log[0][0]  # that version is no longer complete in the log
+            self._log.append((self.version, coll, key, removed))
+        self._bodies.clear()
+        self.publishes += 1
+        return len(changes)
+
+    def put(self, coll: str, key: str, item: Any) -> bool:
+        with self._lock:
+            if self._state[coll].get(key) == item:
+                return False
+            self._state[coll][key] = item
+            return bool(self._commit([(coll, key, False)]))
+
+    def remove(self, coll: str, key: str) -> bool:
+        with self._lock:
+            if self._state[coll].pop(key, None) is None:
+                return False
+            return bool(self._commit([(coll, key, True)]))
+
+    def replace(self, coll: str, items: dict[str, Any]) -> int:
+        """Make ``coll`` equal to ``items``; returns the number of changed keys (one version bump)."""
+        with self._lock:
+            current = self._state[coll]
+            changes = [(coll, key, True) for key in current if key not in items]
+            changes += [(coll, key, False) for key, item in items.items() if current.get(key) != item]
+            if changes:
+                self._state[coll] = dict(items)
+            return self._commit(changes)
+
+    # ----- Reading -----
+    def oldest(self) -> int:
+        """Oldest version a delta can start from."""
+        return self._floor
+
+    def since(self, version: Optional[int], epoch: Optional[str] = None) -> tuple[bytes, int]:
+        """Encoded delta after ``version`` (or a full snapshot) and the current version."""
+        with self._lock:
+            full = (version is None or epoch != self.epoch or version > self.version
+                    or version < self.oldest())
+            since = -1 if full else version
+            body = self._bodies.get(since)
+            if body is None:
+                body = self._snapshot() if full else self._delta(since)
+                if len(self._bodies) >= self._cache_size:
+                    self._bodies.clear()
+                self._bodies[since] = body
+                self.body_builds += 1
+            if full:
+                self.snapshots_served += 1
+            else:
+                self.deltas_served += 1
+            return body, self.version
+
+    def _snapshot(self) -> bytes:
+        return _dumps({'e': self.epoch, 'v': self.version, 'full': 1,
+                       'u': {coll: list(items.values()) for coll, items in self._state.items()}})
+
+    def _delta(self, since: int) -> bytes:
+        touched: dict[tuple[str, str], bool] = {}
+        # Newest entries last; walk back to ``since`` and keep the latest change per key
+        for version, coll, key, removed in reversed(self._log):
+            if version <= since:
+                break
+            touched.setdefault((coll, key), removed)
+        upserts: dict[str, list] = {}
+        removals: dict[str, list] = {}
+        for (coll, key), removed in touched.items():
+            item = self._state[coll].get(key)
+            if removed or item is None:
+                removals.setdefault(coll, []).append(key)
+            else:
+                upserts.setdefault(coll, []).append(item)
+        payload: dict[str, Any] = {'e': self.epoch, 'v': self.version}
+        if upserts:
+            payload['u'] = upserts
+        if removals:
+            payload['r'] = removals
+        return _dumps(payload)
+
+    # ----- Introspection -----
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'epoch': self.epoch,
+                'version': self.version,
+                'oldest_delta_version': self.oldest(),
+                'buffered_changes': len(self._log),
+                'buffer_size': self._log.maxlen,
+                'items': {coll: len(items) for coll, items in self._state.items()},
+                'updated_at': self.updated_at,
+                'publishes': self.publishes,
+                'deltas_served': self.deltas_served,
+                'snapshots_served': self.snapshots_served,
+                'body_builds': self.body_builds,
+            }
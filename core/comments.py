@@ -0,0 +1,342 @@
+"""
+Anonymous comments with a versioned in-memory tail and batched SQLite writes.
+
+The last ``tail_size`` comments, with their reaction counters, are held in
+memory and loaded from SQLite once (cold start). Every post or reaction
+bumps ``version``; the serialized JSON body and its content-hash ETag are
+built once per version, so polling clients get either a 304 or pre-encoded
+bytes and never touch the database.
+
+Writes are batched: new comments and reaction toggles update memory
+immediately and are queued; :meth:`CommentStore.flush` (a periodic job)
+writes the queue in one transaction. While the database is unavailable the
+queue is capped at ``max_pending`` operations per kind; the oldest are
+dropped and counted in :meth:`stats`. Reactions live in ``comment_reactions``
+(one row per comment, emoji and reactor) with aggregate counts in
+``comment_reaction_counts``, so the tail loads counts without grouping the
+raw rows. Reactors are stored as salted hashes, never raw IPs; a legacy
+``comment_reactions(id, comment_id, emoji, user_ip, timestamp)`` table is
+migrated into that layout (IPs hashed) on load.
+
+Usage:
+    from core.comments import CommentStore
+
+    COMMENTS = CommentStore(conn_factory=db_conn, tail_size=500).load()
+    COMMENTS.add('Тиша у Києві', reply_to=None)
+    COMMENTS.toggle_reaction(comment_id, '🔥', ip)   # {'action': 'added', 'reactions': {'🔥': 3}}
+    body, etag = COMMENTS.page(80)                    # cached per version
+    COMMENTS.flush()                                  # periodic job
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+log = logging.getLogger(__name__)
+
+ALLOWED_REACTIONS = ('👍', '❤️', '🔥', '😢', '😡', '😂', '👎')
+MAX_TEXT_LENGTH = 800
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS comments ("
+    " id TEXT PRIMARY KEY, text TEXT NOT NULL, ts TEXT NOT NULL,"
+    " epoch REAL NOT NULL, reply_to TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_comments_epoch ON comments(epoch)",
+    "CREATE TABLE IF NOT EXISTS comment_reactions ("
+    " comment_id TEXT NOT NULL, emoji TEXT NOT NULL, reactor TEXT NOT NULL, ts REAL NOT NULL,"
+    " PRIMARY KEY (comment_id, emoji, reactor))",
+    "CREATE TABLE IF NOT EXISTS comment_reaction_counts ("
+    " comment_id TEXT NOT NULL, emoji TEXT NOT NULL, count INTEGER NOT NULL DEFAULT 0,"
+    " PRIMARY KEY (comment_id, emoji))",
+)
+LEGACY_REACTION_COLUMNS = {'user_ip', 'timestamp'}
+
+
+class _Comment:
+    __slots__ = ('id', 'text', 'ts', 'epoch', 'reply_to', 'reactions', 'reactors')
+
+    def __init__(self, id: str, text: str, ts: str, epoch: float, reply_to: Optional[str]) -> None:
+        self.id = id
+        self.text = text
+        self.ts = ts
+        self.epoch = epoch
+        self.reply_to = reply_to
+        self.reactions: dict[str, int] = {}
+        self.reactors: dict[str, set[str]] = {}  # emoji -> reactor hashes
+
+    def to_json(self) -> dict:
+        item = {'id': self.id, 'text': self.text, 'ts': self.ts}
+        if self.reply_to:
+            item['reply_to'] = self.reply_to
+        if self.reactions:
+            item['reactions'] = dict(self.reactions)
+        return item
+
+
+class CommentStore:
+    """Recent comments + reactions in memory, persisted to SQLite in batches."""
+
+    def __init__(
+        self,
+        conn_factory: Optional[Callable[[], Any]] = None,
+        tail_size: int = 500,
+        salt: str = '',
+        max_pending: int = 5000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.tail_size = tail_size
+        self.max_pending = max_pending
+        self._conn_factory = conn_factory
+        self._salt = salt
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tail: OrderedDict[str, _Comment] = OrderedDict()
+        self._pages: dict[int, tuple[bytes, str]] = {}   # limit -> (body, etag) for self.version
+        self._pending_comments: list[tuple] = []
+        self._pending_reactions: list[tuple[str, str, str, float, int]] = []  # (+1 add / -1 remove)
+        self.version = 0
+        self.loaded = False
+        self.flushes = 0
+        self.flush_failures = 0
+        self.rows_written = 0
+        self.dropped_comments = 0
+        self.dropped_reactions = 0
+        self.page_builds = 0
+        self.last_flush_ms: Optional[float] = None
+
+    def _reactor(self, ip: str) -> str:
+        return hashlib.sha256(f"{self._salt}:{ip}".encode('utf-8')).hexdigest()[:16]
+
+    def _cap_pending(self) -> None:
+        """Drop the oldest queued operations beyond ``max_pending`` (caller holds the lock)."""
+        over = len(self._pending_comments) - self.max_pending
+        if over > 0:
+            del self._pending_comments[:over]
+            self.dropped_comments += over
+        over = len(self._pending_reactions) - self.max_pending
+        if over > 0:
+            del self._pending_reactions[:over]
+            self.dropped_reactions += over
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._pages.clear()
+
+    # ----- Cold start -----
+    def _migrate_legacy_reactions(self, conn) -> int:
+        """Move a pre-existing per-IP ``comment_reactions`` table into the hashed layout; returns rows moved."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(comment_reactions)").fetchall()}
+        if not LEGACY_REACTION_COLUMNS <= columns or 'reactor' in columns:
+            return 0
+        conn.execute("ALTER TABLE comment_reactions RENAME TO comment_reactions_legacy")
+        for stmt in SCHEMA:
+            conn.execute(stmt)
+        legacy = conn.execute(
+            "SELECT comment_id, emoji, user_ip, timestamp FROM comment_reactions_legacy").fetchall()
+        conn.executemany(
+            "INSERT OR IGNORE INTO comment_reactions (comment_id, emoji, reactor, ts) VALUES (?,?,?,?)",
+            [(cid, emoji, self._reactor(ip), ts or 0) for cid, emoji, ip, ts in legacy])
+        conn.execute("DELETE FROM comment_reaction_counts")
+        conn.execute(
+            "INSERT INTO comment_reaction_counts (comment_id, emoji, count) "
+            "SELECT comment_id, emoji, COUNT(*) FROM comment_reactions GROUP BY comment_id, emoji")
+        conn.execute("DROP TABLE comment_reactions_legacy")
+        log.info(f"Comments: migrated {len(legacy)} legacy reactions")
+        return len(legacy)
+
+    def load(self) -> 'CommentStore':
+        """Create tables and load the tail (with reaction counts and reactors) from SQLite."""
+        if self._conn_factory is None:
+            self.loaded = True
+            return self
+        try:
+            with self._conn_factory() as conn:
+                self._migrate_legacy_reactions(conn)
+                for stmt in SCHEMA:
+                    conn.execute(stmt)
+                rows = conn.execute(
+                    "SELECT id, text, ts, epoch, reply_to FROM comments ORDER BY epoch DESC LIMIT ?",
+                    (self.tail_size,)).fetchall()
+                ids = [r[0] for r in rows]
+                counts, reactors = [], []
+                if ids:
+                    marks = ','.join('?' * len(ids))
+                    counts = conn.execute(
+                        f"SELECT comment_id, emoji, count FROM comment_reaction_counts "
+                        f"WHERE comment_id IN ({marks}) AND count > 0", ids).fetchall()
+                    reactors = conn.execute(
+                        f"SELECT comment_id, emoji, reactor FROM comment_reactions WHERE comment_id IN ({marks})",
+                        ids).fetchall()
+        except Exception as exc:
+            log.warning(f"Comments: load failed: {exc}")
+            return self
+        with self._lock:
+            loaded: OrderedDict[str, _Comment] = OrderedDict()
+            for cid, text, ts, epoch, reply_to in reversed(rows):
+                loaded[cid] = _Comment(cid, text, ts, epoch, reply_to)
+            for cid, emoji, count in counts:
+                loaded[cid].reactions[emoji] = count
+            for cid, emoji, reactor in reactors:
+                loaded[cid].reactors.setdefault(emoji, set()).add(reactor)
+            # Comments posted before the load finished stay on top
+            for cid, comment in self._tail.items():
+                loaded.setdefault(cid, comment)
+            self._tail = loaded
+            self._trim()
+            self.loaded = True
+            self._changed()
+        log.info(f"Comments: loaded {len(rows)} recent comments")
+        return self
+
+    def _trim(self) -> None:
+        while len(self._tail) > self.tail_size:
+            self._tail.popitem(last=False)
+
+    # ----- Writes -----
+    def add(self, text: str, reply_to: Optional[str] = None) -> dict:
+        now = self._clock()
+        comment = _Comment(
+            uuid.uuid4().hex[:10],
+            text[:MAX_TEXT_LENGTH],
+            datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            now,
+            reply_to,
+        )
+        with self._lock:
+            self._tail[comment.id] = comment
+            self._trim()
+            self._pending_comments.append((comment.id, comment.text, comment.ts, comment.epoch, comment.reply_to))
+            self._cap_pending()
+            self._changed()
+        return comment.to_json()
+
+    def toggle_reaction(self, comment_id: str, emoji: str, ip: str) -> dict:
+        """Add or remove ``ip``'s ``emoji`` on a comment in the tail.
+
+        Returns ``{'action': 'added' | 'removed' | 'not_found', 'reactions': {...}}``.
+        """
+        reactor = self._reactor(ip)
+        with self._lock:
+            comment = self._tail.get(comment_id)
+            if comment is None:
+                return {'action': 'not_found', 'reactions': {}}
+            who = comment.reactors.setdefault(emoji, set())
+            if reactor in who:
+                who.discard(reactor)
+                count = comment.reactions.get(emoji, 1) - 1
+                if count > 0:
+                    comment.reactions[emoji] = count
+                else:
+                    comment.reactions.pop(emoji, None)
+                action, delta = 'removed', -1
+            else:
+                who.add(reactor)
+                comment.reactions[emoji] = comment.reactions.get(emoji, 0) + 1
+                action, delta = 'added', 1
+            self._pending_reactions.append((comment_id, emoji, reactor, self._clock(), delta))
+            self._cap_pending()
+            self._changed()
+            return {'action': action, 'reactions': dict(comment.reactions)}
+
+    def flush(self) -> int:
+        """Write queued comments, then reaction toggles, one transaction each; returns operations written.
+
+        The two batches fail independently: a reaction error never holds back comments.
+        """
+        with self._lock:
+            comments, self._pending_comments = self._pending_comments, []
+            reactions, self._pending_reactions = self._pending_reactions, []
+        if not comments and not reactions:
+            return 0
+        if self._conn_factory is None:
+            return 0
+        start = time.perf_counter()
+        written = 0
+        if comments:
+            try:
+                with self._conn_factory() as conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO comments (id, text, ts, epoch, reply_to) VALUES (?,?,?,?,?)",
+                        comments)
+                written += len(comments)
+            except Exception as exc:
+                self.flush_failures += 1
+                log.warning(f"Comments: flush of {len(comments)} comments failed: {exc}")
+                with self._lock:
+                    self._pending_comments[:0] = comments
+                    self._cap_pending()
+        if reactions:
+            try:
+                with self._conn_factory() as conn:
+                    self._write_reactions(conn, reactions)
+                written += len(reactions)
+            except Exception as exc:
+                self.flush_failures += 1
+                log.warning(f"Comments: flush of {len(reactions)} reactions failed: {exc}")
+                with self._lock:
+                    self._pending_reactions[:0] = reactions
+                    self._cap_pending()
+        if not written:
+            return 0
+        self.flushes += 1
+        self.rows_written += written
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+        return written
+
+    @staticmethod
+    def _write_reactions(conn, reactions: list) -> None:
+        for comment_id, emoji, reactor, ts, delta in reactions:
+            if delta > 0:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO comment_reactions (comment_id, emoji, reactor, ts) VALUES (?,?,?,?)",
+                    (comment_id, emoji, reactor, ts))
+            else:
+                cur = conn.execute(
+                    "DELETE FROM comment_reactions WHERE comment_id=? AND emoji=? AND reactor=?",
+                    (comment_id, emoji, reactor))
+            if cur.rowcount:
+                conn.execute(
+                    "INSERT INTO comment_reaction_counts (comment_id, emoji, count) VALUES (?,?,?) "
+                    "ON CONFLICT(comment_id, emoji) DO UPDATE SET count = MAX(0, count + excluded.count)",
+                    (comment_id, emoji, delta))
+
+    # ----- Reads -----
+    def page(self, limit: int = 80) -> tuple[bytes, str]:
+        """Serialized ``{'ok': True, 'items': [...]}`` for the newest ``limit`` comments, and its ETag."""
+        with self._lock:
+            cached = self._pages.get(limit)
+            if cached is not None:
+                return cached
+            items = [c.to_json() for c in list(self._tail.values())[-limit:]]
+            body = json.dumps({'ok': True, 'items': items}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            cached = (body, hashlib.sha256(body).hexdigest()[:16])
+            self._pages[limit] = cached
+            self.page_builds += 1
+            return cached
+
+    def __len__(self) -> int:
+        return len(self._tail)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'loaded': self.loaded,
+                'tail': len(self._tail),
+                'version': self.version,
+                'reactors': sum(len(s) for c in self._tail.values() for s in c.reactors.values()),
+                'pending_comments': len(self._pending_comments),
+                'pending_reactions': len(self._pending_reactions),
+                'dropped_comments': self.dropped_comments,
+                'dropped_reactions': self.dropped_reactions,
+                'page_builds': self.page_builds,
+                'flushes': self.flushes,
+                'flush_failures': self.flush_failures,
+                'rows_written': self.rows_written,
+                'last_flush_ms': self.last_flush_ms,
+            }
@@ -0,0 +1,188 @@
+"""
+Streaming exports: NDJSON / JSON bodies produced by generators.
+
+Bulk endpoints hand a ``(cursor, record)`` iterator (usually
+``MessageStore.scan``) to one of the writers below and return the generator
+as a streamed response, so memory stays constant however many rows are sent:
+
+* :func:`ndjson_chunks` - one JSON object per line, then a ``_meta`` trailer
+  line with the row count and a resume cursor;
+* :func:`json_envelope_chunks` - the usual ``{"status": "ok", "data": [...]}``
+  envelope, written incrementally with ``count``/``cursor`` at the end;
+* :func:`gzip_chunks` - optional streaming gzip on top of either.
+
+Time-range filters compare the stored ``date`` strings
+(``YYYY-MM-DD HH:MM:SS``, local time) directly, so no per-row datetime parsing.
+
+Usage:
+    from core.export import ExportWindow, ndjson_chunks, gzip_chunks
+
+    window = ExportWindow.from_args(request.args, tz=kyiv_tz)
+    rows = window.apply(MESSAGE_STORE.scan(after=window.cursor))
+    body = ndjson_chunks(rows)
+    return Response(stream_with_context(gzip_chunks(body)), mimetype='application/gzip')
+"""
+
+import json
+import zlib
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+CHUNK_BYTES = 64 * 1024
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+Row = tuple[str, dict]
+
+
+def parse_bound(value: Optional[str], tz=None) -> Optional[str]:
+    """Normalize a ``since``/``until`` bound to the stored date format.
+
+    Accepts epoch seconds, ``YYYY-MM-DD``, ``YYYY-MM-DD HH:MM[:SS]`` and ISO
+    ``T``-separated forms. Epoch values are converted to local time in ``tz``.
+    """
+    if value is None or value == '':
+        return None
+    value = value.strip()
+    if value.replace('.', '', 1).isdigit():
+        dt = datetime.fromtimestamp(float(value), tz)
+        return dt.strftime(DATE_FORMAT)
+    value = value.replace('T', ' ')[:19]
+    for fmt in (DATE_FORMAT, '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).strftime(DATE_FORMAT)
+        except ValueError:
+            continue
+    raise ValueError(f"invalid time bound: {value!r}")
+
+
+class ExportWindow:
+    """Time range + resume cursor + row limit for a bulk export."""
+
+    __slots__ = ('since', 'until', 'cursor', 'limit')
+
+    def __init__(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> None:
+        self.since = since
+        self.until = until
+        self.cursor = cursor
+        self.limit = limit
+
+    @classmethod
+    def from_args(cls, args, tz=None, max_limit: Optional[int] = None,
+                  default_limit: Optional[int] = None) -> 'ExportWindow':
+        """Build from request args (``since``, ``until``, ``cursor``, ``limit``); ValueError on bad input."""
+        limit = args.get('limit')
+        limit = int(limit) if limit not in (None, '') else default_limit
+        if limit is not None:
+            if limit <= 0:
+                raise ValueError('limit must be positive')
+            if max_limit is not None:
+                limit = min(limit, max_limit)
+        return cls(
+            since=parse_bound(args.get('since'), tz),
+            until=parse_bound(args.get('until'), tz),
+            cursor=args.get('cursor') or None,
+            limit=limit,
+        )
+
+    def contains(self, msg: dict) -> bool:
+        if self.since is None and self.until is None:
+            return True
+        date = msg.get('date') or ''
+        if not date:
+            return False
+        if self.since is not None and date < self.since:
+            return False
+        if self.until is not None and date > self.until:
+            return False
+        return True
+
+    def apply(self, rows: Iterable[Row]) -> Iterator[Row]:
+        for cursor, msg in rows:
+            if self.contains(msg):
+                yield cursor, msg
+
+
+class _Progress:
+    __slots__ = ('count', 'cursor', 'complete')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.cursor: Optional[str] = None
+        self.complete = True
+
+
+def _records(rows: Iterable[Row], transform: Optional[Callable[[dict], Optional[dict]]],
+             limit: Optional[int], progress: _Progress) -> Iterator[bytes]:
+    for cursor, msg in rows:
+        if limit is not None and progress.count >= limit:
+            progress.complete = False
+            return
+        record = transform(msg) if transform else msg
+        progress.cursor = cursor  # skipped rows still advance the resume point
+        if record is None:
+            continue
+        progress.count += 1
+        yield json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _batched(pieces: Iterable[bytes], size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    buf: list[bytes] = []
+    buffered = 0
+    for piece in pieces:
+        buf.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield b''.join(buf)
+            buf, buffered = [], 0
+    if buf:
+        yield b''.join(buf)
+
+
+def ndjson_chunks(rows: Iterable[Row], transform: Optional[Callable[[dict], Optional[dict]]] = None,
+                  limit: Optional[int] = None, meta: bool = True) -> Iterator[bytes]:
+    """NDJSON body; the last line is ``{"_meta": {"count", "cursor", "complete"}}``."""
+    progress = _Progress()
+
+    def _lines() -> Iterator[bytes]:
+        for record in _records(rows, transform, limit, progress):
+            yield record + b'\n'
+        if meta:
+            trailer = {'count': progress.count, 'cursor': progress.cursor, 'complete': progress.complete}
+            yield json.dumps({'_meta': trailer}, separators=(',', ':')).encode('utf-8') + b'\n'
+
+    return _batched(_lines())
+
+
+def json_envelope_chunks(rows: Iterable[Row], transform: Optional[Callable[[dict], Optional[dict]]] = None,
+                         limit: Optional[int] = None, key: str = 'data',
+                         head: Optional[dict] = None) -> Iterator[bytes]:
+    """``{...head, "<key>": [...], "count": n, "cursor": c, "complete": b}`` written incrementally."""
+    progress = _Progress()
+
+    def _pieces() -> Iterator[bytes]:
+        prefix = json.dumps(head or {}, ensure_ascii=False, separators=(',', ':'))[:-1]
+        yield (prefix + (',' if head else '') + json.dumps(key) + ':[').encode('utf-8')
+        first = True
+        for record in _records(rows, transform, limit, progress):
+            yield record if first else b',' + record
+            first = False
+        tail = {'count': progress.count, 'cursor': progress.cursor, 'complete': progress.complete}
+        yield b'],' + json.dumps(tail, separators=(',', ':')).encode('utf-8')[1:]
+
+    return _batched(_pieces())
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a chunk stream incrementally (constant memory)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
@@ -0,0 +1,228 @@
+"""
+Pre-serialized fusion output: events, markers and trajectories per track.
+
+:class:`FusionOutput` subscribes to a :class:`core.threat_engine.ThreatEngine`
+and, whenever a track is created, updated or removed, re-encodes only that
+track's JSON fragments (event, map marker, trajectory with predicted path).
+``/api/fusion/*`` responses are the cached fragments joined into one body,
+built at most once per output ``version`` and served with a content ETag -
+requests never walk tracks, messages or channel sets.
+
+Usage:
+    from core.fusion_output import FusionOutput
+
+    FUSION = FusionOutput(max_trajectories=150, tz=pytz.timezone('Europe/Kyiv'))
+    FUSION.attach(engine)                      # before engine.seed(...)
+    body, etag = FUSION.body('trajectories')   # b'{"status":"ok","trajectories":[...],"count":12}'
+"""
+
+import hashlib
+import json
+import math
+import threading
+from datetime import datetime
+from typing import Optional
+
+# Cruise speed assumptions for the predicted path (km/h)
+SPEED_KMH = {'shahed': 160.0, 'cruise': 700.0, 'ballistic': 2000.0, 'kab': 300.0}
+DEFAULT_SPEED_KMH = 180.0
+PREDICT_MINUTES = (10, 20, 30)
+BEARING_PROJECTION_KM = 30
+
+_EARTH_KM = 6371.0
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def bearing_deg(a: tuple, b: tuple) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    y = math.sin(lon2 - lon1) * math.cos(lat2)
+    x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
+    return (math.degrees(math.atan2(y, x)) + 360) % 360
+
+
+def project(point: tuple, bearing: float, distance_km: float) -> list:
+    lat1, lon1 = math.radians(point[0]), math.radians(point[1])
+    brng = math.radians(bearing)
+    d = distance_km / _EARTH_KM
+    lat2 = math.asin(math.sin(lat1) * math.cos(d) + math.cos(lat1) * math.sin(d) * math.cos(brng))
+    lon2 = lon1 + math.atan2(math.sin(brng) * math.sin(d) * math.cos(lat1), math.cos(d) - math.sin(lat1) * math.sin(lat2))
+    return [round(math.degrees(lat2), 5), round(math.degrees(lon2), 5)]
+
+
+def _path_km(points: list) -> float:
+    total = 0.0
+    for a, b in zip(points, points[1:]):
+        dlat = math.radians(b[0] - a[0])
+        dlng = math.radians(b[1] - a[1])
+        h = math.sin(dlat / 2) ** 2 + math.cos(math.radians(a[0])) * math.cos(math.radians(b[0])) * math.sin(dlng / 2) ** 2
+        total += 2 * _EARTH_KM * math.asin(math.sqrt(h))
+    return total
+
+
+class _Fragments:
+    __slots__ = ('last_update', 'status', 'event', 'marker', 'trajectory')
+
+    def __init__(self, last_update: float, status: str, event: bytes,
+                 marker: Optional[bytes], trajectory: Optional[bytes]) -> None:
+        self.last_update = last_update
+        self.status = status
+        self.event = event
+        self.marker = marker
+        self.trajectory = trajectory
+
+
+class FusionOutput:
+    """Per-track JSON fragments kept in step with the threat engine."""
+
+    def __init__(self, max_trajectories: int = 150, tz=None) -> None:
+        self.max_trajectories = max_trajectories
+        self._tz = tz
+        self._reliability: dict = {}
+        self._fragments: dict[str, _Fragments] = {}
+        self._bodies: dict[str, tuple[bytes, str]] = {}
+        self._listeners: list = []
+        self._lock = threading.Lock()
+        self.version = 0
+        self.fragment_builds = 0
+        self.body_builds = 0
+
+    def attach(self, engine) -> 'FusionOutput':
+        self._reliability = engine.channel_reliability
+        engine.subscribe(self.on_track)
+        for track in engine.active_tracks():
+            self.on_track(track, False)
+        return self
+
+    # ----- Fragments -----
+    def subscribe(self, fn) -> None:
+        """``fn(track_id, trajectory)`` after each change; ``trajectory`` is None when it is gone."""
+        self._listeners.append(fn)
+
+    def on_track(self, track, removed: bool) -> None:
+        """Engine listener: re-encode (or drop) one track's fragments."""
+        fragments, trajectory = (None, None) if removed else self._build(track)
+        with self._lock:
+            if fragments is None:
+                if self._fragments.pop(track.id, None) is None:
+                    return
+            else:
+                self._fragments[track.id] = fragments
+            self.version += 1
+            self._bodies.clear()
+        for fn in self._listeners:
+            fn(track.id, trajectory)
+
+    def _build(self, track) -> tuple[_Fragments, Optional[dict]]:
+        event = track.to_dict(self._reliability)
+        confidence = event['confidence']
+        event['created_at'] = datetime.fromtimestamp(track.created_at, self._tz).isoformat()
+        event['last_update'] = datetime.fromtimestamp(track.last_update, self._tz).isoformat()
+        marker = None
+        if track.coords:
+            marker = _dumps({
+                'id': track.id,
+                'lat': track.coords[0],
+                'lng': track.coords[1],
+                'threat_type': track.threat_type,
+                'quantity': track.quantity,
+                'quantity_remaining': event['quantity_remaining'],
+                'status': track.status,
+                'confidence': confidence,
+                'direction': track.direction,
+                'region': track.regions[-1] if track.regions else None,
+                'sources': event['sources'],
+                'source_count': event['source_count'],
+                'last_update': event['last_update'],
+            })
+        trajectory = self._trajectory(track, confidence)
+        self.fragment_builds += 1
+        return _Fragments(track.last_update, track.status, _dumps(event), marker,
+                          _dumps(trajectory) if trajectory else None), trajectory
+
+    @staticmethod
+    def _trajectory(track, confidence: float) -> Optional[dict]:
+        route = track.route or {}
+        path = None
+        kind = None
+        if route:
+            try:
+                path = [[float(route['start'][0]), float(route['start'][1])],
+                        [float(route['end'][0]), float(route['end'][1])]]
+            except (KeyError, IndexError, TypeError, ValueError):
+                route = {}
+        if path is None and len(track.trajectory) >= 2:
+            path = [[p[0], p[1]] for p in track.trajectory]
+        elif path is None and track.coords and track.bearing is not None:
+            # Single sighting with a course: project it forward
+            path = [list(track.coords), project(track.coords, track.bearing, BEARING_PROJECTION_KM)]
+            kind = 'ai_bearing_projection'
+        if not path:
+            return None
+
+        speed = route.get('speed_kmh')
+        if not speed and len(track.trajectory) >= 2:
+            first, last = track.trajectory[0], track.trajectory[-1]
+            hours = (last[2] - first[2]) / 3600
+            observed = _path_km(track.trajectory) / hours if hours > 0 else 0
+            speed = observed if 30 <= observed <= 3500 else None
+        speed = speed or SPEED_KMH.get(track.threat_type, DEFAULT_SPEED_KMH)
+        heading = bearing_deg(path[-2], path[-1])
+        predicted = [path[-1]] + [project(path[-1], heading, speed * minutes / 60) for minutes in PREDICT_MINUTES]
+        return {
+            'event_id': track.id,
+            'threat_type': track.threat_type,
+            'actual_path': path,
+            'predicted_path': predicted,
+            'predicted': kind is not None,
+            'kind': kind,
+            'confidence': route.get('confidence') or confidence,
+            'distance_km': route.get('distance_km') or round(_path_km(path), 1),
+            'speed_kmh': round(speed, 1),
+            'eta': route.get('eta'),
+            'source_name': route.get('source_name') or (track.regions[0] if track.regions else None),
+            'target_name': route.get('target_name') or track.direction,
+            'sources': len(track.channels),
+            'last_update': track.last_update,
+        }
+
+    # ----- Bodies -----
+    def body(self, kind: str) -> tuple[bytes, str]:
+        """Response body for ``kind`` (events / markers / trajectories) and its ETag."""
+        with self._lock:
+            cached = self._bodies.get(kind)
+            if cached is not None:
+                return cached
+            ordered = sorted(self._fragments.values(), key=lambda f: f.last_update, reverse=True)
+            if kind == 'events':
+                summary = {'total': len(ordered), 'active': 0, 'destroyed': 0, 'passed': 0}
+                for f in ordered:
+                    summary[f.status if f.status in ('destroyed', 'passed') else 'active'] += 1
+                parts = [f.event for f in ordered]
+                tail = b'],"summary":' + _dumps(summary) + b'}'
+            elif kind == 'markers':
+                parts = [f.marker for f in ordered if f.marker is not None]
+                tail = b'],"count":' + str(len(parts)).encode() + b'}'
+            elif kind == 'trajectories':
+                parts = [f.trajectory for f in ordered if f.trajectory is not None][:self.max_trajectories]
+                tail = b'],"count":' + str(len(parts)).encode() + b'}'
+            else:
+                raise KeyError(kind)
+            body = b'{"status":"ok","' + kind.encode() + b'":[' + b','.join(parts) + tail
+            cached = (body, hashlib.sha256(body).hexdigest()[:16])
+            self._bodies[kind] = cached
+            self.body_builds += 1
+            return cached
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'tracks': len(self._fragments),
+                'markers': sum(1 for f in self._fragments.values() if f.marker is not None),
+                'trajectories': sum(1 for f in self._fragments.values() if f.trajectory is not None),
+                'version': self.version,
+                'fragment_builds': self.fragment_builds,
+                'body_builds': self.body_builds,
+            }
@@ -0,0 +1,522 @@
+"""
+Oblast / raion boundaries: one load, simplified LOD tiers, point-in-polygon.
+
+Boundaries come from the map's own SVGs (``ukraine_states.svg`` - oblasts,
+``ukraine_districts_detailed.svg`` - raions; ids are the alarm API region
+ids the front end styles by). Path data is flattened once into polygon
+rings in the SVG viewBox space. The viewBox is georeferenced with a
+Web-Mercator fit of the country outline (GeoJSON) onto the oblast bounds,
+so ``lat/lng`` converts to map coordinates with four multiply-adds.
+
+* :meth:`RegionGeometry.locate` maps a coordinate to ``(oblast, raion)``
+  through a uniform grid of bbox buckets and an even-odd ring test; points
+  just outside every polygon (coastline, border towns) snap to the nearest
+  edge within ``snap`` map units.
+* :meth:`RegionGeometry.tier` simplifies every ring (Douglas-Peucker) at a
+  per-tier tolerance and quantizes it to an integer grid; the result is
+  encoded as TopoJSON (delta-encoded arcs) or a compact varint binary.
+
+Usage:
+    from core.geometry import RegionGeometry
+
+    GEO = RegionGeometry.from_files('static/ukraine_states.svg', 'static/ukraine_districts_detailed.svg',
+                                    'static/geoBoundaries-UKR-ADM0_simplified.geojson')
+    GEO.locate(50.45, 30.52)            # {'oblast_id': '31', 'oblast': 'м. Київ', 'raion_id': ..., ...}
+    GEO.encode('oblast', 1, 'topojson') # bytes
+"""
+
+import json
+import logging
+import math
+import re
+import struct
+import time
+from typing import Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+# Alarm API region ids used by the oblast SVG
+OBLAST_NAMES = {
+    '3': 'Хмельницька область', '4': 'Вінницька область', '5': 'Рівненська область',
+    '8': 'Волинська область', '9': 'Дніпропетровська область', '10': 'Житомирська область',
+    '11': 'Закарпатська область', '12': 'Запорізька область', '13': 'Івано-Франківська область',
+    '14': 'Київська область', '15': 'Кіровоградська область', '16': 'Луганська область',
+    '17': 'Миколаївська область', '18': 'Одеська область', '19': 'Полтавська область',
+    '20': 'Сумська область', '21': 'Тернопільська область', '22': 'Харківська область',
+    '23': 'Херсонська область', '24': 'Черкаська область', '25': 'Чернігівська область',
+    '26': 'Чернівецька область', '27': 'Львівська область', '28': 'Донецька область',
+    '31': 'м. Київ', '9999': 'АР Крим',
+}
+
+LEVELS = ('oblast', 'raion')
+# Douglas-Peucker tolerance per tier, in viewBox units (the viewBox is 260 wide, ~7 km per unit)
+LOD_TOLERANCE = {0: 0.6, 1: 0.2, 2: 0.05}
+FORMATS = ('topojson', 'bin')
+BINARY_MAGIC = b'NGEO'
+BINARY_VERSION = 1
+
+_TOKEN = re.compile(r'[MmLlCcZz]|-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_PATH = re.compile(r'<path\b([^>]*)>', re.S)
+_ATTR = {name: re.compile(rf'\s{name}="([^"]*)"', re.S) for name in ('id', 'class', 'd')}
+
+
+# ----- SVG parsing -----
+def flatten_path(d: str, curve_steps: int = 4) -> list[list[tuple[float, float]]]:
+    """Rings of an SVG path (M/L/C/Z, absolute and relative); cubic curves are sampled."""
+    tokens = _TOKEN.findall(d)
+    rings: list[list[tuple[float, float]]] = []
+    ring: list[tuple[float, float]] = []
+    x = y = start_x = start_y = 0.0
+    cmd = None
+    i = 0
+
+    def take(n):
+        nonlocal i
+        values = [float(t) for t in tokens[i:i + n]]
+        i += n
+        return values
+
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            cmd = tokens[i]
+            i += 1
+            if cmd in 'Zz':
+                if len(ring) > 2:
+                    rings.append(ring)
+                ring = []
+                x, y = start_x, start_y
+                continue
+        if cmd in 'Mm':
+            nx, ny = take(2)
+            if cmd == 'm':
+                nx, ny = nx + x, ny + y
+            if len(ring) > 2:
+                rings.append(ring)
+            x, y = start_x, start_y = nx, ny
+            ring = [(x, y)]
+            cmd = 'L' if cmd == 'M' else 'l'  # implicit lineto after moveto
+        elif cmd in 'Ll':
+            nx, ny = take(2)
+            if cmd == 'l':
+                nx, ny = nx + x, ny + y
+            x, y = nx, ny
+            ring.append((x, y))
+        elif cmd in 'Cc':
+            x1, y1, x2, y2, nx, ny = take(6)
+            if cmd == 'c':
+                x1, y1, x2, y2, nx, ny = x1 + x, y1 + y, x2 + x, y2 + y, nx + x, ny + y
+            for step in range(1, curve_steps + 1):
+                t = step / curve_steps
+                u = 1 - t
+                ring.append((u ** 3 * x + 3 * u * u * t * x1 + 3 * u * t * t * x2 + t ** 3 * nx,
+                             u ** 3 * y + 3 * u * u * t * y1 + 3 * u * t * t * y2 + t ** 3 * ny))
+            x, y = nx, ny
+        else:
+            raise ValueError(f"unsupported path command {cmd!r}")
+    if len(ring) > 2:
+        rings.append(ring)
+    return rings
+
+
+def parse_svg_regions(path: str, css_class: str) -> dict[str, list]:
+    """``{id: rings}`` for every ``<path>`` carrying ``css_class`` (same-id paths are merged)."""
+    with open(path, encoding='utf-8') as f:
+        svg = f.read()
+    regions: dict[str, list] = {}
+    for attrs in _PATH.findall(svg):
+        found = {name: rx.search(attrs) for name, rx in _ATTR.items()}
+        if not all(found.values()) or css_class not in found['class'].group(1).split():
+            continue
+        regions.setdefault(found['id'].group(1), []).extend(flatten_path(found['d'].group(1)))
+    return regions
+
+
+# ----- Projection -----
+def _mercator_y(lat: float) -> float:
+    return math.degrees(math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)))
+
+
+class MapProjection:
+    """``x = a * lng + b``, ``y = c * mercator(lat) + d`` onto the SVG viewBox."""
+
+    __slots__ = ('a', 'b', 'c', 'd')
+
+    def __init__(self, a: float, b: float, c: float, d: float) -> None:
+        self.a, self.b, self.c, self.d = a, b, c, d
+
+    @classmethod
+    def fit(cls, map_bbox: tuple, geo_bbox: tuple) -> 'MapProjection':
+        """Fit map bounds (min_x, min_y, max_x, max_y) to geo bounds (min_lng, min_lat, max_lng, max_lat)."""
+        min_x, min_y, max_x, max_y = map_bbox
+        min_lng, min_lat, max_lng, max_lat = geo_bbox
+        a = (max_x - min_x) / (max_lng - min_lng)
+        c = (min_y - max_y) / (_mercator_y(max_lat) - _mercator_y(min_lat))  # y grows southwards
+        return cls(a, min_x - a * min_lng, c, min_y - c * _mercator_y(max_lat))
+
+    def to_map(self, lat: float, lng: float) -> tuple[float, float]:
+        return self.a * lng + self.b, self.c * _mercator_y(lat) + self.d
+
+    def to_geo(self, x: float, y: float) -> tuple[float, float]:
+        lat = math.degrees(2 * math.atan(math.exp(math.radians((y - self.d) / self.c))) - math.pi / 2)
+        return lat, (x - self.b) / self.a
+
+    def to_json(self) -> dict:
+        return {'type': 'mercator', 'x': [self.a, self.b], 'y': [self.c, self.d]}
+
+
+def geojson_bbox(path: str) -> tuple[float, float, float, float]:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    xs, ys = [], []
+
+    def walk(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            xs.append(coords[0])
+            ys.append(coords[1])
+        else:
+            for item in coords:
+                walk(item)
+
+    for feature in data.get('features', [data]):
+        walk((feature.get('geometry') or feature)['coordinates'])
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+# ----- Geometry helpers -----
+def _bbox(rings: Iterable) -> tuple[float, float, float, float]:
+    points = [p for ring in rings for p in ring]
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _contains(rings: list, x: float, y: float) -> bool:
+    """Even-odd rule over all rings (holes and multipolygons alike)."""
+    inside = False
+    for ring in rings:
+        j = len(ring) - 1
+        for i in range(len(ring)):
+            xi, yi = ring[i]
+            xj, yj = ring[j]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+def _centroid(ring: list) -> tuple[float, float]:
+    area = cx = cy = 0.0
+    for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+        cross = x0 * y1 - x1 * y0
+        area += cross
+        cx += (x0 + x1) * cross
+        cy += (y0 + y1) * cross
+    if not area:
+        return ring[0]
+    return cx / (3 * area), cy / (3 * area)
+
+
+def _segment_dist2(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+
+
+def _edge_dist2(rings: list, x: float, y: float) -> float:
+    best = math.inf
+    for ring in rings:
+        for i in range(len(ring)):
+            ax, ay = ring[i - 1]
+            bx, by = ring[i]
+            best = min(best, _segment_dist2(x, y, ax, ay, bx, by))
+    return best
+
+
+def simplify(ring: list, tolerance: float) -> list:
+    """Douglas-Peucker (iterative) on a closed ring; keeps at least 4 points or returns []."""
+    if len(ring) < 4:
+        return []
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    tol2 = tolerance * tolerance
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = ring[first]
+        bx, by = ring[last]
+        index, dmax = -1, tol2
+        for i in range(first + 1, last):
+            d = _segment_dist2(ring[i][0], ring[i][1], ax, ay, bx, by)
+            if d > dmax:
+                index, dmax = i, d
+        if index >= 0:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    out = [p for p, k in zip(ring, keep) if k]
+    return out if len(out) >= 4 else []
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+
+def _varint(n: int, out: bytearray) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class Region:
+    __slots__ = ('id', 'level', 'name', 'parent', 'rings', 'bbox')
+
+    def __init__(self, region_id: str, level: str, rings: list, name: Optional[str] = None) -> None:
+        self.id = region_id
+        self.level = level
+        self.name = name
+        self.parent: Optional[str] = None
+        self.rings = rings
+        self.bbox = _bbox(rings)
+
+    def covers(self, x: float, y: float) -> bool:
+        min_x, min_y, max_x, max_y = self.bbox
+        return min_x <= x <= max_x and min_y <= y <= max_y and _contains(self.rings, x, y)
+
+
+class RegionGeometry:
+    """Oblast and raion polygons with grid-indexed lookup and precomputed LOD tiers."""
+
+    def __init__(self, projection: MapProjection, cell: float = 4.0, snap: float = 2.5) -> None:
+        self.projection = projection
+        self.cell = cell
+        self.snap = snap
+        self.regions: dict[str, dict[str, Region]] = {level: {} for level in LEVELS}
+        self._grid: dict[str, dict[tuple[int, int], list[Region]]] = {level: {} for level in LEVELS}
+        self._tiers: dict[tuple[str, int], list[tuple[Region, list]]] = {}
+        self.lookups = 0
+        self.snapped = 0
+        self.misses = 0
+        self.load_ms: Optional[float] = None
+
+    @classmethod
+    def from_files(cls, oblast_svg: str, raion_svg: str, outline_geojson: str,
+                   raion_points: Optional[dict] = None, **kwargs) -> 'RegionGeometry':
+        """Load both SVG layers; ``raion_points`` (``{name: (lat, lng)}``) names the raion polygons."""
+        start = time.perf_counter()
+        oblasts = parse_svg_regions(oblast_svg, 'stateObject')
+        raions = parse_svg_regions(raion_svg, 'dist')
+        map_bbox = _bbox(ring for rings in oblasts.values() for ring in rings)
+        geo = cls(MapProjection.fit(map_bbox, geojson_bbox(outline_geojson)), **kwargs)
+        for region_id, rings in oblasts.items():
+            geo._add(Region(region_id, 'oblast', rings, OBLAST_NAMES.get(region_id)))
+        for region_id, rings in raions.items():
+            geo._add(Region(region_id, 'raion', rings))
+        geo._link_parents()
+        if raion_points:
+            geo._name_raions(raion_points)
+        for level in LEVELS:
+            for tier in LOD_TOLERANCE:
+                geo.tier(level, tier)
+        geo.load_ms = round((time.perf_counter() - start) * 1000, 1)
+        log.info(f"Region geometry: {len(oblasts)} oblasts, {len(raions)} raions loaded in {geo.load_ms} ms")
+        return geo
+
+    def _add(self, region: Region) -> None:
+        self.regions[region.level][region.id] = region
+        min_x, min_y, max_x, max_y = region.bbox
+        grid = self._grid[region.level]
+        for gx in range(int(min_x // self.cell), int(max_x // self.cell) + 1):
+            for gy in range(int(min_y // self.cell), int(max_y // self.cell) + 1):
+                grid.setdefault((gx, gy), []).append(region)
+
+    def _link_parents(self) -> None:
+        for raion in self.regions['raion'].values():
+            votes: dict[str, int] = {}
+            ring = max(raion.rings, key=len)
+            for x, y in ring[::max(1, len(ring) // 24)]:
+                # Nudge each sample towards the bbox centre so border vertices vote for the inside
+                cx = (raion.bbox[0] + raion.bbox[2]) / 2
+                cy = (raion.bbox[1] + raion.bbox[3]) / 2
+                oblast = self._find('oblast', x + (cx - x) * 0.05, y + (cy - y) * 0.05)
+                if oblast is not None:
+                    votes[oblast.id] = votes.get(oblast.id, 0) + 1
+            if votes:
+                raion.parent = max(votes, key=votes.get)
+
+    def _name_raions(self, points: dict) -> None:
+        best: dict[str, tuple[tuple, str]] = {}
+        for name, coords in points.items():
+            try:
+                x, y = self.projection.to_map(float(coords[0]), float(coords[1]))
+            except (TypeError, ValueError, IndexError):
+                continue
+            raion = self._find('raion', x, y)
+            if raion is None:
+                continue
+            # Prefer adjectival raion names ("бучанський") over town aliases, then the point nearest the centre
+            cx, cy = _centroid(max(raion.rings, key=len))
+            rank = (not name.endswith(('ий', 'ий район')), (x - cx) ** 2 + (y - cy) ** 2)
+            if raion.id not in best or rank < best[raion.id][0]:
+                best[raion.id] = (rank, name)
+        for raion_id, (_, name) in best.items():
+            self.regions['raion'][raion_id].name = name
+
+    # ----- Lookup -----
+    def _find(self, level: str, x: float, y: float) -> Optional[Region]:
+        for region in self._grid[level].get((int(x // self.cell), int(y // self.cell)), ()):
+            if region.covers(x, y):
+                return region
+        return None
+
+    def _nearest(self, level: str, x: float, y: float) -> Optional[Region]:
+        reach = int(math.ceil(self.snap / self.cell))
+        gx, gy = int(x // self.cell), int(y // self.cell)
+        seen: set = set()
+        best, best_d2 = None, self.snap * self.snap
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                for region in self._grid[level].get((gx + dx, gy + dy), ()):
+                    if region.id in seen:
+                        continue
+                    seen.add(region.id)
+                    d2 = _edge_dist2(region.rings, x, y)
+                    if d2 <= best_d2:
+                        best, best_d2 = region, d2
+        return best
+
+    def region_at(self, level: str, lat: float, lng: float) -> Optional[Region]:
+        x, y = self.projection.to_map(lat, lng)
+        region = self._find(level, x, y)
+        if region is None:
+            region = self._nearest(level, x, y)
+            if region is not None:
+                self.snapped += 1
+        return region
+
+    def locate(self, lat: float, lng: float) -> Optional[dict]:
+        """``{'oblast_id', 'oblast', 'raion_id', 'raion'}`` for a coordinate, or None outside Ukraine."""
+        self.lookups += 1
+        oblast = self.region_at('oblast', lat, lng)
+        raion = self.region_at('raion', lat, lng)
+        if oblast is None and raion is not None and raion.parent:
+            oblast = self.regions['oblast'].get(raion.parent)
+        if oblast is None and raion is None:
+            self.misses += 1
+            return None
+        return {
+            'oblast_id': oblast.id if oblast else None,
+            'oblast': oblast.name if oblast else None,
+            'raion_id': raion.id if raion else None,
+            'raion': raion.name if raion else None,
+        }
+
+    # ----- LOD tiers -----
+    def tier(self, level: str, tier: int) -> list[tuple[Region, list]]:
+        """``[(region, simplified rings)]`` for a level at a tier (computed once)."""
+        key = (level, tier)
+        cached = self._tiers.get(key)
+        if cached is None:
+            tolerance = LOD_TOLERANCE[tier]
+            cached = []
+            for region in self.regions[level].values():
+                rings = [r for r in (simplify(ring, tolerance) for ring in region.rings) if r]
+                if not rings:  # tiny islands vanish at coarse tiers; keep the largest ring
+                    largest = max(region.rings, key=len)
+                    rings = [simplify(largest, tolerance / 4) or largest]
+                cached.append((region, rings))
+            self._tiers[key] = cached
+        return cached
+
+    def _quantized(self, level: str, tier: int) -> tuple[float, list[tuple[Region, list]]]:
+        # Grid step a quarter of the tolerance: invisible at the tier's scale
+        step = LOD_TOLERANCE[tier] / 4
+        out = []
+        for region, rings in self.tier(level, tier):
+            qrings = []
+            for ring in rings:
+                q = [(round(x / step), round(y / step)) for x, y in ring]
+                q = [p for i, p in enumerate(q) if i == 0 or p != q[i - 1]]
+                if len(q) >= 4:
+                    qrings.append(q)
+            out.append((region, qrings))
+        return step, out
+
+    def encode(self, level: str, tier: int, fmt: str) -> bytes:
+        """Quantized geometry for a level/tier as TopoJSON or the compact binary format."""
+        if level not in LEVELS or tier not in LOD_TOLERANCE or fmt not in FORMATS:
+            raise KeyError(f"{level}/{tier}/{fmt}")
+        step, regions = self._quantized(level, tier)
+        if fmt == 'bin':
+            return self._encode_binary(level, tier, step, regions)
+        return self._encode_topojson(level, tier, step, regions)
+
+    def _encode_topojson(self, level: str, tier: int, step: float, regions: list) -> bytes:
+        arcs: list = []
+        geometries = []
+        for region, rings in regions:
+            # A ring inside another ring of the same region is a hole of that polygon
+            outer = [next((j for j, other in enumerate(rings) if j != i and _contains([other], *ring[0])), i)
+                     for i, ring in enumerate(rings)]
+            polygons: dict[int, list] = {}
+            for i in sorted(range(len(rings)), key=lambda i: outer[i] != i):  # shells before holes
+                ring = rings[i]
+                polygons.setdefault(outer[i], []).append([len(arcs)])
+                arcs.append([list(ring[0])] + [[b[0] - a[0], b[1] - a[1]] for a, b in zip(ring, ring[1:])])
+            properties = {'name': region.name}
+            if region.parent:
+                properties['oblast_id'] = region.parent
+            geometries.append({'type': 'MultiPolygon', 'id': region.id,
+                               'arcs': [polygons[k] for k in sorted(polygons)], 'properties': properties})
+        topo = {
+            'type': 'Topology',
+            'transform': {'scale': [step, step], 'translate': [0, 0]},
+            'projection': self.projection.to_json(),
+            'tier': tier,
+            'objects': {level: {'type': 'GeometryCollection', 'geometries': geometries}},
+            'arcs': arcs,
+        }
+        return json.dumps(topo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def _encode_binary(level: str, tier: int, step: float, regions: list) -> bytes:
+        """``NGEO`` v1: header, then per region id/parent + rings of zigzag-varint deltas."""
+        out = bytearray(BINARY_MAGIC)
+        out += struct.pack('<BBBHf', BINARY_VERSION, LEVELS.index(level), tier, len(regions), step)
+        for region, rings in regions:
+            for text in (region.id, region.parent or ''):
+                raw = text.encode('utf-8')
+                out.append(len(raw))
+                out += raw
+            _varint(len(rings), out)
+            for ring in rings:
+                _varint(len(ring), out)
+                px = py = 0
+                for x, y in ring:
+                    _varint(_zigzag(x - px), out)
+                    _varint(_zigzag(y - py), out)
+                    px, py = x, y
+        return bytes(out)
+
+    # ----- Introspection -----
+    def catalog(self) -> dict:
+        """Region ids, names and parents per level (names are not repeated in the binary tiers)."""
+        return {level: {r.id: {'name': r.name, 'oblast_id': r.parent} for r in regions.values()}
+                for level, regions in self.regions.items()}
+
+    def stats(self) -> dict:
+        return {
+            'oblasts': len(self.regions['oblast']),
+            'raions': len(self.regions['raion']),
+            'named_raions': sum(1 for r in self.regions['raion'].values() if r.name),
+            'points': sum(len(ring) for regions in self.regions.values()
+                          for r in regions.values() for ring in r.rings),
+            'tier_points': {f"{level}:{tier}": sum(len(ring) for _, rings in self.tier(level, tier) for ring in rings)
+                            for level in LEVELS for tier in LOD_TOLERANCE},
+            'lookups': self.lookups,
+            'snapped': self.snapped,
+            'misses': self.misses,
+            'load_ms': self.load_ms,
+        }
@@ -0,0 +1,225 @@
+"""
+Ingest-time marker TTL scoring.
+
+A marker's lifetime depends on threat type, "ended"/"active" wording,
+distance hints and the predicted ETA. The text is scanned once, when the
+message is ingested, by a compiled keyword scorer (every keyword of every
+feature in one regex pass) and the result is stored on the message:
+
+* ``ttl_minutes`` - scored lifetime;
+* ``ttl_status``  - ``'active'`` or ``'ended'``;
+* ``ttl_expires`` - epoch seconds the marker stops being shown.
+
+The map snapshot then drops expired markers with a numeric comparison
+(:func:`sweep_expired`) instead of re-scoring message text on every build.
+
+Usage:
+    from core.marker_ttl import stamp_message, sweep_expired
+
+    stamp_message(msg, ts=message_epoch)        # on ingest
+    live = sweep_expired(markers, time.time())  # on /data
+"""
+
+import re
+from typing import Iterable, Optional
+
+# Base TTL in minutes - MINIMUM time, adjusted UP based on distance/ETA
+THREAT_BASE_TTL = {
+    'shahed': 20, 'drone': 18, 'fpv': 5, 'rozved': 15, 'cruise': 15,
+    'ballistic': 4, 'kab': 6, 'rocket': 6, 'kinzhal': 2, 'iskander': 4,
+    'kalibr': 18, 'x101': 25, 'x22': 10, 'unknown': 25, 'explosion': 8,
+    'artillery': 5, 'air': 20, 'avia': 12, 'rszv': 5, 'obstril': 5, 'pusk': 8,
+}
+
+# Maximum TTL by threat type
+THREAT_MAX_TTL = {
+    'shahed': 240, 'drone': 180, 'fpv': 10, 'rozved': 60, 'cruise': 50,
+    'ballistic': 12, 'kab': 15, 'rocket': 12, 'kinzhal': 6, 'iskander': 10,
+    'kalibr': 60, 'x101': 90, 'x22': 30, 'unknown': 60, 'explosion': 15,
+    'artillery': 10, 'air': 45, 'avia': 30, 'rszv': 10, 'obstril': 10, 'pusk': 25,
+}
+
+MAX_TTL_MINUTES = max(THREAT_MAX_TTL.values())
+ENDED_TTL_MINUTES = 5
+
+# Keywords for distance detection
+DISTANT_KEYWORDS = [
+    'чорне море', 'каспій', 'азовськ', 'білорусь', 'росія', 'брянськ',
+    'бєлгород', 'курськ', 'ростов', 'криворіж', 'крим', 'керч',
+    'запуск', 'старт', 'пуск', 'зліт', 'виявлен', 'увійшл', 'зафіксован',
+]
+
+CLOSE_KEYWORDS = [
+    'над ', 'в районі', 'біля', 'поблизу', 'наближається до',
+    'на підльоті до', 'вже в', 'вже над', 'досяг', 'прибув',
+]
+
+THREAT_ENDED_KEYWORDS = [
+    'збит', 'збито', 'знищен', 'уражен', 'ліквідован', 'нейтралізован',
+    'перехоплен', 'відбит', 'пішов', 'покинув', 'вийшов', 'минув',
+    'завершен', 'закінч', 'скасуван', 'відбій', 'чисто',
+]
+
+THREAT_ACTIVE_KEYWORDS = [
+    'курс', 'курсом', 'напрям', 'рухається', 'летить', 'прямує',
+    'наближається', 'атак', 'загроз', 'увага', 'обережно',
+    'пуск', 'старт', 'виявлен', 'тривога', 'терміново', 'укриття',
+]
+
+# Threat type detection, checked in this order (first feature with a hit wins)
+TYPE_KEYWORDS = (
+    ('pusk', ['пуск']),
+    ('kinzhal', ['кінжал', 'гіперзвук']),
+    ('ballistic', ['балістик', 'іскандер']),
+    ('shahed', ['шахед', 'герань']),
+    ('drone', ['бпла', 'дрон']),
+    ('cruise', ['крилат', 'калібр']),
+    ('kab', ['каб', 'бомб']),
+)
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Regex for a keyword set, factored by common prefix (longest match first)."""
+    trie: dict = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return f"(?:{body})?" if '' in node else body
+
+    return build(trie)
+
+
+class KeywordScorer:
+    """Counts distinct keyword hits per feature in a single regex pass.
+
+    All keywords are compiled into one prefix-factored lookahead pattern, so
+    a match is found at every position (overlapping keywords included). A
+    match also credits the shorter keywords it contains ('збито' -> 'збит'),
+    which makes the counts identical to
+    ``sum(1 for kw in keywords if kw in text)`` per feature.
+    """
+
+    def __init__(self, features: dict[str, Iterable[str]]) -> None:
+        self.features = tuple(features)
+        by_keyword: dict[str, list[str]] = {}
+        for feature, keywords in features.items():
+            for kw in keywords:
+                by_keyword.setdefault(kw, []).append(feature)
+        keywords = sorted(by_keyword, key=len, reverse=True)
+        self._features_of = {kw: tuple(fs) for kw, fs in by_keyword.items()}
+        self._implied = {kw: tuple(other for other in keywords if other in kw) for kw in keywords}
+        self._pattern = re.compile(f"(?=({_trie_pattern(keywords)}))")
+
+    def hits(self, text: str) -> set[str]:
+        found: set[str] = set()
+        for match in self._pattern.finditer(text):
+            kw = match.group(1)
+            if kw not in found:
+                found.update(self._implied[kw])
+        return found
+
+    def scan(self, text: str) -> dict[str, int]:
+        counts = dict.fromkeys(self.features, 0)
+        for kw in self.hits(text):
+            for feature in self._features_of[kw]:
+                counts[feature] += 1
+        return counts
+
+
+_FEATURES = {
+    'ended': THREAT_ENDED_KEYWORDS,
+    'active': THREAT_ACTIVE_KEYWORDS,
+    'distant': DISTANT_KEYWORDS,
+    'close': CLOSE_KEYWORDS,
+}
+_FEATURES.update({f"type:{name}": kws for name, kws in TYPE_KEYWORDS})
+SCORER = KeywordScorer(_FEATURES)
+
+
+def score_ttl(
+    text: str,
+    threat_type: Optional[str] = None,
+    eta_minutes: Optional[float] = None,
+    source_region: Optional[str] = None,
+) -> dict:
+    """Marker lifetime for a message: ``{'ttl_minutes', 'status', 'reason', ...}``."""
+    counts = SCORER.scan((text or '').lower())
+    ended, active = counts['ended'], counts['active']
+    if ended >= 2 or (ended > 0 and active == 0):
+        return {
+            'ttl_minutes': ENDED_TTL_MINUTES, 'confidence': 0.9,
+            'reason': 'Загроза завершена', 'status': 'ended',
+        }
+
+    if not threat_type:
+        threat_type = next((name for name, _ in TYPE_KEYWORDS if counts[f"type:{name}"]), 'unknown')
+
+    base_ttl = THREAT_BASE_TTL.get(threat_type, 25)
+    max_ttl = THREAT_MAX_TTL.get(threat_type, 60)
+    reason = f"🎯 {threat_type}"
+
+    # Distance adjustment
+    distant, close = counts['distant'], counts['close']
+    if distant > close:
+        base_ttl *= 3.0 if threat_type in ('shahed', 'drone') else 1.5
+        reason += " 📍далеко"
+    elif close > distant:
+        base_ttl *= 0.7
+        reason += " 📍близько"
+
+    # ETA adjustment
+    if eta_minutes and eta_minutes > 0:
+        eta_buffer = eta_minutes * 1.4 + 8
+        if eta_buffer > base_ttl:
+            base_ttl = eta_buffer
+            reason = f"⏱️ETA: {eta_minutes:.0f}хв"
+
+    # Source region adjustment
+    if source_region:
+        src = source_region.lower()
+        if 'море' in src:
+            base_ttl = max(base_ttl, 120 if threat_type == 'shahed' else 50)
+        elif 'білорусь' in src:
+            base_ttl = max(base_ttl, 35)
+        elif 'росія' in src or 'брянськ' in src or 'бєлгород' in src:
+            base_ttl = max(base_ttl, 30)
+
+    base_ttl = max(5, min(int(round(base_ttl / 5) * 5), max_ttl))
+    return {
+        'ttl_minutes': base_ttl, 'confidence': 0.7, 'reason': reason,
+        'status': 'active', 'threat_type_detected': threat_type,
+    }
+
+
+def message_ttl_inputs(message: dict) -> tuple[str, Optional[str], Optional[float], Optional[str]]:
+    """``(text, threat_type, eta_minutes, source_region)`` taken from a stored message."""
+    trajectory = message.get('trajectory') or message.get('enhanced_trajectory')
+    eta_minutes = None
+    if isinstance(trajectory, dict):
+        eta = trajectory.get('eta')
+        if isinstance(eta, dict):
+            eta_minutes = eta.get('avg_minutes') or eta.get('minutes')
+    source_region = message.get('source') or message.get('course_source')
+    return message.get('text', ''), message.get('threat_type'), eta_minutes, source_region
+
+
+def stamp_message(message: dict, ts: float) -> dict:
+    """Score ``message`` once and store its TTL fields (``ts`` = message epoch)."""
+    result = score_ttl(*message_ttl_inputs(message))
+    message['ttl_minutes'] = result['ttl_minutes']
+    message['ttl_status'] = result['status']
+    message['ttl_expires'] = int(ts + result['ttl_minutes'] * 60)
+    return result
+
+
+def sweep_expired(markers: list, now: float) -> list:
+    """``markers`` minus the ones whose stored expiry is at or before ``now``; unstamped ones are kept."""
+    return [m for m in markers if not m.get('ttl_expires') or m['ttl_expires'] > now]
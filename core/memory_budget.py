@@ -0,0 +1,327 @@
+"""
+Process memory budget: registered caches, proportional eviction, GC tuning.
+
+Every in-process cache registers a size estimator, an eviction callback and a
+priority. :meth:`MemoryBudget.enforce` (run periodically) compares process
+RSS with the configured ceiling; when it is above the high-water mark the
+excess is split across caches in proportion to ``bytes / priority`` - big,
+cheap-to-rebuild caches give up the most - and each cache evicts that
+fraction of its entries (oldest first). A full ``gc.collect()`` only runs as
+a last resort when eviction was not enough, and is rate-limited: after a
+collection that did not lower RSS the next one waits ``gc_backoff`` seconds,
+doubling up to ``gc_backoff_max`` (suppressed rounds are counted in the
+report), so a high baseline RSS never means a full collection per check.
+Otherwise the collector is left
+to its (tuned) generational thresholds, and long-lived startup objects are
+moved out of its reach with ``gc.freeze()``.
+
+Sizes are estimated by sampling: ``sys.getsizeof`` of the container plus a
+bounded sample of entries, extrapolated - cheap enough to run every few
+seconds on caches with thousands of entries.
+
+Usage:
+    from core.memory_budget import MemoryBudget, evict_fraction
+
+    BUDGET = MemoryBudget(ceiling_bytes=420 * 2**20)
+    BUDGET.register('groq', size_fn=lambda: estimate_size(_groq_cache),
+                    evict_fn=lambda f: evict_fraction(_groq_cache, f, oldest=lambda k: _groq_cache[k][1]),
+                    priority=3, count_fn=lambda: len(_groq_cache))
+    BUDGET.tune_gc((50000, 20, 100))
+    BUDGET.enforce()          # periodic job
+    BUDGET.report()           # /admin/memory
+"""
+
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+log = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (None if it cannot be read)."""
+    if psutil is not None:
+        try:
+            return psutil.Process().memory_info().rss
+        except Exception:
+            pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _deep_size(obj: Any, depth: int) -> int:
+    size = sys.getsizeof(obj)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += _deep_size(k, depth - 1) + _deep_size(v, depth - 1)
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        for item in obj:
+            size += _deep_size(item, depth - 1)
+    return size
+
+
+def estimate_size(container: Any, sample: int = 32, depth: int = 3) -> int:
+    """Approximate deep size of a dict/list/set: container + sampled entries, extrapolated."""
+    if container is None:
+        return 0
+    base = sys.getsizeof(container)
+    try:
+        n = len(container)
+    except TypeError:
+        return _deep_size(container, depth)
+    if n == 0:
+        return base
+    if isinstance(container, dict):
+        items = list(islice(container.items(), sample))
+        sampled = sum(_deep_size(k, depth) + _deep_size(v, depth) for k, v in items)
+    else:
+        items = list(islice(iter(container), sample))
+        sampled = sum(_deep_size(item, depth) for item in items)
+    return base + sampled * n // max(1, len(items))
+
+
+def evict_fraction(container: Any, fraction: float, oldest: Optional[Callable[[Any], Any]] = None) -> int:
+    """Remove ``fraction`` of a dict/list/set/deque in place, oldest first; returns entries removed.
+
+    ``oldest`` is a sort key (smaller = older) over dict keys / set items; without it
+    dicts drop in insertion order and lists/deques from the front.
+    """
+    n = len(container)
+    count = min(n, int(n * fraction + 0.999)) if fraction > 0 else 0
+    if count <= 0:
+        return 0
+    if isinstance(container, dict):
+        keys = sorted(container, key=oldest)[:count] if oldest else list(islice(container, count))
+        for key in keys:
+            container.pop(key, None)
+    elif isinstance(container, deque):
+        for _ in range(count):
+            container.popleft()
+    elif isinstance(container, list):
+        del container[:count]
+    elif isinstance(container, set):
+        victims = sorted(container, key=oldest)[:count] if oldest else list(islice(container, count))
+        container.difference_update(victims)
+    else:
+        raise TypeError(f"cannot evict from {type(container).__name__}")
+    return count
+
+
+class _Entry:
+    __slots__ = ('name', 'size_fn', 'evict_fn', 'priority', 'count_fn', 'bytes', 'evicted', 'evictions')
+
+    def __init__(self, name: str, size_fn: Callable[[], int], evict_fn: Callable[[float], Any],
+                 priority: float, count_fn: Optional[Callable[[], int]]) -> None:
+        self.name = name
+        self.size_fn = size_fn
+        self.evict_fn = evict_fn
+        self.priority = max(0.1, priority)
+        self.count_fn = count_fn
+        self.bytes = 0
+        self.evicted = 0      # entries removed under pressure (lifetime)
+        self.evictions = 0    # pressure rounds this cache took part in
+
+
+class MemoryBudget:
+    """Keeps RSS under a ceiling by evicting from registered caches proportionally."""
+
+    def __init__(
+        self,
+        ceiling_bytes: int,
+        high_water: float = 0.9,
+        target: float = 0.8,
+        rss_fn: Callable[[], Optional[int]] = current_rss,
+        clock: Callable[[], float] = time.time,
+        gc_backoff: float = 300.0,
+        gc_backoff_max: float = 3600.0,
+    ) -> None:
+        self.ceiling_bytes = ceiling_bytes
+        self.gc_backoff = gc_backoff
+        self.gc_backoff_max = gc_backoff_max
+        self.high_water = high_water
+        self.target = target
+        self._rss_fn = rss_fn
+        self._clock = clock
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.pressure_events = 0
+        self.forced_collections = 0
+        self.suppressed_collections = 0
+        self._gc_wait = 0.0                 # current backoff after an ineffective collection
+        self._gc_not_before: float = 0.0
+        self.last_check: Optional[float] = None
+        self.last_rss: Optional[int] = None
+        self.last_pressure: Optional[dict] = None
+        self.frozen_objects = 0
+
+    def register(self, name: str, size_fn: Callable[[], int], evict_fn: Callable[[float], Any],
+                 priority: float = 1.0, count_fn: Optional[Callable[[], int]] = None) -> None:
+        """``priority``: higher keeps a cache longer (evicted share is bytes / priority)."""
+        with self._lock:
+            self._entries[name] = _Entry(name, size_fn, evict_fn, priority, count_fn)
+
+    # ----- Enforcement -----
+    def _measure(self) -> int:
+        total = 0
+        for entry in self._entries.values():
+            try:
+                entry.bytes = int(entry.size_fn())
+            except Exception as exc:
+                log.debug(f"Memory budget: size of {entry.name} failed: {exc}")
+                entry.bytes = 0
+            total += entry.bytes
+        return total
+
+    def plan(self, excess: int) -> dict[str, float]:
+        """Fraction of each cache to evict to free ``excess`` bytes (by bytes / priority)."""
+        active = {e.name: e for e in self._entries.values() if e.bytes > 0}
+        plan: dict[str, float] = {}
+        remaining = excess
+        # Water-filling: a cache whose share exceeds its size is emptied and the
+        # overflow is re-split across the rest
+        while active and remaining > 0:
+            total_weight = sum(e.bytes / e.priority for e in active.values())
+            capped = {name: e for name, e in active.items()
+                      if remaining * (e.bytes / e.priority) / total_weight >= e.bytes}
+            if not capped:
+                for name, e in active.items():
+                    plan[name] = remaining * (e.bytes / e.priority) / total_weight / e.bytes
+                break
+            for name, e in capped.items():
+                plan[name] = 1.0
+                remaining -= e.bytes
+                del active[name]
+        return plan
+
+    def enforce(self) -> dict:
+        """Measure caches and RSS; evict proportionally when above the high-water mark."""
+        with self._lock:
+            self.checks += 1
+            self.last_check = self._clock()
+            cache_bytes = self._measure()
+            rss = self._rss_fn()
+            self.last_rss = rss
+            result = {'rss': rss, 'cache_bytes': cache_bytes, 'evicted': {}}
+            if rss is None or rss < self.ceiling_bytes * self.high_water:
+                return result
+
+            self.pressure_events += 1
+            excess = int(rss - self.ceiling_bytes * self.target)
+            for name, fraction in self.plan(min(excess, cache_bytes)).items():
+                entry = self._entries[name]
+                try:
+                    removed = entry.evict_fn(fraction)
+                except Exception as exc:
+                    log.warning(f"Memory budget: eviction from {name} failed: {exc}")
+                    continue
+                entry.evictions += 1
+                entry.evicted += removed if isinstance(removed, int) else 0
+                result['evicted'][name] = {'fraction': round(fraction, 3), 'removed': removed}
+
+            # Last resort: caches could not cover the excess (or had nothing to give)
+            if excess > cache_bytes:
+                if self.last_check < self._gc_not_before:
+                    self.suppressed_collections += 1
+                    result['forced_gc'] = False
+                else:
+                    self._collect(rss)
+                    result['forced_gc'] = True
+            after = self._rss_fn()
+            result['rss_after'] = after
+            self.last_pressure = {'at': self.last_check, **result}
+            log.warning(
+                f"Memory budget: RSS {rss // 2**20} MB over {int(self.ceiling_bytes * self.high_water) // 2**20} MB, "
+                f"evicted from {len(result['evicted'])} caches, now {(after or 0) // 2**20} MB"
+            )
+            return result
+
+    def _collect(self, rss_before: int) -> None:
+        """Full collection; back off (doubling) while collections do not lower RSS."""
+        gc.collect()
+        self.forced_collections += 1
+        rss_after = self._rss_fn()
+        if rss_after is not None and rss_after < rss_before:
+            self._gc_wait = 0.0
+        else:
+            self._gc_wait = min(self.gc_backoff_max, self._gc_wait * 2 or self.gc_backoff)
+        self._gc_not_before = self.last_check + self._gc_wait
+
+    # ----- GC tuning -----
+    @staticmethod
+    def tune_gc(thresholds: Optional[tuple[int, int, int]]) -> tuple[int, int, int]:
+        """Set generational thresholds (fewer young collections for allocation-heavy request load)."""
+        if thresholds:
+            gc.set_threshold(*thresholds)
+        return gc.get_threshold()
+
+    def freeze(self) -> int:
+        """Move every currently tracked object to the permanent generation (after startup)."""
+        if not hasattr(gc, 'freeze'):
+            return 0
+        gc.collect()
+        gc.freeze()
+        self.frozen_objects = gc.get_freeze_count()
+        log.info(f"Memory budget: froze {self.frozen_objects} startup objects out of GC scans")
+        return self.frozen_objects
+
+    # ----- Introspection -----
+    def report(self, measure: bool = True) -> dict:
+        with self._lock:
+            if measure:
+                self._measure()
+            caches = {}
+            for entry in sorted(self._entries.values(), key=lambda e: e.bytes, reverse=True):
+                count = None
+                if entry.count_fn is not None:
+                    try:
+                        count = entry.count_fn()
+                    except Exception:
+                        pass
+                caches[entry.name] = {
+                    'bytes': entry.bytes,
+                    'items': count,
+                    'priority': entry.priority,
+                    'evicted': entry.evicted,
+                    'eviction_rounds': entry.evictions,
+                }
+            rss = self._rss_fn()
+            return {
+                'rss_bytes': rss,
+                'ceiling_bytes': self.ceiling_bytes,
+                'high_water_bytes': int(self.ceiling_bytes * self.high_water),
+                'target_bytes': int(self.ceiling_bytes * self.target),
+                'cache_bytes': sum(e.bytes for e in self._entries.values()),
+                'caches': caches,
+                'checks': self.checks,
+                'pressure_events': self.pressure_events,
+                'forced_collections': self.forced_collections,
+                'suppressed_collections': self.suppressed_collections,
+                'gc_backoff_seconds': self._gc_wait,
+                'gc_not_before': self._gc_not_before or None,
+                'last_pressure': self.last_pressure,
+                'gc': {
+                    'thresholds': gc.get_threshold(),
+                    'counts': gc.get_count(),
+                    'frozen': gc.get_freeze_count() if hasattr(gc, 'get_freeze_count') else 0,
+                    'collections': [s.get('collections') for s in gc.get_stats()],
+                },
+            }
@@ -1,17 +1,22 @@
 import copy
+import hashlib
 import json
 import logging
 import os
 import shutil
 import tempfile
 import threading
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Iterator, Optional
 
 Message = dict[str, Any]
 
 log = logging.getLogger(__name__)
 
 
+def _cursor_token(msg_id: Any) -> str:
+    return hashlib.blake2b(str(msg_id).encode('utf-8'), digest_size=6).hexdigest()
+
+
 class MessageStore:
     """File-backed storage with caching, retention and atomic writes."""
 
@@ -45,6 +50,51 @@ class MessageStore:
             self._cache_mtime = self._current_mtime()
             return copy.deepcopy(working)
 
+    def scan(self, after: Optional[str] = None) -> Iterator[tuple[str, Message]]:
+        """Yield ``(cursor, message)`` in store order without copying the whole list.
+
+        Iterates over the current snapshot (``save`` swaps in a new list, so a
+        running scan is unaffected) and yields a shallow copy per message.
+        ``cursor`` is ``"<position>:<token>"`` (the token is a hash of the message
+        id, so exports that strip ids do not leak them); passing it back as
+        ``after`` resumes right after that message, even if retention has
+        shifted positions since.
+
+        The cursor is resolved before this returns, so a malformed ``after``
+        raises ValueError here rather than midway through a streamed response.
+        """
+        with self._lock:
+            snapshot = self._ensure_cache()
+        start = self._resume_position(snapshot, after) if after else 0
+        return self._scan_from(snapshot, start)
+
+    @staticmethod
+    def _scan_from(snapshot: list[Message], start: int) -> Iterator[tuple[str, Message]]:
+        for pos in range(start, len(snapshot)):
+            msg = snapshot[pos]
+            if isinstance(msg, dict):
+                yield f"{pos}:{_cursor_token(msg.get('id', ''))}", dict(msg)
+
+    @staticmethod
+    def _resume_position(snapshot: list[Message], cursor: str) -> int:
+        pos_str, _, token = cursor.partition(':')
+        try:
+            pos = int(pos_str)
+        except ValueError:
+            raise ValueError(f"invalid cursor: {cursor!r}") from None
+        def _token_at(idx: int) -> Optional[str]:
+            msg = snapshot[idx]
+            return _cursor_token(msg.get('id', '')) if isinstance(msg, dict) else None
+
+        if 0 <= pos < len(snapshot) and _token_at(pos) == token:
+            return pos + 1
+        # Positions moved (retention pruned the head) - find the message by its token
+        for idx in range(min(pos, len(snapshot) - 1), -1, -1):
+            if _token_at(idx) == token:
+                return idx + 1
+        # Cursor message itself was pruned: everything still stored is newer
+        return 0
+
     def update_message(self, msg_id: str, updates: dict) -> bool:
         """Atomically update a single message by ID.
         
@@ -0,0 +1,430 @@
+"""
+In-process metrics and sampling span tracer.
+
+Counters, gauges and HDR-style (log-linear) latency histograms with labels,
+rendered in Prometheus text exposition format. A span tracer records every
+span into a latency histogram and keeps full nested traces only for a
+sampled fraction of root spans, so instrumented hot paths pay two
+``perf_counter`` calls and one histogram update.
+
+Usage:
+    from core.metrics import METRICS, TRACER
+
+    REQUESTS = METRICS.counter('neptun_http_requests_total', 'HTTP requests', ('endpoint', 'status'))
+    REQUESTS.labels(endpoint='index', status='200').inc()
+
+    with TRACER.span('process_message'):
+        ...
+
+    @TRACER.traced('geocoder.opencage')
+    def geocode(...): ...
+
+    METRICS.render_prometheus()  # -> text/plain; version=0.0.4
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Iterable, Optional
+
+# ----- HDR-style bucket layout -----
+# Values are recorded in integer microseconds. The first 8 buckets are linear
+# (0-7 us); above that every power of two is split into 4 sub-buckets, giving
+# <= 25% relative error over the full range with ~170 buckets up to ~2^40 us.
+_SUB = 4
+_LINEAR = 2 * _SUB
+_MAX_EXP = 40
+_NUM_BUCKETS = _LINEAR + _MAX_EXP * _SUB
+
+# Coarse boundaries (seconds) exported as Prometheus ``le`` buckets.
+EXPORT_BOUNDS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _bucket_index(us: int) -> int:
+    if us < _LINEAR:
+        return max(0, us)
+    exp = us.bit_length() - 3
+    idx = _LINEAR + (exp - 1) * _SUB + ((us >> exp) - _SUB)
+    return min(idx, _NUM_BUCKETS - 1)
+
+
+def _bucket_upper_us(idx: int) -> int:
+    """Exclusive upper bound (microseconds) of bucket ``idx``."""
+    if idx < _LINEAR:
+        return idx + 1
+    offset = idx - _LINEAR
+    exp = offset // _SUB + 1
+    mantissa = offset % _SUB + _SUB
+    return (mantissa + 1) << exp
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock: threading.Lock) -> None:
+        self.value = 0.0
+        self._lock = lock
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self, lock: threading.Lock) -> None:
+        self.value = 0.0
+        self._lock = lock
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ('counts', 'count', 'sum', 'max', '_lock')
+
+    def __init__(self, lock: threading.Lock) -> None:
+        self.counts = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = lock
+
+    def observe(self, seconds: float) -> None:
+        idx = _bucket_index(int(seconds * 1_000_000))
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Approximate quantile (seconds); upper bound of the covering bucket."""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(round(q * self.count)))
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            if n:
+                seen += n
+                if seen >= rank:
+                    return min(_bucket_upper_us(idx) / 1_000_000, self.max)
+        return self.max
+
+    def cumulative(self, bounds: Iterable[float]) -> list[int]:
+        result = []
+        idx = 0
+        running = 0
+        for bound in bounds:
+            limit_us = bound * 1_000_000
+            while idx < _NUM_BUCKETS and _bucket_upper_us(idx) <= limit_us:
+                running += self.counts[idx]
+                idx += 1
+            result.append(running)
+        return result
+
+
+class _Family:
+    kind = 'untyped'
+    child_cls: Any = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not labelnames:
+            self._default = self._child(())
+
+    def _child(self, key: tuple[str, ...]):
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self.child_cls(self._lock)
+                    self._children[key] = child
+        return child
+
+    def labels(self, *values: Any, **kwargs: Any):
+        if kwargs:
+            values = tuple(kwargs.get(n, '') for n in self.labelnames)
+        return self._child(tuple(str(v) for v in values))
+
+    def items(self) -> list[tuple[tuple[str, ...], Any]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children.clear()
+        if not self.labelnames:
+            self._default = self._child(())
+
+
+class Counter(_Family):
+    kind = 'counter'
+    child_cls = _CounterChild
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Family):
+    kind = 'gauge'
+    child_cls = _GaugeChild
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(_Family):
+    kind = 'histogram'
+    child_cls = _HistogramChild
+
+    def observe(self, seconds: float) -> None:
+        self._default.observe(seconds)
+
+    def time(self, *values: Any, **kwargs: Any) -> '_Timer':
+        child = self.labels(*values, **kwargs) if (values or kwargs) else self._default
+        return _Timer(child)
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: _HistogramChild) -> None:
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self) -> '_Timer':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class MetricsRegistry:
+    """Holds metric families and scrape-time gauge callbacks."""
+
+    def __init__(self) -> None:
+        self._families: dict[str, _Family] = {}
+        self._callbacks: dict[str, tuple[str, Callable[[], Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Iterable[str]):
+        with self._lock:
+            existing = self._families.get(name)
+            if existing is not None:
+                if not isinstance(existing, cls):
+                    raise ValueError(f"Metric {name} already registered as {existing.kind}")
+                return existing
+            family = cls(name, documentation, tuple(labelnames))
+            self._families[name] = family
+            return family
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames)
+
+    def gauge_callback(self, name: str, documentation: str, fn: Callable[[], Any]) -> None:
+        """Gauge evaluated at scrape time.
+
+        ``fn`` returns a number, or a dict mapping a label value (or tuple of
+        ``(label_name, value)`` pairs) to a number.
+        """
+        with self._lock:
+            self._callbacks[name] = (documentation, fn)
+
+    # ----- Export -----
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            families = list(self._families.values())
+            callbacks = list(self._callbacks.items())
+        for family in families:
+            lines.append(f'# HELP {family.name} {family.documentation}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for key, child in family.items():
+                if isinstance(family, Histogram):
+                    cumulative = child.cumulative(EXPORT_BOUNDS)
+                    for bound, value in zip(EXPORT_BOUNDS, cumulative):
+                        labels = _format_labels(family.labelnames, key, f'le="{bound}"')
+                        lines.append(f'{family.name}_bucket{labels} {value}')
+                    labels = _format_labels(family.labelnames, key, 'le="+Inf"')
+                    lines.append(f'{family.name}_bucket{labels} {child.count}')
+                    labels = _format_labels(family.labelnames, key)
+                    lines.append(f'{family.name}_sum{labels} {child.sum:.6f}')
+                    lines.append(f'{family.name}_count{labels} {child.count}')
+                else:
+                    labels = _format_labels(family.labelnames, key)
+                    lines.append(f'{family.name}{labels} {child.value:g}')
+        for name, (documentation, fn) in callbacks:
+            try:
+                value = fn()
+            except Exception:
+                continue
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} gauge')
+            if isinstance(value, dict):
+                for label, v in value.items():
+                    pairs = label if isinstance(label, tuple) else (('key', label),)
+                    labels = _format_labels(tuple(p[0] for p in pairs), tuple(str(p[1]) for p in pairs))
+                    lines.append(f'{name}{labels} {float(v):g}')
+            else:
+                lines.append(f'{name} {float(value or 0):g}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, quantiles: tuple[float, ...] = (0.5, 0.9, 0.99)) -> dict[str, Any]:
+        """JSON-friendly view: histogram percentiles in milliseconds, counters as-is."""
+        out: dict[str, Any] = {}
+        with self._lock:
+            families = list(self._families.values())
+        for family in families:
+            rows = {}
+            for key, child in family.items():
+                label = ','.join(f'{n}={v}' for n, v in zip(family.labelnames, key)) or '_'
+                if isinstance(family, Histogram):
+                    row = {'count': child.count, 'max_ms': round(child.max * 1000, 3)}
+                    for q in quantiles:
+                        row[f'p{int(q * 100)}_ms'] = round(child.percentile(q) * 1000, 3)
+                    rows[label] = row
+                else:
+                    rows[label] = child.value
+            out[family.name] = rows
+        return out
+
+
+# ----- Span tracer -----
+
+class _Span:
+    __slots__ = ('_tracer', 'name', 'attrs', 'start', 'duration', 'children', 'error', '_record', '_root')
+
+    def __init__(self, tracer: 'SpanTracer', name: str, attrs: dict, record: bool) -> None:
+        self._tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.children: list = []
+        self.error: Optional[str] = None
+        self._record = record
+        self._root = False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> '_Span':
+        self.start = time.perf_counter()
+        if self._record:
+            stack = self._tracer._stack()
+            if stack:
+                stack[-1].children.append(self)
+            else:
+                self._root = True
+            stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, _tb) -> bool:
+        self.duration = time.perf_counter() - self.start
+        self._tracer._histogram.labels(self.name).observe(self.duration)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+            self._tracer._errors.labels(self.name).inc()
+        if self._record:
+            stack = self._tracer._stack()
+            if stack and stack[-1] is self:
+                stack.pop()
+            if self._root:
+                self._tracer._finish(self)
+        return False
+
+    def to_dict(self, origin: Optional[float] = None) -> dict:
+        origin = self.start if origin is None else origin
+        return {
+            'name': self.name,
+            'offset_ms': round((self.start - origin) * 1000, 3),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attrs': self.attrs,
+            'error': self.error,
+            'children': [c.to_dict(origin) for c in self.children],
+        }
+
+
+class SpanTracer:
+    """Times every span; keeps full nested traces for a sampled fraction of roots."""
+
+    def __init__(self, registry: MetricsRegistry, sample_rate: float = 0.01, keep: int = 100) -> None:
+        self.sample_rate = sample_rate
+        self._histogram = registry.histogram(
+            'neptun_span_duration_seconds', 'Duration of traced spans', ('span',))
+        self._errors = registry.counter(
+            'neptun_span_errors_total', 'Spans that raised', ('span',))
+        self._local = threading.local()
+        self._traces: deque = deque(maxlen=keep)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str, **attrs: Any) -> _Span:
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            record = True
+        else:
+            record = self.sample_rate > 0 and random.random() < self.sample_rate
+        return _Span(self, name, attrs, record)
+
+    def traced(self, name: str) -> Callable:
+        def decorator(fn: Callable) -> Callable:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, root: _Span) -> None:
+        self._traces.append({'ts': time.time(), 'trace': root.to_dict()})
+
+    def recent(self, limit: int = 20) -> list[dict]:
+        return list(self._traces)[-limit:]
+
+
+METRICS = MetricsRegistry()
+TRACER = SpanTracer(METRICS)
@@ -0,0 +1,195 @@
+"""
+Pre-rendered page cache for templated pages that only change per deploy/day.
+
+Each page is registered with a ``render`` callable and an ``inputs``
+callable returning whatever the output depends on (template mtimes, the
+static manifest build, today's date). The page is rendered once - at
+startup via :meth:`PageCache.prerender`, or on first request - and stored
+with a content-hash ETag, Last-Modified and precompressed gzip (and
+brotli, when available) bodies. Requests are served from those bytes
+without touching Jinja; ``inputs`` is re-checked at most every
+``check_interval`` seconds and a change triggers one re-render.
+
+Usage:
+    from core.page_cache import PageCache
+
+    PAGES = PageCache()
+    PAGES.register('about', render=lambda: render_template('about.html'),
+                   inputs=lambda: os.path.getmtime('templates/about.html'))
+    page = PAGES.get('about')
+    body, encoding = PAGES.select(page, request.headers.get('Accept-Encoding', ''))
+"""
+
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional, Union
+
+from core.static_manifest import _parse_accept_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+
+class CachedPage:
+    __slots__ = ('key', 'body', 'gzip', 'br', 'etag', 'last_modified', 'mimetype',
+                 'inputs', 'checked_at', 'render_ms')
+
+    def __init__(self, key: str, body: bytes, mimetype: str, inputs: Any, now: float) -> None:
+        self.key = key
+        self.body = body
+        self.gzip: Optional[bytes] = None
+        self.br: Optional[bytes] = None
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.last_modified = int(now)
+        self.mimetype = mimetype
+        self.inputs = inputs
+        self.checked_at = now
+        self.render_ms: Optional[float] = None
+
+
+class _PageSpec:
+    __slots__ = ('render', 'inputs', 'mimetype')
+
+    def __init__(self, render: Callable[[], Union[str, bytes]],
+                 inputs: Optional[Callable[[], Any]], mimetype: str) -> None:
+        self.render = render
+        self.inputs = inputs
+        self.mimetype = mimetype
+
+
+class PageCache:
+    """Rendered page bodies keyed by name, re-rendered only when their inputs change."""
+
+    def __init__(
+        self,
+        check_interval: float = 5.0,
+        min_compress_size: int = 512,
+        gzip_level: int = 9,
+        brotli_quality: int = 11,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.check_interval = check_interval
+        self.min_compress_size = min_compress_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._clock = clock
+        self._specs: dict[str, _PageSpec] = {}
+        self._pages: dict[str, CachedPage] = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.hits = 0
+
+    def register(self, key: str, render: Callable[[], Union[str, bytes]],
+                 inputs: Optional[Callable[[], Any]] = None,
+                 mimetype: str = 'text/html; charset=utf-8') -> None:
+        self._specs[key] = _PageSpec(render, inputs, mimetype)
+        self._pages.pop(key, None)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._specs
+
+    # ----- Rendering -----
+    def _render(self, key: str, spec: _PageSpec, inputs: Any, now: float) -> CachedPage:
+        start = time.perf_counter()
+        body = spec.render()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        page = CachedPage(key, body, spec.mimetype, inputs, now)
+        if len(body) >= self.min_compress_size:
+            gz = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            if len(gz) < len(body) * 0.95:
+                page.gzip = gz
+            if brotli is not None:
+                br = brotli.compress(body, quality=self.brotli_quality)
+                if len(br) < len(gz if page.gzip else body):
+                    page.br = br
+        page.render_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.renders += 1
+        return page
+
+    def get(self, key: str) -> CachedPage:
+        """Cached page for ``key`` (rendered now if missing or stale); KeyError if unregistered."""
+        spec = self._specs[key]
+        now = self._clock()
+        page = self._pages.get(key)
+        if page is not None and (spec.inputs is None or now - page.checked_at < self.check_interval):
+            self.hits += 1
+            return page
+        inputs = spec.inputs() if spec.inputs else None
+        if page is not None and page.inputs == inputs:
+            page.checked_at = now
+            self.hits += 1
+            return page
+        with self._lock:
+            current = self._pages.get(key)
+            if current is not None and current is not page and current.inputs == inputs:
+                return current  # another request re-rendered it meanwhile
+            page = self._render(key, spec, inputs, now)
+            self._pages[key] = page
+        return page
+
+    def prerender(self) -> 'PageCache':
+        """Render every registered page (startup warm-up); failures are logged, not raised."""
+        start = time.perf_counter()
+        failed = 0
+        for key in list(self._specs):
+            try:
+                self.get(key)
+            except Exception as exc:
+                failed += 1
+                log.warning(f"Page cache: prerender of {key} failed: {exc}")
+        elapsed = round((time.perf_counter() - start) * 1000, 1)
+        log.info(f"Page cache: {len(self._pages)} pages pre-rendered in {elapsed} ms ({failed} failed)")
+        return self
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one page (or all) so the next request re-renders it."""
+        with self._lock:
+            if key is None:
+                self._pages.clear()
+            else:
+                self._pages.pop(key, None)
+
+    def evict(self, fraction: float) -> int:
+        """Drop ``fraction`` of the rendered pages (memory pressure); they re-render on demand."""
+        with self._lock:
+            count = min(len(self._pages), int(len(self._pages) * fraction + 0.999))
+            for key in list(self._pages)[:count]:
+                del self._pages[key]
+        return count
+
+    def memory_bytes(self) -> int:
+        return sum(len(p.body) + len(p.gzip or b'') + len(p.br or b'') for p in list(self._pages.values()))
+
+    # ----- Serving -----
+    @staticmethod
+    def select(page: CachedPage, accept_encoding: str) -> tuple[bytes, Optional[str]]:
+        """Pick the best stored body for the client's Accept-Encoding."""
+        if page.gzip is None and page.br is None:
+            return page.body, None
+        accepted = _parse_accept_encoding(accept_encoding)
+        if page.br is not None and accepted.get('br', 0) > 0:
+            return page.br, 'br'
+        if page.gzip is not None and accepted.get('gzip', accepted.get('*', 0)) > 0:
+            return page.gzip, 'gzip'
+        return page.body, None
+
+    # ----- Introspection -----
+    def stats(self) -> dict:
+        pages = list(self._pages.values())
+        return {
+            'registered': len(self._specs),
+            'rendered': len(pages),
+            'renders': self.renders,
+            'hits': self.hits,
+            'memory_bytes': self.memory_bytes(),
+            'brotli_available': brotli is not None,
+            'slowest': sorted(((p.key, p.render_ms) for p in pages), key=lambda kv: kv[1] or 0, reverse=True)[:5],
+        }
@@ -0,0 +1,179 @@
+"""
+Shared GCRA rate limiter with named policies.
+
+Each policy allows ``limit`` hits per ``period`` seconds per key (IP, device
+id, ...). State per key is a single theoretical-arrival-time float (GCRA,
+equivalent to a token bucket with capacity ``limit``), so a check is O(1)
+regardless of traffic. Keys live in an LRU map capped at ``max_keys`` per
+policy; evicting an idle key is lossless because its TAT is already in the
+past.
+
+Usage:
+    from core.ratelimit import RateLimiter, RatePolicy
+
+    RATE_LIMITER = RateLimiter()
+    RATE_LIMITER.add_policy(RatePolicy('presence', limit=3, period=30))
+
+    decision = RATE_LIMITER.allow('presence', client_ip)
+    if not decision.allowed:
+        return jsonify({'retry_after': decision.retry_after}), 429
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+
+class RatePolicy(NamedTuple):
+    name: str
+    limit: int          # hits allowed per period (also the burst size)
+    period: float       # seconds
+    cooldown: float = 0.0  # extra block after a denial (penalty), seconds
+    max_keys: int = 5000
+
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+    reason: str = ''
+
+
+class _PolicyState:
+    __slots__ = ('policy', 'interval', 'tolerance', 'keys', 'lock', 'allowed', 'denied', 'evicted')
+
+    def __init__(self, policy: RatePolicy) -> None:
+        self.policy = policy
+        self.interval = policy.period / max(1, policy.limit)
+        self.tolerance = policy.period - self.interval
+        # key -> [tat, blocked_until]
+        self.keys: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.allowed = 0
+        self.denied = 0
+        self.evicted = 0
+
+
+class RateLimiter:
+    """Registry of named GCRA policies with bounded per-key state."""
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
+        self._policies: dict[str, _PolicyState] = {}
+
+    def add_policy(self, policy: RatePolicy) -> None:
+        self._policies[policy.name] = _PolicyState(policy)
+
+    def policy(self, name: str) -> RatePolicy:
+        return self._policies[name].policy
+
+    # ----- Core -----
+    def _entry(self, state: _PolicyState, key: str, now: float) -> list:
+        entry = state.keys.get(key)
+        if entry is None:
+            entry = [now, 0.0]
+            state.keys[key] = entry
+            if len(state.keys) > state.policy.max_keys:
+                state.keys.popitem(last=False)
+                state.evicted += 1
+        else:
+            state.keys.move_to_end(key)
+        return entry
+
+    def _evaluate(self, state: _PolicyState, entry: list, now: float, cost: int) -> RateDecision:
+        if now < entry[1]:
+            return RateDecision(False, entry[1] - now, 'cooldown')
+        tat = max(entry[0], now)
+        new_tat = tat + state.interval * cost
+        allow_at = new_tat - state.tolerance - state.interval
+        if allow_at > now:
+            return RateDecision(False, allow_at - now, 'limit_exceeded')
+        return RateDecision(True)
+
+    def allow(self, name: str, key: Optional[str], cost: int = 1) -> RateDecision:
+        """Check and consume ``cost`` hits for ``key`` in one step."""
+        if not key:
+            return RateDecision(True)
+        state = self._policies[name]
+        now = self._clock()
+        with state.lock:
+            entry = self._entry(state, key, now)
+            decision = self._evaluate(state, entry, now, cost)
+            if decision.allowed:
+                entry[0] = max(entry[0], now) + state.interval * cost
+                state.allowed += 1
+            else:
+                decision = self._deny(state, entry, now, decision)
+        return decision
+
+    def check(self, name: str, key: Optional[str], cost: int = 1) -> RateDecision:
+        """Check without consuming (pair with :meth:`hit` once the action succeeds).
+
+        A denial still starts the policy cooldown, matching the old chat limiter.
+        """
+        if not key:
+            return RateDecision(True)
+        state = self._policies[name]
+        now = self._clock()
+        with state.lock:
+            entry = self._entry(state, key, now)
+            decision = self._evaluate(state, entry, now, cost)
+            if not decision.allowed:
+                decision = self._deny(state, entry, now, decision)
+        return decision
+
+    def hit(self, name: str, key: Optional[str], cost: int = 1) -> None:
+        """Record ``cost`` hits unconditionally."""
+        if not key:
+            return
+        state = self._policies[name]
+        now = self._clock()
+        with state.lock:
+            entry = self._entry(state, key, now)
+            entry[0] = max(entry[0], now) + state.interval * cost
+            state.allowed += 1
+
+    def remaining(self, name: str, key: Optional[str]) -> int:
+        """Hits still available to ``key`` right now."""
+        state = self._policies[name]
+        if not key:
+            return state.policy.limit
+        now = self._clock()
+        with state.lock:
+            entry = state.keys.get(key)
+            if entry is None:
+                return state.policy.limit
+            if now < entry[1]:
+                return 0
+            backlog = max(entry[0], now) - now
+            left = math.floor((state.tolerance - backlog) / state.interval) + 1
+        return max(0, min(state.policy.limit, left))
+
+    def _deny(self, state: _PolicyState, entry: list, now: float, decision: RateDecision) -> RateDecision:
+        state.denied += 1
+        if state.policy.cooldown and decision.reason == 'limit_exceeded':
+            entry[1] = now + state.policy.cooldown
+            return decision._replace(retry_after=max(decision.retry_after, state.policy.cooldown))
+        return decision
+
+    def reset(self, name: str, key: str) -> None:
+        state = self._policies[name]
+        with state.lock:
+            state.keys.pop(key, None)
+
+    # ----- Introspection -----
+    def stats(self) -> dict:
+        out = {}
+        for name, state in self._policies.items():
+            with state.lock:
+                out[name] = {
+                    'limit': state.policy.limit,
+                    'period': state.policy.period,
+                    'keys': len(state.keys),
+                    'max_keys': state.policy.max_keys,
+                    'allowed': state.allowed,
+                    'denied': state.denied,
+                    'evicted': state.evicted,
+                }
+        return out
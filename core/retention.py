@@ -0,0 +1,202 @@
+"""
+Incremental message retention over a time-ordered index.
+
+Each message is timestamped once, the first time the index sees it (epoch
+seconds from its ``date``), and pushed onto a min-heap keyed by time. A
+prune then:
+
+* finds new messages by walking the list from the tail until it reaches one
+  already indexed (new messages are appended), falling back to a full
+  reconcile only when the list changed elsewhere;
+* pops expired entries from the heap head - O(expired log n);
+* pops the oldest entries while the auto (non-manual) count exceeds the cap.
+
+Nothing is re-parsed or re-sorted, so the cost of a save's retention step
+tracks the number of new and removed messages, not the retained total.
+Manual markers and messages without an id are never pruned.
+
+Usage:
+    from core.retention import RetentionIndex
+
+    RETENTION = RetentionIndex(retention_seconds=24 * 3600, max_count=500, tz=kyiv_tz)
+    MESSAGE_STORE = MessageStore(path, prune_fn=RETENTION.prune)
+    RETENTION.stats()   # {'retained': 480, 'expired_total': 1200, ...}
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Optional
+
+from core.threat_counters import message_timestamp
+
+
+class RetentionIndex:
+    """Min-heap of (timestamp, id) for retained messages with O(expired) pruning."""
+
+    def __init__(
+        self,
+        retention_seconds: float = 0,
+        max_count: int = 0,
+        tz=None,
+        reconcile_every: int = 200,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.retention_seconds = retention_seconds
+        self.max_count = max_count
+        self.reconcile_every = reconcile_every
+        self._tz = tz
+        self._clock = clock
+        self._heap: list[tuple[float, int, str]] = []
+        self._ts: dict[str, float] = {}        # retained auto message id -> timestamp
+        self._manual: set[str] = set()
+        self._untracked = 0                    # list entries without an id (never pruned)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.prunes = 0
+        self.reconciles = 0
+        self.indexed_total = 0
+        self.expired_total = 0
+        self.evicted_total = 0
+        self.last_prune_ms: Optional[float] = None
+        self.last_removed = 0
+
+    # ----- Indexing -----
+    def _index(self, msg: dict, now: float) -> None:
+        msg_id = str(msg['id'])
+        if msg.get('manual'):
+            self._manual.add(msg_id)
+            return
+        # Malformed dates age out from when they were first seen
+        ts = message_timestamp(msg, self._tz, now)
+        if ts is None:
+            ts = now
+        self._ts[msg_id] = ts
+        heapq.heappush(self._heap, (ts, next(self._seq), msg_id))
+        self.indexed_total += 1
+
+    def _known(self, msg_id: str) -> bool:
+        return msg_id in self._ts or msg_id in self._manual
+
+    def _observe(self, data: list, now: float) -> None:
+        fresh = []
+        for msg in reversed(data):
+            if not isinstance(msg, dict) or not msg.get('id'):
+                continue
+            if self._known(str(msg['id'])):
+                break
+            fresh.append(msg)
+        for msg in reversed(fresh):
+            self._index(msg, now)
+        expected = len(self._ts) + len(self._manual) + self._untracked
+        if self.prunes % self.reconcile_every == 0 or len(data) != expected:
+            self._reconcile(data, now)
+
+    def _reconcile(self, data: list, now: float) -> None:
+        """Rebuild membership from the list (edits outside the tail, deletions)."""
+        self.reconciles += 1
+        present: set[str] = set()
+        self._untracked = 0
+        for msg in data:
+            if not isinstance(msg, dict) or not msg.get('id'):
+                self._untracked += 1
+                continue
+            msg_id = str(msg['id'])
+            present.add(msg_id)
+            if not self._known(msg_id):
+                self._index(msg, now)
+            elif msg.get('manual') and msg_id in self._ts:
+                # Promoted to a manual marker: exempt from now on (heap entry goes stale)
+                del self._ts[msg_id]
+                self._manual.add(msg_id)
+        for msg_id in [i for i in self._ts if i not in present]:
+            del self._ts[msg_id]
+        self._manual &= present
+        if len(self._heap) > 2 * len(self._ts) + 64:
+            self._heap = [entry for entry in self._heap if self._ts.get(entry[2]) == entry[0]]
+            heapq.heapify(self._heap)
+
+    # ----- Pruning -----
+    def _pop_oldest(self) -> Optional[tuple[float, str]]:
+        while self._heap:
+            ts, _, msg_id = heapq.heappop(self._heap)
+            if self._ts.get(msg_id) == ts:  # skip stale entries (lazy deletion)
+                del self._ts[msg_id]
+                return ts, msg_id
+        return None
+
+    def _peek_oldest(self) -> Optional[float]:
+        while self._heap:
+            ts, _, msg_id = self._heap[0]
+            if self._ts.get(msg_id) == ts:
+                return ts
+            heapq.heappop(self._heap)
+        return None
+
+    def prune(self, data: list) -> list:
+        """MessageStore ``prune_fn``: drop expired / over-cap messages (in place when they are the head)."""
+        if not data:
+            return data
+        start = time.perf_counter()
+        now = self._clock()
+        removed: set[str] = set()
+        with self._lock:
+            self._observe(data, now)
+            self.prunes += 1
+            if self.retention_seconds > 0:
+                cutoff = now - self.retention_seconds
+                while True:
+                    oldest = self._peek_oldest()
+                    if oldest is None or oldest >= cutoff:
+                        break
+                    removed.add(self._pop_oldest()[1])
+                self.expired_total += len(removed)
+            if self.max_count > 0:
+                allow_auto = max(0, self.max_count - len(self._manual))
+                evicted = 0
+                while len(self._ts) > allow_auto:
+                    popped = self._pop_oldest()
+                    if popped is None:
+                        break
+                    removed.add(popped[1])
+                    evicted += 1
+                self.evicted_total += evicted
+            self.last_removed = len(removed)
+        if removed:
+            data = self._without(data, removed)
+        self.last_prune_ms = round((time.perf_counter() - start) * 1000, 3)
+        return data
+
+    @staticmethod
+    def _without(data: list, removed: set[str]) -> list:
+        # Expired messages are normally the list head - drop it in place instead of filtering
+        head = 0
+        for msg in data:
+            if not (isinstance(msg, dict) and msg.get('id') and str(msg['id']) in removed):
+                break
+            head += 1
+        if head == len(removed):
+            del data[:head]
+            return data
+        return [m for m in data if not (isinstance(m, dict) and m.get('id') and str(m['id']) in removed)]
+
+    # ----- Introspection -----
+    def stats(self) -> dict:
+        with self._lock:
+            oldest = self._peek_oldest()
+            return {
+                'retention_seconds': self.retention_seconds,
+                'max_count': self.max_count,
+                'retained': len(self._ts),
+                'manual': len(self._manual),
+                'heap_entries': len(self._heap),
+                'oldest_ts': oldest,
+                'indexed_total': self.indexed_total,
+                'expired_total': self.expired_total,
+                'evicted_total': self.evicted_total,
+                'prunes': self.prunes,
+                'reconciles': self.reconciles,
+                'last_removed': self.last_removed,
+                'last_prune_ms': self.last_prune_ms,
+            }
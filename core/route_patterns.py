@@ -0,0 +1,345 @@
+"""
+Learned source -> target route patterns for trajectory prediction.
+
+Every confirmed trajectory ("БпЛА з Сумщини на Полтавщину") is recorded as an
+observation of (threat type, source, target). Per route the store keeps a
+count, first/last seen, an hour-of-day histogram and a running transit-time
+distribution. Transit time is inferred when a later route of the same threat
+type starts where an earlier one ended (the group has reached its target).
+
+Lookups ("likely targets and ETA from X for type T") hit an in-memory index
+of per-source route lists and never touch disk. Writes are batched: records
+only mark the store dirty and a background thread flushes the whole store to
+one compact JSON file every ``flush_interval`` seconds (atomic replace).
+
+Usage:
+    from core.route_patterns import RoutePatternStore
+
+    ROUTE_PATTERNS = RoutePatternStore('route_patterns.json').load()
+    ROUTE_PATTERNS.start()
+
+    ROUTE_PATTERNS.record('shahed', 'Сумщина', 'Полтавщина', distance_km=160)
+    ROUTE_PATTERNS.predict('Сумщина', 'shahed')
+    # [{'target': 'Полтавщина', 'probability': 0.7, 'count': 14, 'eta_minutes': 58.0, ...}]
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+log = logging.getLogger(__name__)
+
+ANY_THREAT = '*'
+FORMAT_VERSION = 1
+
+
+def normalize_place(name: Optional[str]) -> str:
+    if not name:
+        return ''
+    name = name.replace('(прогноз)', '').strip().lower()
+    return ' '.join(name.split())
+
+
+class _Route:
+    __slots__ = ('threat_type', 'source', 'target', 'label_source', 'label_target', 'count',
+                 'first_seen', 'last_seen', 'hours', 'transit_n', 'transit_mean', 'transit_m2',
+                 'distance_km')
+
+    def __init__(self, threat_type: str, source: str, target: str, label_source: str, label_target: str) -> None:
+        self.threat_type = threat_type
+        self.source = source
+        self.target = target
+        self.label_source = label_source
+        self.label_target = label_target
+        self.count = 0
+        self.first_seen = 0.0
+        self.last_seen = 0.0
+        self.hours = [0] * 24
+        self.transit_n = 0
+        self.transit_mean = 0.0
+        self.transit_m2 = 0.0
+        self.distance_km: Optional[float] = None
+
+    def add_transit(self, seconds: float) -> None:
+        # Welford's online mean/variance
+        self.transit_n += 1
+        delta = seconds - self.transit_mean
+        self.transit_mean += delta / self.transit_n
+        self.transit_m2 += delta * (seconds - self.transit_mean)
+
+    @property
+    def transit_std(self) -> Optional[float]:
+        if self.transit_n < 2:
+            return None
+        return math.sqrt(self.transit_m2 / (self.transit_n - 1))
+
+    def to_json(self) -> dict:
+        return {
+            'threat_type': self.threat_type,
+            'source': self.label_source,
+            'target': self.label_target,
+            'count': self.count,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'hours': self.hours,
+            'transit': [self.transit_n, round(self.transit_mean, 1), round(self.transit_m2, 1)],
+            'distance_km': self.distance_km,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> '_Route':
+        route = cls(data['threat_type'], normalize_place(data['source']), normalize_place(data['target']),
+                    data['source'], data['target'])
+        route.count = int(data.get('count', 0))
+        route.first_seen = float(data.get('first_seen', 0))
+        route.last_seen = float(data.get('last_seen', 0))
+        hours = data.get('hours') or []
+        if len(hours) == 24:
+            route.hours = [int(h) for h in hours]
+        transit = data.get('transit') or [0, 0.0, 0.0]
+        route.transit_n, route.transit_mean, route.transit_m2 = int(transit[0]), float(transit[1]), float(transit[2])
+        route.distance_km = data.get('distance_km')
+        return route
+
+
+class RoutePatternStore:
+    """In-memory route index with batched JSON persistence."""
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 30.0,
+        max_routes: int = 5000,
+        transit_window: float = 3 * 3600,
+        dedup_seconds: float = 300,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_routes = max_routes
+        self.transit_window = transit_window
+        self.dedup_seconds = dedup_seconds
+        self._clock = clock
+        self._routes: dict[tuple[str, str, str], _Route] = {}
+        # (threat_type or ANY_THREAT, source) -> routes sorted by count, desc
+        self._by_source: dict[tuple[str, str], list[_Route]] = {}
+        # (threat_type, target) -> (route, ts) of the latest arrival candidate
+        self._open: dict[tuple[str, str], tuple[_Route, float]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_flush: Optional[float] = None
+        self.flushes = 0
+
+    # ----- Persistence -----
+    def load(self) -> 'RoutePatternStore':
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, ValueError) as exc:
+            log.warning(f"Route patterns unreadable ({self.path}): {exc}")
+            return self
+        routes = data.get('patterns') if isinstance(data, dict) else None
+        if not isinstance(routes, list):
+            return self  # legacy/unknown layout - start fresh
+        with self._lock:
+            for item in routes:
+                try:
+                    route = _Route.from_json(item)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self._routes[(route.threat_type, route.source, route.target)] = route
+            self._reindex()
+        log.info(f"Loaded {len(self._routes)} route patterns from {self.path}")
+        return self
+
+    def flush(self) -> bool:
+        """Write the store if anything changed since the last flush."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            payload = {
+                'version': FORMAT_VERSION,
+                'last_updated': self._clock(),
+                'patterns': [r.to_json() for r in self._routes.values()],
+            }
+            self._dirty = False
+        tmp = f"{self.path}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            with self._lock:
+                self._dirty = True
+            log.warning(f"Route patterns flush failed: {exc}")
+            return False
+        self.last_flush = time.time()
+        self.flushes += 1
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        def _worker():
+            while not self._stop.wait(self.flush_interval):
+                self.flush()
+            self.flush()
+
+        self._thread = threading.Thread(target=_worker, daemon=True, name='route_patterns_flush')
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    # ----- Recording -----
+    def record(
+        self,
+        threat_type: str,
+        source: Optional[str],
+        target: Optional[str],
+        ts: Optional[float] = None,
+        distance_km: Optional[float] = None,
+    ) -> bool:
+        src, dst = normalize_place(source), normalize_place(target)
+        if not src or not dst or src == dst or src == 'unknown' or dst == 'unknown':
+            return False
+        ts = self._clock() if ts is None else ts
+        key = (threat_type, src, dst)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                if len(self._routes) >= self.max_routes:
+                    self._evict_one()
+                route = _Route(threat_type, src, dst, source.strip(), target.replace('(прогноз)', '').strip())
+                route.first_seen = ts
+                self._routes[key] = route
+                self._by_source.setdefault((threat_type, src), []).append(route)
+                self._by_source.setdefault((ANY_THREAT, src), []).append(route)
+            elif ts - route.last_seen < self.dedup_seconds:
+                # Same route reposted by another channel - one observation
+                return False
+            route.count += 1
+            route.last_seen = ts
+            route.hours[time.localtime(ts).tm_hour] += 1
+            if distance_km:
+                route.distance_km = round(distance_km, 1)
+            # A new leg starting where an earlier one ended closes that earlier leg
+            arrived = self._open.pop((threat_type, src), None)
+            if arrived is not None:
+                prev_route, prev_ts = arrived
+                if 0 < ts - prev_ts <= self.transit_window:
+                    prev_route.add_transit(ts - prev_ts)
+            self._open[(threat_type, dst)] = (route, ts)
+            if len(self._open) > self.max_routes:
+                cutoff = ts - self.transit_window
+                self._open = {k: v for k, v in self._open.items() if v[1] >= cutoff}
+            self._resort(threat_type, src)
+            self._dirty = True
+        return True
+
+    def _resort(self, threat_type: str, src: str) -> None:
+        for key in ((threat_type, src), (ANY_THREAT, src)):
+            routes = self._by_source.get(key)
+            if routes and len(routes) > 1:
+                routes.sort(key=lambda r: r.count, reverse=True)
+
+    def _reindex(self) -> None:
+        self._by_source = {}
+        for route in self._routes.values():
+            self._by_source.setdefault((route.threat_type, route.source), []).append(route)
+            self._by_source.setdefault((ANY_THREAT, route.source), []).append(route)
+        for routes in self._by_source.values():
+            routes.sort(key=lambda r: r.count, reverse=True)
+
+    def _evict_one(self) -> None:
+        # Drop the least recently seen single-observation route (or the stalest overall)
+        victim = min(self._routes.values(), key=lambda r: (r.count > 1, r.last_seen))
+        del self._routes[(victim.threat_type, victim.source, victim.target)]
+        for key in ((victim.threat_type, victim.source), (ANY_THREAT, victim.source)):
+            routes = self._by_source.get(key)
+            if routes:
+                routes.remove(victim)
+                if not routes:
+                    del self._by_source[key]
+
+    # ----- Lookup -----
+    def predict(
+        self,
+        source: Optional[str],
+        threat_type: Optional[str] = None,
+        limit: int = 3,
+        speed_kmh: Optional[float] = None,
+    ) -> list[dict]:
+        """Most likely targets from ``source``, with probability and ETA minutes."""
+        src = normalize_place(source)
+        if not src:
+            return []
+        with self._lock:
+            routes = self._by_source.get((threat_type or ANY_THREAT, src))
+            if not routes:
+                return []
+            if threat_type is None:
+                # Same target may appear under several threat types
+                merged: dict[str, list] = {}
+                for r in routes:
+                    entry = merged.setdefault(r.target, [r, 0])
+                    entry[1] += r.count
+                    if r.count > entry[0].count:
+                        entry[0] = r
+                ranked = sorted(merged.values(), key=lambda e: e[1], reverse=True)
+            else:
+                ranked = [[r, r.count] for r in routes]
+            total = sum(count for _, count in ranked)
+            out = []
+            for route, count in ranked[:limit]:
+                eta = None
+                if route.transit_n:
+                    eta = round(route.transit_mean / 60, 1)
+                elif route.distance_km and speed_kmh:
+                    eta = round(route.distance_km / speed_kmh * 60, 1)
+                std = route.transit_std
+                out.append({
+                    'target': route.label_target,
+                    'probability': round(count / total, 3),
+                    'count': count,
+                    'eta_minutes': eta,
+                    'eta_std_minutes': round(std / 60, 1) if std is not None else None,
+                    'transit_samples': route.transit_n,
+                })
+            return out
+
+    # ----- Introspection -----
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'file': self.path,
+                'routes': len(self._routes),
+                'sources': sum(1 for k in self._by_source if k[0] != ANY_THREAT),
+                'observations': sum(r.count for r in self._routes.values()),
+                'with_transit': sum(1 for r in self._routes.values() if r.transit_n),
+                'dirty': self._dirty,
+                'last_flush': self.last_flush,
+                'flushes': self.flushes,
+            }
+
+    def top_routes(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            routes = sorted(self._routes.values(), key=lambda r: r.count, reverse=True)[:limit]
+            return [r.to_json() for r in routes]
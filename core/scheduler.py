@@ -0,0 +1,365 @@
+"""
+Cooperative background scheduler for periodic and one-shot jobs.
+
+One scheduler loop replaces the per-feature ``while True: ...; time.sleep(n)``
+threads. Each job has an interval with jitter (so jobs registered together do
+not fire in lockstep), an optional timeout, overlap prevention (a run that is
+still going when the next one is due is skipped, not stacked) and run-duration
+stats. Execution is picked per job:
+
+* coroutine functions run on one scheduler-owned asyncio loop thread and are
+  cancelled on timeout (``asyncio.wait_for``);
+* plain functions run in a greenlet when gevent has monkey-patched threading
+  (timeout raises ``gevent.Timeout`` inside the job), otherwise in a daemon
+  thread (timeout is reported, the run cannot be interrupted).
+
+Long CPU-bound jobs should call :func:`cooperative_yield` between steps so
+request greenlets are not starved under the gevent worker.
+
+With ``inline=True`` and an injected clock nothing is spawned: the test calls
+:meth:`Scheduler.run_pending` and jobs run synchronously, which makes
+scheduling deterministic.
+
+Usage:
+    from core.scheduler import Scheduler
+
+    SCHEDULER = Scheduler()
+    SCHEDULER.every('memory_cleanup', 300, _memory_cleanup, jitter=0.1, timeout=60)
+    SCHEDULER.every('telegram_poll', 45, _poll_channels)        # async def
+    SCHEDULER.submit('push', send_push, message)                # one-shot
+    SCHEDULER.start()
+
+    clock = [0.0]
+    sched = Scheduler(clock=lambda: clock[0], inline=True)   # tests
+    sched.every('job', 10, fn, jitter=0)
+    clock[0] = 10; sched.run_pending()
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+try:
+    import gevent
+    from gevent import monkey as _gevent_monkey
+except ImportError:
+    gevent = None
+    _gevent_monkey = None
+
+log = logging.getLogger(__name__)
+
+# Returned by a job to unschedule itself
+STOP = object()
+
+
+def gevent_active() -> bool:
+    """True when running under a gevent worker that patched ``threading``."""
+    return _gevent_monkey is not None and _gevent_monkey.is_module_patched('threading')
+
+
+def cooperative_yield() -> None:
+    """Give other greenlets/threads a turn in the middle of a long job."""
+    if gevent_active():
+        gevent.sleep(0)
+    else:
+        time.sleep(0)
+
+
+class JobTimeout(Exception):
+    pass
+
+
+class Job:
+    __slots__ = (
+        'name', 'fn', 'args', 'kwargs', 'interval', 'jitter', 'timeout', 'is_coroutine',
+        'one_shot', 'next_run', 'running', 'started_at', 'timed_out', 'cancelled',
+        'runs', 'failures', 'timeouts', 'skipped', 'last_duration', 'max_duration',
+        'total_duration', 'last_error', 'last_finished',
+    )
+
+    def __init__(self, name: str, fn: Callable, interval: Optional[float], jitter: float,
+                 timeout: Optional[float], args: tuple = (), kwargs: Optional[dict] = None) -> None:
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.is_coroutine = asyncio.iscoroutinefunction(fn)
+        self.one_shot = interval is None
+        self.next_run = 0.0
+        self.running = False
+        self.started_at: Optional[float] = None
+        self.timed_out = False
+        self.cancelled = False
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.last_duration: Optional[float] = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error: Optional[str] = None
+        self.last_finished: Optional[float] = None
+
+    def stats(self, now: float) -> dict:
+        return {
+            'interval': self.interval,
+            'kind': 'async' if self.is_coroutine else 'sync',
+            'running': self.running,
+            'running_for': round(now - self.started_at, 3) if self.running and self.started_at is not None else None,
+            'next_in': round(self.next_run - now, 3) if not self.running and not self.one_shot else None,
+            'runs': self.runs,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'skipped': self.skipped,
+            'last_duration': self.last_duration,
+            'max_duration': round(self.max_duration, 4),
+            'avg_duration': round(self.total_duration / self.runs, 4) if self.runs else None,
+            'last_error': self.last_error,
+        }
+
+
+class Scheduler:
+    """Single loop dispatching periodic/one-shot jobs to greenlets, threads or an asyncio loop."""
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+        tick: float = 1.0,
+        inline: bool = False,
+        on_run: Optional[Callable[[str, float, str], None]] = None,
+    ) -> None:
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self.tick = tick
+        self.inline = inline
+        self.on_run = on_run          # (job name, duration seconds, outcome) after every run
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._oneshot_seq = 0
+
+    # ----- Registration -----
+    def every(self, name: str, interval: float, fn: Callable, jitter: float = 0.1,
+              timeout: Optional[float] = None, initial_delay: Optional[float] = None,
+              args: tuple = (), kwargs: Optional[dict] = None) -> Job:
+        """Run ``fn`` every ``interval`` seconds (+-``jitter`` fraction). Replaces a job of the same name."""
+        job = Job(name, fn, float(interval), max(0.0, jitter), timeout, args, kwargs)
+        delay = self._jittered(job) if initial_delay is None else initial_delay
+        job.next_run = self._clock() + delay
+        with self._lock:
+            previous = self._jobs.get(name)
+            if previous is not None:
+                previous.cancelled = True
+            self._jobs[name] = job
+        self._wake.set()
+        return job
+
+    def submit(self, name: str, fn: Callable, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Job:
+        """Run ``fn(*args, **kwargs)`` once, as soon as the loop gets to it."""
+        with self._lock:
+            self._oneshot_seq += 1
+            job = Job(f"{name}#{self._oneshot_seq}", fn, None, 0.0, timeout, args, kwargs)
+            job.next_run = self._clock()
+            self._jobs[job.name] = job
+        self._wake.set()
+        return job
+
+    def cancel(self, name: str) -> bool:
+        """Unschedule ``name``; a run in progress finishes but is not repeated."""
+        with self._lock:
+            job = self._jobs.pop(name, None)
+        if job is None:
+            return False
+        job.cancelled = True
+        return True
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._jobs
+
+    def _jittered(self, job: Job) -> float:
+        if not job.jitter:
+            return job.interval
+        return job.interval * (1 + self._rng.uniform(-job.jitter, job.jitter))
+
+    # ----- Dispatch -----
+    def run_pending(self) -> int:
+        """Start every due job; returns how many were started."""
+        now = self._clock()
+        started = 0
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.running:
+                self._check_timeout(job, now)
+                if not job.one_shot and now >= job.next_run:
+                    job.skipped += 1  # overlap prevention: never stack runs
+                    job.next_run = now + self._jittered(job)
+                continue
+            if now < job.next_run or job.cancelled:
+                continue
+            job.running = True
+            job.started_at = now
+            job.timed_out = False
+            if job.one_shot:
+                with self._lock:
+                    self._jobs.pop(job.name, None)
+            else:
+                job.next_run = now + self._jittered(job)
+            started += 1
+            self._dispatch(job)
+        return started
+
+    def _check_timeout(self, job: Job, now: float) -> None:
+        # Only threads get here: greenlet and asyncio runs enforce their own timeout
+        if job.timeout and not job.timed_out and job.started_at is not None and now - job.started_at > job.timeout:
+            job.timed_out = True
+            job.timeouts += 1
+            log.warning(f"Job {job.name} exceeded its {job.timeout}s timeout (still running, cannot interrupt a thread)")
+
+    def _dispatch(self, job: Job) -> None:
+        if self.inline:
+            if job.is_coroutine:
+                loop = asyncio.new_event_loop()
+                try:
+                    loop.run_until_complete(self._run_async(job))
+                finally:
+                    loop.close()
+            else:
+                self._run_sync(job)
+        elif job.is_coroutine:
+            asyncio.run_coroutine_threadsafe(self._run_async(job), self._ensure_loop())
+        elif gevent_active():
+            gevent.spawn(self._run_sync, job)
+        else:
+            threading.Thread(target=self._run_sync, args=(job,), daemon=True, name=f"job:{job.name}").start()
+
+    def _run_sync(self, job: Job) -> None:
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            if job.timeout and gevent_active() and not self.inline:
+                with gevent.Timeout(job.timeout, JobTimeout):
+                    result = job.fn(*job.args, **job.kwargs)
+            else:
+                result = job.fn(*job.args, **job.kwargs)
+        except BaseException as exc:  # gevent.Timeout is a BaseException
+            error = exc
+        self._finish(job, time.perf_counter() - start, result, error)
+
+    async def _run_async(self, job: Job) -> None:
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            coro = job.fn(*job.args, **job.kwargs)
+            result = await (asyncio.wait_for(coro, job.timeout) if job.timeout else coro)
+        except asyncio.TimeoutError:
+            error = JobTimeout()
+        except BaseException as exc:
+            error = exc
+        self._finish(job, time.perf_counter() - start, result, error)
+
+    def _finish(self, job: Job, duration: float, result: Any, error: Optional[BaseException]) -> None:
+        job.runs += 1
+        job.last_duration = round(duration, 4)
+        job.total_duration += duration
+        job.max_duration = max(job.max_duration, duration)
+        job.last_finished = self._clock()
+        if isinstance(error, JobTimeout):
+            job.timeouts += 1
+            job.last_error = f"timeout after {job.timeout}s"
+            outcome = 'timeout'
+            log.warning(f"Job {job.name} timed out after {job.timeout}s")
+        elif error is not None:
+            job.failures += 1
+            job.last_error = f"{error.__class__.__name__}: {error}"
+            outcome = 'error'
+            log.error(f"Job {job.name} failed: {job.last_error}")
+        else:
+            job.last_error = None
+            outcome = 'ok'
+        job.running = False
+        if result is STOP:
+            self.cancel(job.name)
+        if self.on_run is not None:
+            try:
+                self.on_run(job.name.split('#', 1)[0], duration, outcome)
+            except Exception:
+                pass
+        self._wake.set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.run_forever()
+
+                threading.Thread(target=run, daemon=True, name='scheduler-asyncio').start()
+                self._loop = loop
+            return self._loop
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The asyncio loop coroutine jobs run on (started on first use)."""
+        return self._ensure_loop()
+
+    # ----- Loop -----
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            pending = [j.next_run for j in self._jobs.values() if not j.running and not j.cancelled]
+        return min(pending) if pending else None
+
+    def start(self) -> bool:
+        """Start the scheduler loop (idempotent)."""
+        if self.inline:
+            return False
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='scheduler')
+            self._thread.start()
+        log.info(f"Scheduler started ({'gevent' if gevent_active() else 'threads'}, {len(self._jobs)} jobs)")
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as exc:
+                log.error(f"Scheduler loop error: {exc}")
+            due = self.next_due()
+            wait = self.tick if due is None else min(self.tick, max(0.0, due - self._clock()))
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    # ----- Introspection -----
+    def stats(self) -> dict:
+        now = self._clock()
+        with self._lock:
+            jobs = dict(self._jobs)
+        return {
+            'mode': 'inline' if self.inline else ('gevent' if gevent_active() else 'threads'),
+            'running': bool(self._thread and self._thread.is_alive()),
+            'asyncio_loop': self._loop is not None and self._loop.is_running(),
+            'jobs': {name: job.stats(now) for name, job in jobs.items()},
+        }
@@ -0,0 +1,326 @@
+"""
+In-memory settlement autocomplete index.
+
+All known place names (settlements, raions, inflected forms from the parser's
+normalization map) are normalized once at build time into a sorted key array
+plus a key -> places map, with a parallel array of Latin transliterations
+(KMU 2010) so "kharkiv" finds Харків. Queries are answered locally:
+
+* exact name / inflected alias;
+* ranked prefix matches (bisect into the sorted keys, bounded scan; one-
+  and two-letter prefixes use top lists precomputed at build time);
+* fuzzy matches within edit distance 1 (query variants looked up as whole
+  names, then as prefixes), so typos still complete.
+
+Results are ranked by match class, place rank (cities before villages) and
+name length. Network geocoding is left to the caller for queries with no
+local candidate.
+
+Usage:
+    from core.settlement_index import SettlementIndex
+
+    index = SettlementIndex()
+    index.add('харків', (49.99, 36.23), region='харківська', rank=0)
+    index.add_alias('харкова', 'харків')
+    index.build()
+
+    index.lookup('Харкова')            # best located place or None
+    index.suggest('харк', limit=10)    # [{'name': 'Харків', 'lat': ..., 'match': 'prefix'}, ...]
+"""
+
+import bisect
+import logging
+import time
+from typing import Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+# Quotes/punctuation dropped; Russian-only letters folded to the Ukrainian ones
+_NORMALIZE_TABLE = str.maketrans({
+    '"': None, '`': None, 'ʼ': None, '’': None, "'": None, '.': None, ',': None,
+    ':': None, ';': None, '(': None, ')': None, '«': None, '»': None,
+    'ё': 'е', 'ы': 'и', 'э': 'е', 'ъ': None,
+})
+
+_TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e', 'є': 'ie',
+    'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'i', 'й': 'i', 'к': 'k', 'л': 'l',
+    'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'iu',
+    'я': 'ia',
+}
+# Word-initial forms of the iotated letters
+_TRANSLIT_INITIAL = {'є': 'ye', 'ї': 'yi', 'й': 'y', 'ю': 'yu', 'я': 'ya'}
+
+_CYRILLIC_ALPHABET = 'абвгґдеєжзиіїйклмнопрстуфхцчшщьюя'
+_LATIN_ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+MATCH_EXACT, MATCH_ALIAS, MATCH_PREFIX, MATCH_FUZZY = 0, 1, 2, 3
+_MATCH_NAMES = ('exact', 'alias', 'prefix', 'fuzzy')
+
+
+def normalize_name(name: Optional[str]) -> str:
+    if not name:
+        return ''
+    return ' '.join(name.lower().translate(_NORMALIZE_TABLE).split())
+
+
+def label_name(name: str) -> str:
+    """Lowercase display form that keeps the apostrophe (``слов'янськ`` -> ``словʼянськ``)."""
+    return ' '.join(name.lower().replace("'", 'ʼ').replace('’', 'ʼ').replace('`', 'ʼ').split())
+
+
+def transliterate(name: str) -> str:
+    """Latin form of a normalized Ukrainian name (KMU 2010, simplified)."""
+    out = []
+    prev = ' '
+    for ch in name:
+        if prev in ' -':
+            out.append(_TRANSLIT_INITIAL.get(ch) or _TRANSLIT.get(ch, ch))
+        else:
+            out.append(_TRANSLIT.get(ch, ch))
+        prev = ch
+    return ''.join(out)
+
+
+def display_name(name: str) -> str:
+    return '-'.join(
+        ' '.join(word[:1].upper() + word[1:] for word in part.split(' '))
+        for part in name.split('-')
+    )
+
+
+def _edits1(word: str, alphabet: str) -> set[str]:
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in alphabet if c != b[0]]
+    inserts = [a + c + b for a, b in splits for c in alphabet]
+    return set(deletes + transposes + replaces + inserts)
+
+
+class Place:
+    __slots__ = ('name', 'label', 'lat', 'lng', 'region', 'kind', 'rank')
+
+    def __init__(self, name: str, label: str, coords: Optional[tuple], region: Optional[str],
+                 kind: str, rank: int) -> None:
+        self.name = name
+        self.label = label
+        self.lat = coords[0] if coords else None
+        self.lng = coords[1] if coords else None
+        self.region = region
+        self.kind = kind
+        self.rank = rank
+
+    @property
+    def located(self) -> bool:
+        return self.lat is not None and self.lng is not None
+
+    def to_dict(self, match: Optional[int] = None) -> dict:
+        out = {
+            'name': display_name(self.label),
+            'lat': self.lat,
+            'lng': self.lng,
+            'region': display_name(self.region) if self.region else None,
+            'kind': self.kind,
+        }
+        if match is not None:
+            out['match'] = _MATCH_NAMES[match]
+        return out
+
+
+class SettlementIndex:
+    """Sorted-key prefix index with aliases, transliteration and 1-edit fuzzy matching."""
+
+    def __init__(self, max_prefix_scan: int = 1000, fuzzy_min_length: int = 4, short_prefix_top: int = 50) -> None:
+        self.max_prefix_scan = max_prefix_scan
+        self.fuzzy_min_length = fuzzy_min_length
+        self.short_prefix_top = short_prefix_top
+        self._places: list[Place] = []
+        self._by_name_region: dict[tuple[str, Optional[str]], int] = {}
+        # normalized key -> [(place id, match class)]
+        self._by_key: dict[str, list[tuple[int, int]]] = {}
+        self._by_latin: dict[str, list[tuple[int, int]]] = {}
+        self._keys: list[str] = []
+        self._latin_keys: list[str] = []
+        # one/two-letter prefix -> best (place id, match) pairs, precomputed
+        self._short: dict[str, list[tuple[int, int]]] = {}
+        self.build_ms: Optional[float] = None
+
+    # ----- Build -----
+    def add(
+        self,
+        name: str,
+        coords: Optional[tuple] = None,
+        region: Optional[str] = None,
+        kind: str = 'settlement',
+        rank: int = 2,
+    ) -> Optional[int]:
+        """Add a place; a repeated (name, region) only fills in missing coords/rank."""
+        key = normalize_name(name)
+        if len(key) < 2:
+            return None
+        region = normalize_name(region) or None
+        existing = self._by_name_region.get((key, region))
+        if existing is not None:
+            place = self._places[existing]
+            if not place.located and coords:
+                place.lat, place.lng = coords[0], coords[1]
+            place.rank = min(place.rank, rank)
+            return existing
+        if region is None:
+            # A region-less duplicate of a known name adds nothing for autocomplete
+            for pid, match in self._by_key.get(key, ()):
+                if match == MATCH_EXACT:
+                    place = self._places[pid]
+                    if not place.located and coords:
+                        place.lat, place.lng = coords[0], coords[1]
+                    place.rank = min(place.rank, rank)
+                    return pid
+        pid = len(self._places)
+        self._places.append(Place(key, label_name(name), coords, region, kind, rank))
+        self._by_name_region[(key, region)] = pid
+        self._by_key.setdefault(key, []).append((pid, MATCH_EXACT))
+        self._by_latin.setdefault(transliterate(key), []).append((pid, MATCH_EXACT))
+        return pid
+
+    def add_alias(self, alias: str, canonical: str) -> bool:
+        """Index an inflected/variant form (``харкова``) under its canonical name."""
+        alias_key, canonical_key = normalize_name(alias), normalize_name(canonical)
+        targets = [pid for pid, match in self._by_key.get(canonical_key, ()) if match == MATCH_EXACT]
+        if not targets or alias_key == canonical_key or len(alias_key) < 2:
+            return False
+        bucket = self._by_key.setdefault(alias_key, [])
+        for pid in targets:
+            if all(existing != pid for existing, _ in bucket):
+                bucket.append((pid, MATCH_ALIAS))
+        return True
+
+    def build(self) -> 'SettlementIndex':
+        start = time.perf_counter()
+        self._keys = sorted(self._by_key)
+        self._latin_keys = sorted(self._by_latin)
+        self._short = {}
+        for by_key in (self._by_key, self._by_latin):
+            grouped: dict[str, set[int]] = {}
+            for key, candidates in by_key.items():
+                for length in (1, 2):
+                    if len(key) > length:
+                        grouped.setdefault(key[:length], set()).update(pid for pid, _ in candidates)
+            for prefix, pids in grouped.items():
+                top = sorted(pids, key=self._place_order)[:self.short_prefix_top]
+                self._short[prefix] = [(pid, MATCH_PREFIX) for pid in top]
+        self.build_ms = round((time.perf_counter() - start) * 1000, 2)
+        log.info(f"Settlement index: {len(self._places)} places, {len(self._keys)} keys, {self.build_ms} ms")
+        return self
+
+    # ----- Lookup -----
+    def _space(self, query: str) -> tuple[dict, list, str]:
+        if query.isascii():
+            return self._by_latin, self._latin_keys, _LATIN_ALPHABET
+        return self._by_key, self._keys, _CYRILLIC_ALPHABET
+
+    @staticmethod
+    def _inflection_variants(key: str) -> list[str]:
+        # Accusative -> nominative for feminine names ("полтаву" -> "полтава")
+        if len(key) > 4 and key.endswith(('у', 'ю')):
+            return [key[:-1] + 'а', key[:-1] + 'я']
+        return []
+
+    def lookup(self, query: str, region: Optional[str] = None) -> Optional[Place]:
+        """Best located place whose name or alias equals ``query``."""
+        key = normalize_name(query)
+        if not key:
+            return None
+        by_key, _keys, _alphabet = self._space(key)
+        candidates = by_key.get(key)
+        if not candidates and not key.isascii():
+            for variant in self._inflection_variants(key):
+                candidates = by_key.get(variant)
+                if candidates:
+                    break
+        if not candidates:
+            return None
+        region = normalize_name(region) or None
+        located = [self._places[pid] for pid, _ in candidates if self._places[pid].located]
+        if not located:
+            return None
+        return min(located, key=lambda p: (region is not None and p.region != region, p.rank, p.name))
+
+    def suggest(self, query: str, limit: int = 15) -> list[dict]:
+        """Top ``limit`` places for an autocomplete query, best first."""
+        key = normalize_name(query)
+        if not key:
+            return []
+        by_key, keys, alphabet = self._space(key)
+        best: dict[int, int] = {}
+
+        def consider(candidates, match_floor: int) -> None:
+            for pid, match in candidates:
+                match = max(match, match_floor)
+                if best.get(pid, MATCH_FUZZY + 1) > match:
+                    best[pid] = match
+
+        consider(by_key.get(key, ()), MATCH_EXACT)
+        if len(key) <= 2:
+            consider(self._short.get(key, ()), MATCH_PREFIX)
+        else:
+            self._scan_prefix(key, keys, by_key, consider, MATCH_PREFIX)
+        if len(best) < limit and not key.isascii():
+            for variant in self._inflection_variants(key):
+                consider(by_key.get(variant, ()), MATCH_ALIAS)
+        if len(best) < limit and len(key) >= self.fuzzy_min_length:
+            variants = _edits1(key, alphabet)
+            for variant in variants:
+                candidates = by_key.get(variant)
+                if candidates:
+                    consider(candidates, MATCH_FUZZY)
+            if not best:
+                for variant in variants:
+                    self._scan_prefix(variant, keys, by_key, consider, MATCH_FUZZY, max_scan=limit)
+                    if len(best) >= limit:
+                        break
+
+        ranked = sorted(best.items(), key=lambda item: (item[1],) + self._place_order(item[0]))
+        return [self._places[pid].to_dict(match) for pid, match in ranked[:limit]]
+
+    def _place_order(self, pid: int) -> tuple:
+        place = self._places[pid]
+        return place.rank, len(place.name), place.name
+
+    def _scan_prefix(self, prefix: str, keys: list, by_key: dict, consider, match: int,
+                     max_scan: Optional[int] = None) -> None:
+        i = bisect.bisect_left(keys, prefix)
+        end = min(len(keys), i + (max_scan or self.max_prefix_scan))
+        while i < end and keys[i].startswith(prefix):
+            if keys[i] != prefix:
+                consider(by_key[keys[i]], match)
+            i += 1
+
+    # ----- Introspection -----
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def stats(self) -> dict:
+        return {
+            'places': len(self._places),
+            'located': sum(1 for p in self._places if p.located),
+            'keys': len(self._keys),
+            'latin_keys': len(self._latin_keys),
+            'build_ms': self.build_ms,
+        }
+
+    @classmethod
+    def from_sources(
+        cls,
+        places: Iterable[tuple],
+        aliases: Iterable[tuple[str, str]] = (),
+        **kwargs,
+    ) -> 'SettlementIndex':
+        """Build from ``(name, coords, region, kind, rank)`` tuples plus ``(alias, canonical)`` pairs."""
+        index = cls(**kwargs)
+        for name, coords, region, kind, rank in places:
+            index.add(name, coords, region, kind, rank)
+        for alias, canonical in aliases:
+            index.add_alias(alias, canonical)
+        return index.build()
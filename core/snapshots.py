@@ -0,0 +1,401 @@
+"""
+Local snapshot & replication for JSON data files.
+
+Replaces the old git commit/push persistence. Tracked files (messages,
+chat, devices) are captured by a background thread into a snapshot
+directory (local disk or a mounted volume) as:
+
+    <dir>/<name>/full-<seq>.json.gz     compressed point-in-time snapshot
+    <dir>/<name>/changes-<seq>.ndjson.gz incremental change log on top of it
+    <dir>/<name>/manifest.json          sha256 + size of every snapshot
+
+The ingest path never touches this module: the worker only stats the
+tracked files and captures them when their mtime changes.
+
+Usage:
+    from core.snapshots import SnapshotManager
+
+    snapshots = SnapshotManager('/data/snapshots')
+    snapshots.track('messages', MESSAGES_FILE)
+    snapshots.restore_missing()   # on boot, before the files are read
+    snapshots.start()             # background schedule
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _record_key(item: Any) -> Optional[str]:
+    if isinstance(item, dict) and item.get('id') is not None:
+        return str(item['id'])
+    return None
+
+
+def _index_records(data: Any) -> Optional[dict[str, Any]]:
+    """Map record key -> record for list-of-dicts (by ``id``) or dict data.
+
+    Returns None when the data has no stable keys and can only be
+    captured as full snapshots.
+    """
+    if isinstance(data, dict):
+        return {str(k): v for k, v in data.items()}
+    if isinstance(data, list):
+        index = {}
+        for item in data:
+            key = _record_key(item)
+            if key is None or key in index:
+                return None
+            index[key] = item
+        return index
+    return None
+
+
+def _write_atomic(path: str, payload: bytes) -> None:
+    base_dir = os.path.dirname(path) or '.'
+    os.makedirs(base_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=base_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(payload)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+class _TrackedFile:
+    """Capture state for one tracked file."""
+
+    def __init__(self, name: str, path: str) -> None:
+        self.name = name
+        self.path = path
+        self.mtime = 0.0
+        self.digest: Optional[str] = None
+        self.index: Optional[dict[str, Any]] = None
+        self.seq = 0
+        self.base_ts = 0.0
+        self.deltas = 0
+        self.last_capture: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+class SnapshotManager:
+    """Background snapshotting of JSON files with restore-on-boot."""
+
+    def __init__(
+        self,
+        directory: str,
+        interval: float = 60.0,
+        full_interval: float = 3600.0,
+        max_deltas: int = 120,
+        keep: int = 24,
+        jitter: float = 0.1,
+    ) -> None:
+        self.directory = directory
+        self.interval = max(1.0, interval)
+        self.full_interval = max(self.interval, full_interval)
+        self.max_deltas = max(1, max_deltas)
+        self.keep = max(1, keep)
+        self.jitter = max(0.0, jitter)
+        self._files: dict[str, _TrackedFile] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'full': 0, 'delta': 0, 'skipped': 0, 'errors': 0, 'restored': 0}
+
+    # ----- Registration -----
+    def track(self, name: str, path: str) -> None:
+        with self._lock:
+            self._files[name] = _TrackedFile(name, path)
+
+    # ----- Background schedule -----
+    def start(self) -> bool:
+        """Start the background worker (idempotent)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='snapshots')
+            self._thread.start()
+            return True
+
+    def stop(self, final_capture: bool = True) -> None:
+        self._stop.set()
+        if final_capture:
+            self.capture_all()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            if self._stop.wait(delay):
+                break
+            self.capture_all()
+
+    # ----- Capture -----
+    def capture_all(self, force_full: bool = False) -> dict[str, str]:
+        """Capture every tracked file that changed. Returns name -> action."""
+        results = {}
+        with self._lock:
+            for tracked in list(self._files.values()):
+                try:
+                    results[tracked.name] = self._capture(tracked, force_full)
+                    tracked.last_error = None
+                except Exception as exc:
+                    self.stats['errors'] += 1
+                    tracked.last_error = str(exc)
+                    results[tracked.name] = 'error'
+                    log.warning(f"Snapshot of {tracked.name} failed: {exc}")
+        return results
+
+    def _capture(self, tracked: _TrackedFile, force_full: bool) -> str:
+        try:
+            mtime = os.path.getmtime(tracked.path)
+        except OSError:
+            return 'missing'
+        if not force_full and mtime == tracked.mtime:
+            self.stats['skipped'] += 1
+            return 'unchanged'
+
+        with open(tracked.path, 'rb') as fp:
+            raw = fp.read()
+        digest = _sha256(raw)
+        tracked.mtime = mtime
+        if not force_full and digest == tracked.digest:
+            self.stats['skipped'] += 1
+            return 'unchanged'
+
+        data = json.loads(raw.decode('utf-8'))
+        index = _index_records(data)
+        now = time.time()
+        need_full = (
+            force_full
+            or tracked.digest is None
+            or tracked.index is None
+            or index is None
+            or tracked.deltas >= self.max_deltas
+            or now - tracked.base_ts >= self.full_interval
+        )
+        if need_full:
+            self._write_full(tracked, raw, digest, now)
+            action = 'full'
+        else:
+            self._append_delta(tracked, data, index, digest, now)
+            action = 'delta'
+        tracked.digest = digest
+        tracked.index = index
+        tracked.last_capture = now
+        self.stats[action] += 1
+        return action
+
+    def _dir_for(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write_full(self, tracked: _TrackedFile, raw: bytes, digest: str, now: float) -> None:
+        target_dir = self._dir_for(tracked.name)
+        manifest = self._load_manifest(tracked.name)
+        seq = max([s['seq'] for s in manifest['snapshots']] + [tracked.seq]) + 1
+        filename = f'full-{seq:08d}.json.gz'
+        _write_atomic(os.path.join(target_dir, filename), gzip.compress(raw, compresslevel=6))
+        manifest['snapshots'].append({
+            'seq': seq,
+            'file': filename,
+            'ts': now,
+            'sha256': digest,
+            'size': len(raw),
+        })
+        self._prune(tracked.name, manifest)
+        self._save_manifest(tracked.name, manifest)
+        tracked.seq = seq
+        tracked.base_ts = now
+        tracked.deltas = 0
+
+    def _append_delta(
+        self,
+        tracked: _TrackedFile,
+        data: Any,
+        index: dict[str, Any],
+        digest: str,
+        now: float,
+    ) -> None:
+        previous = tracked.index or {}
+        upserts = {k: v for k, v in index.items() if previous.get(k) != v}
+        deletes = [k for k in previous if k not in index]
+        entry = {
+            'ts': now,
+            'upsert': upserts,
+            'delete': deletes,
+            'order': list(index.keys()) if isinstance(data, list) else None,
+            'sha256': digest,
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        path = os.path.join(self._dir_for(tracked.name), f'changes-{tracked.seq:08d}.ndjson.gz')
+        # Each append is its own gzip member; concatenated members are a valid stream.
+        with open(path, 'ab') as fp:
+            fp.write(gzip.compress(line.encode('utf-8'), compresslevel=6))
+            fp.flush()
+            os.fsync(fp.fileno())
+        tracked.deltas += 1
+
+    def _prune(self, name: str, manifest: dict[str, Any]) -> None:
+        snapshots = manifest['snapshots']
+        if len(snapshots) <= self.keep:
+            return
+        target_dir = self._dir_for(name)
+        for old in snapshots[:-self.keep]:
+            for filename in (old['file'], f"changes-{old['seq']:08d}.ndjson.gz"):
+                try:
+                    os.remove(os.path.join(target_dir, filename))
+                except OSError:
+                    pass
+        manifest['snapshots'] = snapshots[-self.keep:]
+
+    # ----- Manifest -----
+    def _load_manifest(self, name: str) -> dict[str, Any]:
+        path = os.path.join(self._dir_for(name), MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as fp:
+                manifest = json.load(fp)
+            if isinstance(manifest.get('snapshots'), list):
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'name': name, 'snapshots': []}
+
+    def _save_manifest(self, name: str, manifest: dict[str, Any]) -> None:
+        payload = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        _write_atomic(os.path.join(self._dir_for(name), MANIFEST_NAME), payload)
+
+    # ----- Restore -----
+    def load_latest(self, name: str) -> Optional[bytes]:
+        """Rebuild the newest recoverable state of ``name`` as JSON bytes."""
+        target_dir = self._dir_for(name)
+        manifest = self._load_manifest(name)
+        for snap in reversed(manifest['snapshots']):
+            try:
+                with open(os.path.join(target_dir, snap['file']), 'rb') as fp:
+                    raw = gzip.decompress(fp.read())
+            except (OSError, EOFError, gzip.BadGzipFile):
+                continue
+            if _sha256(raw) != snap.get('sha256'):
+                log.warning(f"Snapshot {snap['file']} of {name} failed checksum, trying older")
+                continue
+            return self._replay(target_dir, snap['seq'], raw)
+        return None
+
+    def _replay(self, target_dir: str, seq: int, raw: bytes) -> bytes:
+        path = os.path.join(target_dir, f'changes-{seq:08d}.ndjson.gz')
+        if not os.path.exists(path):
+            return raw
+        data = json.loads(raw.decode('utf-8'))
+        index = _index_records(data)
+        if index is None:
+            return raw
+        order: Optional[list] = None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as fp:
+                lines = fp.readlines()
+        except (OSError, EOFError):
+            # Truncated tail (crash mid-append): keep what decodes cleanly.
+            lines = self._read_partial(path)
+        if not lines:
+            return raw
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            for key in entry.get('delete') or []:
+                index.pop(key, None)
+            index.update(entry.get('upsert') or {})
+            order = entry.get('order')
+        if isinstance(data, list):
+            state: Any = [index[k] for k in (order or index) if k in index]
+        else:
+            state = index
+        return json.dumps(state, ensure_ascii=False, indent=2).encode('utf-8')
+
+    @staticmethod
+    def _read_partial(path: str) -> list[str]:
+        lines = []
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as fp:
+                for line in fp:
+                    lines.append(line)
+        except (OSError, EOFError):
+            pass
+        return lines
+
+    def restore_missing(self) -> list[str]:
+        """Restore tracked files that are absent or unreadable. Returns restored names."""
+        restored = []
+        with self._lock:
+            for tracked in self._files.values():
+                if self._is_healthy(tracked.path):
+                    continue
+                payload = self.load_latest(tracked.name)
+                if payload is None:
+                    continue
+                try:
+                    _write_atomic(tracked.path, payload)
+                except OSError as exc:
+                    log.error(f"Failed to restore {tracked.name} to {tracked.path}: {exc}")
+                    continue
+                self.stats['restored'] += 1
+                restored.append(tracked.name)
+                log.info(f"Restored {tracked.name} from snapshot ({len(payload)} bytes)")
+        return restored
+
+    @staticmethod
+    def _is_healthy(path: str) -> bool:
+        try:
+            if os.path.getsize(path) == 0:
+                return False
+            with open(path, encoding='utf-8') as fp:
+                json.load(fp)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    # ----- Introspection -----
+    def status(self) -> dict[str, Any]:
+        with self._lock:
+            files = {}
+            for tracked in self._files.values():
+                manifest = self._load_manifest(tracked.name)
+                files[tracked.name] = {
+                    'path': tracked.path,
+                    'snapshots': len(manifest['snapshots']),
+                    'latest_seq': tracked.seq or None,
+                    'deltas_since_full': tracked.deltas,
+                    'last_capture': tracked.last_capture,
+                    'last_error': tracked.last_error,
+                }
+            return {
+                'directory': self.directory,
+                'interval': self.interval,
+                'full_interval': self.full_interval,
+                'running': bool(self._thread and self._thread.is_alive()),
+                'stats': dict(self.stats),
+                'files': files,
+            }
@@ -0,0 +1,281 @@
+"""
+Lazy, measured startup components.
+
+Heavy module-level work (settlement databases, name maps, Firebase, geocoder
+caches) is registered as named components with explicit dependencies. Each
+component is initialized once - on first use or by the background warm-up -
+and its init time is recorded for the startup diagnostics endpoint.
+
+Usage:
+    from core.startup import ComponentRegistry, LazyDict
+
+    STARTUP = ComponentRegistry()
+    STARTUP.register('settlements', _load_settlements)
+    STARTUP.register('name_region_map', _load_names, depends_on=('settlements',))
+
+    SETTLEMENTS = LazyDict(lambda: STARTUP.get('settlements'))
+    STARTUP.warm_in_background(delay=2.0)
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+_PENDING = 'pending'
+_RUNNING = 'running'
+_READY = 'ready'
+_FAILED = 'failed'
+
+
+class _Component:
+    def __init__(self, name: str, init_fn: Callable[[], Any], depends_on: tuple[str, ...]) -> None:
+        self.name = name
+        self.init_fn = init_fn
+        self.depends_on = depends_on
+        self.state = _PENDING
+        self.value: Any = None
+        self.error: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.trigger: Optional[str] = None
+        self.lock = threading.Lock()
+
+
+class ComponentRegistry:
+    """Dependency-ordered, once-only initialization with timings."""
+
+    def __init__(self) -> None:
+        self._components: dict[str, _Component] = {}
+        self._order: list[str] = []
+        self._created = time.time()
+        self._phases: dict[str, float] = {}
+        self._warm_thread: Optional[threading.Thread] = None
+        self._warm_done: Optional[float] = None
+
+    def register(
+        self,
+        name: str,
+        init_fn: Callable[[], Any],
+        depends_on: Iterable[str] = (),
+    ) -> None:
+        if name in self._components:
+            raise ValueError(f"Component already registered: {name}")
+        deps = tuple(depends_on)
+        for dep in deps:
+            if dep not in self._components:
+                raise ValueError(f"Component {name} depends on unknown component {dep}")
+        self._components[name] = _Component(name, init_fn, deps)
+        self._order.append(name)
+
+    def is_ready(self, name: str) -> bool:
+        comp = self._components.get(name)
+        return bool(comp and comp.state == _READY)
+
+    def get(self, name: str, trigger: str = 'demand') -> Any:
+        """Return the component value, initializing it (and its deps) first.
+
+        A failed init is remembered and returns None without retrying, so
+        hot paths never pay for a broken optional dependency twice.
+        """
+        comp = self._components[name]
+        if comp.state in (_READY, _FAILED):
+            return comp.value
+        for dep in comp.depends_on:
+            self.get(dep, trigger)
+        with comp.lock:
+            if comp.state in (_READY, _FAILED):
+                return comp.value
+            comp.state = _RUNNING
+            comp.trigger = trigger
+            comp.started_at = time.time()
+            start = time.perf_counter()
+            try:
+                comp.value = comp.init_fn()
+                comp.state = _READY
+            except Exception as exc:
+                comp.value = None
+                comp.error = f"{type(exc).__name__}: {exc}"
+                comp.state = _FAILED
+                log.warning(f"Startup component {name} failed: {exc}")
+            comp.duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        log.info(f"Startup component {name} {comp.state} in {comp.duration_ms} ms ({trigger})")
+        return comp.value
+
+    def mark_phase(self, name: str) -> None:
+        """Record a wall-clock milestone (seconds since registry creation)."""
+        self._phases[name] = round(time.time() - self._created, 3)
+
+    def warm_all(self) -> None:
+        for name in self._order:
+            self.get(name, trigger='warm')
+        self._warm_done = time.time()
+        self.mark_phase('warm_complete')
+
+    def warm_in_background(self, delay: float = 0.0) -> bool:
+        """Initialize every component in a daemon thread after ``delay`` seconds."""
+        if self._warm_thread is not None:
+            return False
+
+        def _runner():
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.warm_all()
+            except Exception as exc:
+                log.error(f"Startup warm-up failed: {exc}")
+
+        self._warm_thread = threading.Thread(target=_runner, daemon=True, name='startup_warm')
+        self._warm_thread.start()
+        return True
+
+    def report(self) -> dict[str, Any]:
+        components = []
+        for name in self._order:
+            comp = self._components[name]
+            components.append({
+                'name': name,
+                'state': comp.state,
+                'depends_on': list(comp.depends_on),
+                'duration_ms': comp.duration_ms,
+                'trigger': comp.trigger,
+                'started_at': comp.started_at,
+                'error': comp.error,
+            })
+        ready_ms = [c['duration_ms'] for c in components if c['duration_ms'] is not None]
+        return {
+            'phases': dict(self._phases),
+            'components': components,
+            'total_init_ms': round(sum(ready_ms), 2),
+            'warm_complete': self._warm_done is not None,
+        }
+
+
+class LazyDict(dict):
+    """dict that fills itself from ``loader`` on first access.
+
+    Lets module-level lookup tables keep their names and dict API while the
+    data behind them is loaded by a startup component.
+    """
+
+    def __init__(self, loader: Callable[[], Optional[dict]]) -> None:
+        super().__init__()
+        self._loader = loader
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _ensure(self) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            data = self._loader()
+            if data:
+                dict.update(self, data)
+            self._loaded = True
+
+    def __getitem__(self, key):
+        self._ensure()
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        self._ensure()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._ensure()
+        dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+        self._ensure()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._ensure()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._ensure()
+        return dict.__len__(self)
+
+    def __repr__(self):
+        if not self._loaded:
+            return '<LazyDict (not loaded)>'
+        return dict.__repr__(self)
+
+    def get(self, key, default=None):
+        self._ensure()
+        return dict.get(self, key, default)
+
+    def keys(self):
+        self._ensure()
+        return dict.keys(self)
+
+    def values(self):
+        self._ensure()
+        return dict.values(self)
+
+    def items(self):
+        self._ensure()
+        return dict.items(self)
+
+    def pop(self, key, *default):
+        self._ensure()
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        self._ensure()
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        self._ensure()
+        dict.update(self, *args, **kwargs)
+
+    def copy(self):
+        self._ensure()
+        return dict(self.items())
+
+
+class LazyList(list):
+    """list counterpart of :class:`LazyDict` for read-mostly sequences."""
+
+    def __init__(self, loader: Callable[[], Optional[list]]) -> None:
+        super().__init__()
+        self._loader = loader
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _ensure(self) -> None:
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            data = self._loader()
+            if data:
+                list.extend(self, data)
+            self._loaded = True
+
+    def __getitem__(self, index):
+        self._ensure()
+        return list.__getitem__(self, index)
+
+    def __contains__(self, item):
+        self._ensure()
+        return list.__contains__(self, item)
+
+    def __iter__(self):
+        self._ensure()
+        return list.__iter__(self)
+
+    def __len__(self):
+        self._ensure()
+        return list.__len__(self)
+
+    def __repr__(self):
+        if not self._loaded:
+            return '<LazyList (not loaded)>'
+        return list.__repr__(self)
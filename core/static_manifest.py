@@ -0,0 +1,224 @@
+"""
+In-memory manifest of static assets, built once at startup.
+
+Walks ``static/`` a single time and records, for every file, a content hash,
+size, mtime, mimetype and the file body together with precompressed gzip
+(and brotli, when the ``brotli`` package is installed) variants. Requests are
+then answered straight from memory: no per-request ``stat``/``open``, ETags
+that change only when content does, and fingerprinted URLs
+(``/static/ukraine_states.1a2b3c4d.svg``) that can be cached forever.
+
+Files above ``inline_limit`` are indexed but not held in memory; callers
+stream those from disk using the recorded ETag/mtime.
+
+Usage:
+    from core.static_manifest import StaticManifest
+
+    manifest = StaticManifest('static').build()
+    asset, fingerprinted = manifest.resolve('ukraine_states.1a2b3c4d.svg')
+    body, encoding = manifest.select(asset, request.headers.get('Accept-Encoding', ''))
+    url = manifest.url_for('ukraine_states.svg')
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+# Content types worth compressing; images/fonts are already compressed.
+COMPRESSIBLE_EXTENSIONS = frozenset({
+    '.js', '.css', '.svg', '.json', '.geojson', '.html', '.xml', '.txt', '.map', '.webmanifest',
+})
+
+mimetypes.add_type('application/geo+json', '.geojson')
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+mimetypes.add_type('image/webp', '.webp')
+
+HASH_LENGTH = 8
+
+
+class StaticAsset:
+    __slots__ = ('path', 'abs_path', 'size', 'mtime', 'digest', 'mimetype', 'body', 'gzip', 'br')
+
+    def __init__(self, path: str, abs_path: str, size: int, mtime: float, digest: str, mimetype: str) -> None:
+        self.path = path
+        self.abs_path = abs_path
+        self.size = size
+        self.mtime = mtime
+        self.digest = digest
+        self.mimetype = mimetype
+        self.body: Optional[bytes] = None
+        self.gzip: Optional[bytes] = None
+        self.br: Optional[bytes] = None
+
+    @property
+    def etag(self) -> str:
+        return self.digest[:16]
+
+    @property
+    def fingerprinted_path(self) -> str:
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.{self.digest[:HASH_LENGTH]}{ext}"
+
+
+def _parse_accept_encoding(header: str) -> dict[str, float]:
+    accepted: dict[str, float] = {}
+    for part in header.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    return accepted
+
+
+class StaticManifest:
+    """Content-addressed index of a static directory with precompressed variants."""
+
+    def __init__(
+        self,
+        root: str,
+        inline_limit: int = 4 * 1024 * 1024,
+        min_compress_size: int = 512,
+        gzip_level: int = 9,
+        brotli_quality: int = 11,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.inline_limit = inline_limit
+        self.min_compress_size = min_compress_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._assets: dict[str, StaticAsset] = {}
+        self._fingerprints: dict[str, StaticAsset] = {}
+        self.built_at: Optional[float] = None
+        self.build_ms: Optional[float] = None
+
+    # ----- Build -----
+    def build(self) -> 'StaticManifest':
+        start = time.perf_counter()
+        assets: dict[str, StaticAsset] = {}
+        fingerprints: dict[str, StaticAsset] = {}
+        for dirpath, _dirnames, filenames in os.walk(self.root, followlinks=True):
+            for fname in filenames:
+                abs_path = os.path.join(dirpath, fname)
+                rel = os.path.relpath(abs_path, self.root).replace(os.sep, '/')
+                # Legacy precompressed siblings are superseded by in-memory variants
+                if rel.endswith(('.gz', '.br')) and os.path.exists(abs_path[:-3]):
+                    continue
+                try:
+                    asset = self._load(rel, abs_path)
+                except OSError as exc:
+                    log.warning(f"Static manifest skipped {rel}: {exc}")
+                    continue
+                assets[rel] = asset
+                fingerprints[asset.fingerprinted_path] = asset
+        self._assets = assets
+        self._fingerprints = fingerprints
+        self.built_at = time.time()
+        self.build_ms = round((time.perf_counter() - start) * 1000, 2)
+        log.info(f"Static manifest: {len(assets)} files, {self.total_bytes() // 1024} KB in memory, {self.build_ms} ms")
+        return self
+
+    def _load(self, rel: str, abs_path: str) -> StaticAsset:
+        st = os.stat(abs_path)
+        with open(abs_path, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype in ('application/javascript', 'image/svg+xml'):
+            mimetype += '; charset=utf-8'
+        asset = StaticAsset(rel, abs_path, st.st_size, int(st.st_mtime),
+                            hashlib.sha256(data).hexdigest(), mimetype)
+        if st.st_size > self.inline_limit:
+            return asset
+        asset.body = data
+        ext = os.path.splitext(rel)[1].lower()
+        if ext in COMPRESSIBLE_EXTENSIONS and len(data) >= self.min_compress_size:
+            gz = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+            if len(gz) < len(data) * 0.95:
+                asset.gzip = gz
+            if brotli is not None:
+                br = brotli.compress(data, quality=self.brotli_quality)
+                if len(br) < len(gz if asset.gzip else data):
+                    asset.br = br
+        return asset
+
+    # ----- Lookup -----
+    def resolve(self, path: str) -> tuple[Optional[StaticAsset], bool]:
+        """Return ``(asset, fingerprinted)`` for a request path, or ``(None, False)``."""
+        asset = self._assets.get(path)
+        if asset is not None:
+            return asset, False
+        asset = self._fingerprints.get(path)
+        if asset is not None:
+            return asset, True
+        return None, False
+
+    def url_for(self, path: str) -> str:
+        """Fingerprinted URL for ``path``; the plain URL if the file is unknown."""
+        asset = self._assets.get(path.lstrip('/'))
+        if asset is None:
+            return f"/static/{path.lstrip('/')}"
+        return f"/static/{asset.fingerprinted_path}"
+
+    def select(self, asset: StaticAsset, accept_encoding: str) -> tuple[Optional[bytes], Optional[str]]:
+        """Pick the best in-memory representation for the client's Accept-Encoding."""
+        if asset.body is None:
+            return None, None
+        if asset.gzip is None and asset.br is None:
+            return asset.body, None
+        accepted = _parse_accept_encoding(accept_encoding)
+        if asset.br is not None and accepted.get('br', 0) > 0:
+            return asset.br, 'br'
+        if asset.gzip is not None and accepted.get('gzip', accepted.get('*', 0)) > 0:
+            return asset.gzip, 'gzip'
+        return asset.body, None
+
+    # ----- Introspection -----
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def total_bytes(self) -> int:
+        total = 0
+        for asset in self._assets.values():
+            for blob in (asset.body, asset.gzip, asset.br):
+                if blob:
+                    total += len(blob)
+        return total
+
+    def stats(self) -> dict:
+        largest = sorted(self._assets.values(), key=lambda a: a.size, reverse=True)[:5]
+        return {
+            'files': len(self._assets),
+            'memory_bytes': self.total_bytes(),
+            'gzip_variants': sum(1 for a in self._assets.values() if a.gzip),
+            'brotli_variants': sum(1 for a in self._assets.values() if a.br),
+            'brotli_available': brotli is not None,
+            'built_at': self.built_at,
+            'build_ms': self.build_ms,
+            'largest': [
+                {
+                    'path': a.path,
+                    'size': a.size,
+                    'gzip': len(a.gzip) if a.gzip else None,
+                    'br': len(a.br) if a.br else None,
+                    'url': f"/static/{a.fingerprinted_path}",
+                }
+                for a in largest
+            ],
+        }
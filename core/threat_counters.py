@@ -0,0 +1,355 @@
+"""
+Incrementally maintained threat state for the widget endpoints.
+
+Every message is classified exactly once, at ingest, and folded into:
+
+* rolling per-type and per-(type, region) quantity counts over a sliding
+  window (default 30 min), kept in a ring of time buckets with running
+  totals so reads never rescan messages;
+* the latest alarm start/clear state per region (``/api/alarm-status``);
+  an active alarm with no new start message for ``alarm_ttl_seconds``
+  expires on its own, so a missed відбій cannot pin a region forever;
+* a bounded, newest-last list of alarm events (``/api/events``).
+
+Usage:
+    from core.threat_counters import ThreatStateAggregator
+
+    THREAT_STATE = ThreatStateAggregator(window_seconds=1800, tz=kyiv_tz)
+    THREAT_STATE.seed(MESSAGE_STORE.load())
+    THREAT_STATE.observe(new_message)       # on ingest
+
+    THREAT_STATE.counts()                   # {'drones': 12, 'missiles': 0, ...}
+    THREAT_STATE.alarm_status()             # {region: {...}}
+    THREAT_STATE.recent_events(100)         # newest first
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+THREAT_TYPES = ('drones', 'missiles', 'kab', 'ballistic')
+
+# Checked in order; the first matching group wins (same precedence as the old scan).
+_TYPE_PATTERNS = (
+    ('drones', re.compile(r'шахед|shahed|герань|бпла|дрон|uav|безпілот')),
+    ('kab', re.compile(r'каб|керована бомба|авіабомб')),
+    ('ballistic', re.compile(r'балістик|іскандер|ballistic')),
+    ('missiles', re.compile(r'крилат|калібр|х-101|cruise|ракет')),
+)
+_QTY_RE = re.compile(r'(\d+)\s*[xхХ]?\s*(?:бпла|шахед|дрон|ракет|каб)')
+_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S')
+
+ALARM_START = ('🚨', 'Повітряна тривога')
+ALARM_CLEAR = ('🟢', 'Відбій тривоги')
+
+
+def message_timestamp(msg: dict, tz=None, default: Optional[float] = None) -> Optional[float]:
+    """Epoch seconds of a stored message's ``date`` (local time in ``tz``).
+
+    Messages without a date get ``default``; unparsable dates give None.
+    """
+    raw = msg.get('date') or msg.get('timestamp', '')
+    if not raw:
+        return default
+    if not isinstance(raw, str):
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            dt = datetime.strptime(raw[:19], fmt)
+        except ValueError:
+            continue
+        if tz is not None:
+            dt = tz.localize(dt)
+        return dt.timestamp()
+    return None
+
+
+def classify_threat(text: str) -> Optional[tuple[str, int]]:
+    """Return ``(threat_type, quantity)`` for lowercase ``text`` or None."""
+    for threat_type, pattern in _TYPE_PATTERNS:
+        if pattern.search(text):
+            qty_match = _QTY_RE.search(text)
+            return threat_type, int(qty_match.group(1)) if qty_match else 1
+    return None
+
+
+def parse_alarm_event(msg: dict) -> Optional[dict]:
+    """Alarm start/clear event for ``/api/events``, or None for other messages."""
+    text = (msg.get('text') or '').strip()
+    if '🚨' in text or 'Повітряна тривога' in text:
+        emoji, status = ALARM_START
+    elif '🟢' in text or 'Відбій тривоги' in text or 'відбій тривоги' in text:
+        emoji, status = ALARM_CLEAR
+    else:
+        return None
+
+    # Format 1: "**🚨 Дніпропетровська область**"
+    # Format 2: "**🚨 Харківський район (Харківська обл.)**"
+    region = ''
+    if '**' in text:
+        for part in text.split('**'):
+            part = part.strip()
+            if '🚨' in part or '🟢' in part:
+                region = part.replace('🚨', '').replace('🟢', '').strip()
+                break
+    if not region and text:
+        first_line = text.split('\n')[0].strip()
+        region = first_line.replace('**', '').replace('🚨', '').replace('🟢', '').strip()
+        region = region.replace('Повітряна тривога.', '').replace('Прямуйте в укриття!', '').strip()
+        region = region.replace('Відбій тривоги.', '').replace('Будьте обережні!', '').strip()
+    if not region:
+        return None
+
+    return {
+        'timestamp': msg.get('time', ''),
+        'channel': msg.get('channel', ''),
+        'emoji': emoji,
+        'region': region,
+        'status': status,
+        'text': text[:200],
+    }
+
+
+def _alarm_status_update(msg: dict) -> Optional[tuple[str, bool, str, str]]:
+    """``(region_key, is_clear, alarm_type, timestamp)`` for ``/api/alarm-status``."""
+    raw = msg.get('text') or ''
+    text = raw.lower()
+    is_all_clear = 'відбій' in text
+    is_alarm = 'тривога' in text or 'бпла' in text or 'дрон' in text or 'ракет' in text
+    if not (is_all_clear or is_alarm):
+        return None
+
+    location = ''
+    if '**' in raw:
+        for part in raw.split('**'):
+            part = part.strip()
+            if 'область' in part.lower() or 'обл' in part.lower():
+                location = part.replace('🚨', '').replace('🟢', '').strip()
+                break
+    if not location:
+        location = msg.get('location', raw[:50])
+    if not location:
+        return None
+
+    alarm_type = 'Повітряна тривога'
+    if 'бпла' in text or 'дрон' in text:
+        alarm_type = 'БпЛА/Дрони'
+    elif 'ракет' in text or 'балістичн' in text:
+        alarm_type = 'Ракетна загроза'
+
+    timestamp = msg.get('time', '') or msg.get('timestamp', '') or datetime.now().isoformat()
+    region_key = location.replace('🚨', '').replace('🟢', '').strip()[:50]
+    return region_key, is_all_clear, alarm_type, timestamp
+
+
+class RollingCounter:
+    """Sliding-window counter: a ring of time buckets plus running totals.
+
+    ``add`` and ``totals`` are O(1) amortized; expiring a bucket subtracts its
+    contents from the totals instead of re-summing the window.
+    """
+
+    def __init__(self, window_seconds: float, bucket_seconds: float) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, int(window_seconds // bucket_seconds))
+        self._slots: list[Optional[int]] = [None] * self.size  # bucket index held by each slot
+        self._buckets: list[dict] = [{} for _ in range(self.size)]
+        self._totals: dict = {}
+        self._head: Optional[int] = None  # newest bucket index seen
+
+    def _expire(self, slot: int) -> None:
+        for key, n in self._buckets[slot].items():
+            left = self._totals.get(key, 0) - n
+            if left > 0:
+                self._totals[key] = left
+            else:
+                self._totals.pop(key, None)
+        self._buckets[slot] = {}
+        self._slots[slot] = None
+
+    def advance(self, now: float) -> None:
+        head = int(now // self.bucket_seconds)
+        if self._head is not None and head <= self._head:
+            return
+        oldest_live = head - self.size + 1
+        for slot, index in enumerate(self._slots):
+            if index is not None and index < oldest_live:
+                self._expire(slot)
+        self._head = head
+
+    def add(self, key, n: int, ts: float, now: float) -> bool:
+        self.advance(now)
+        index = int(ts // self.bucket_seconds)
+        if index > self._head or index <= self._head - self.size:
+            return False  # outside the window (future-dated or already expired)
+        slot = index % self.size
+        if self._slots[slot] != index:
+            self._expire(slot)
+            self._slots[slot] = index
+        bucket = self._buckets[slot]
+        bucket[key] = bucket.get(key, 0) + n
+        self._totals[key] = self._totals.get(key, 0) + n
+        return True
+
+    def totals(self, now: float) -> dict:
+        self.advance(now)
+        return dict(self._totals)
+
+
+class ThreatStateAggregator:
+    """Ingest-time classifier feeding O(1) reads for the widget endpoints."""
+
+    def __init__(
+        self,
+        window_seconds: float = 1800,
+        bucket_seconds: float = 60,
+        tz=None,
+        max_events: int = 100,
+        max_regions: int = 500,
+        seed_messages: int = 500,
+        alarm_ttl_seconds: float = 65 * 60,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self._tz = tz
+        self._clock = clock
+        self._counter = RollingCounter(window_seconds, bucket_seconds)
+        self._dedup: OrderedDict = OrderedDict()  # text prefix -> ts counted
+        self._events: deque = deque(maxlen=max_events)
+        self._alarms: OrderedDict = OrderedDict()
+        self._max_regions = max_regions
+        self.alarm_ttl_seconds = alarm_ttl_seconds
+        self._alarm_seen: dict = {}  # region -> epoch of the latest start message for an active alarm
+        self._seed_messages = seed_messages
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.counted = 0
+        self.alarms_expired = 0
+
+    # ----- Ingest -----
+    def observe(self, msg: dict) -> None:
+        if not isinstance(msg, dict):
+            return
+        now = self._clock()
+        with self._lock:
+            self.observed += 1
+            self._observe_counts(msg, now)
+            event = parse_alarm_event(msg)
+            if event:
+                self._events.append(event)
+            update = _alarm_status_update(msg)
+            if update:
+                self._apply_alarm(*update, seen=message_timestamp(msg, self._tz, now) or now)
+
+    def observe_many(self, messages: Iterable[dict]) -> None:
+        for msg in messages:
+            self.observe(msg)
+
+    def seed(self, messages: list) -> 'ThreatStateAggregator':
+        """Rebuild state from the stored message list (oldest first)."""
+        self.observe_many(messages[-self._seed_messages:])
+        return self
+
+    def _observe_counts(self, msg: dict, now: float) -> None:
+        text = (msg.get('text') or '').lower()
+        ts = message_timestamp(msg, self._tz, now)
+        if ts is None or ts < now - self.window_seconds:
+            return
+        ts = min(ts, now)
+        # Same text posted by several channels counts once per window
+        text_key = text[:50]
+        counted_at = self._dedup.get(text_key)
+        if counted_at is not None and counted_at >= now - self.window_seconds:
+            return
+        classified = classify_threat(text)
+        if not classified:
+            return
+        threat_type, qty = classified
+        region = (msg.get('region') or msg.get('location') or '')[:50]
+        if not self._counter.add(threat_type, qty, ts, now):
+            return
+        if region:
+            self._counter.add((threat_type, region), qty, ts, now)
+        self._dedup[text_key] = ts
+        self._dedup.move_to_end(text_key)
+        while self._dedup:
+            _, oldest_ts = next(iter(self._dedup.items()))
+            if oldest_ts >= now - self.window_seconds:
+                break
+            self._dedup.popitem(last=False)
+        self.counted += 1
+
+    def _apply_alarm(self, region_key: str, is_clear: bool, alarm_type: str, timestamp: str,
+                     seen: float = 0.0) -> None:
+        if is_clear:
+            self._alarm_seen.pop(region_key, None)
+            self._alarms[region_key] = {
+                'active': False,
+                'start_time': None,
+                'type': None,
+                'end_time': timestamp,
+            }
+        else:
+            current = self._alarms.get(region_key)
+            self._alarm_seen[region_key] = max(seen, self._alarm_seen.get(region_key, 0.0))
+            if current is not None and current.get('active'):
+                return  # keep the original start time
+            self._alarms[region_key] = {
+                'active': True,
+                'start_time': timestamp,
+                'type': alarm_type,
+                'end_time': None,
+            }
+        self._alarms.move_to_end(region_key)
+        while len(self._alarms) > self._max_regions:
+            evicted, _ = self._alarms.popitem(last=False)
+            self._alarm_seen.pop(evicted, None)
+
+    def _expire_alarms(self, now: float) -> None:
+        """Drop active alarms whose latest start message is older than ``alarm_ttl_seconds``."""
+        cutoff = now - self.alarm_ttl_seconds
+        for region_key in [k for k, seen in self._alarm_seen.items() if seen < cutoff]:
+            del self._alarm_seen[region_key]
+            self._alarms.pop(region_key, None)
+            self.alarms_expired += 1
+
+    # ----- Reads -----
+    def counts(self) -> dict:
+        with self._lock:
+            totals = self._counter.totals(self._clock())
+        return {t: totals.get(t, 0) for t in THREAT_TYPES}
+
+    def counts_by_region(self) -> dict:
+        with self._lock:
+            totals = self._counter.totals(self._clock())
+        by_region: dict = {}
+        for key, n in totals.items():
+            if isinstance(key, tuple):
+                threat_type, region = key
+                by_region.setdefault(region, {})[threat_type] = n
+        return by_region
+
+    def alarm_status(self) -> dict:
+        with self._lock:
+            self._expire_alarms(self._clock())
+            return {k: dict(v) for k, v in self._alarms.items()}
+
+    def recent_events(self, limit: int = 100) -> list:
+        with self._lock:
+            events = list(self._events)
+        events.reverse()
+        return events[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'observed': self.observed,
+                'counted': self.counted,
+                'events': len(self._events),
+                'alarm_regions': len(self._alarms),
+                'alarms_expired': self.alarms_expired,
+                'dedup_keys': len(self._dedup),
+            }
@@ -0,0 +1,514 @@
+"""
+Threat tracking engine: incremental multi-channel correlation of reports.
+
+Each ingested message becomes a report (type, quantity, destroyed, status,
+position/region, channel). A report is correlated with existing tracks
+(fused events) as it arrives:
+
+* candidate tracks come from a spatial grid (~0.5 degree cells, searched
+  only within the type's correlation radius) or, for reports without
+  coordinates, from a per-region index - never a scan of all reports;
+* candidates must be of the same threat type and updated within the type's
+  time window; the nearest/freshest one absorbs the report;
+* otherwise a new track is opened.
+
+Expiry is driven by a heap keyed on each track's idle deadline (lazy
+deletion), so cleanup is O(log n) per expired track, and the number of
+tracks, messages per track and trajectory points are all capped.
+
+Usage:
+    from core.threat_engine import ThreatEngine
+
+    THREAT_ENGINE = ThreatEngine(tz=kyiv_tz)
+    result = THREAT_ENGINE.ingest(message)      # {'action': 'created', 'event_id': 'evt-1', ...}
+    THREAT_ENGINE.active_events()               # serialized tracks
+    THREAT_ENGINE.summary()                     # {'by_type': {'shahed': {'tracks': 3, ...}}, 'by_region': {...}}
+"""
+
+import heapq
+import itertools
+import math
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+from core.threat_counters import classify_threat, message_timestamp
+
+# classify_threat() families -> engine threat types
+TYPE_BY_FAMILY = {'drones': 'shahed', 'missiles': 'cruise', 'kab': 'kab', 'ballistic': 'ballistic'}
+
+CORRELATION_WINDOW = {'shahed': 20 * 60, 'cruise': 8 * 60, 'ballistic': 4 * 60, 'kab': 6 * 60}
+CORRELATION_RADIUS_KM = {'shahed': 45, 'cruise': 120, 'ballistic': 150, 'kab': 40}
+IDLE_TTL = {'shahed': 60 * 60, 'cruise': 25 * 60, 'ballistic': 12 * 60, 'kab': 15 * 60}
+
+CELL_DEG = 0.5
+_KM_PER_DEG_LAT = 111.0
+_KM_PER_DEG_LNG = 74.0  # at ~48N, the middle of Ukraine
+
+_DESTROYED_RE = re.compile(r'(\d+)\s*(?:збит|знищен)|(?:збит[оі]?|знищен[оі]?)\s*(\d+)')
+_COURSE_RE = re.compile(r'курс(?:ом)?\s+на\s+([а-яіїєґ\'\-]+(?:\s+[а-яіїєґ\'\-]+)?)')
+_ENDED_WORDS = ('збит', 'знищен', 'уражен', 'ліквідован', 'перехоплен')
+_PASSED_WORDS = ('пролетів', 'минув', 'пройшов', 'покинув', 'вийшов')
+
+CHANNEL_PRIORITY_DEFAULT = 0.7
+
+
+def _haversine_km(a: tuple, b: tuple) -> float:
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(h))
+
+
+def _cell(lat: float, lng: float) -> tuple[int, int]:
+    return int(math.floor(lat / CELL_DEG)), int(math.floor(lng / CELL_DEG))
+
+
+def _region_key(region: Optional[str]) -> str:
+    if not region:
+        return ''
+    region = region.lower().strip()
+    # "харківська область" / "харківщина" / "харків" share a stem
+    return region[:6]
+
+
+class Report:
+    __slots__ = ('msg_id', 'channel', 'ts', 'threat_type', 'quantity', 'destroyed', 'status',
+                 'coords', 'region', 'direction', 'text', 'route', 'bearing')
+
+    def __init__(self, msg_id, channel, ts, threat_type, quantity, destroyed, status, coords, region, direction, text,
+                 route=None, bearing=None):
+        self.msg_id = msg_id
+        self.channel = channel
+        self.ts = ts
+        self.threat_type = threat_type
+        self.quantity = quantity
+        self.destroyed = destroyed
+        self.status = status
+        self.coords = coords
+        self.region = region
+        self.direction = direction
+        self.text = text
+        self.route = route        # parser trajectory dict with 'start'/'end' (course "з X на Y")
+        self.bearing = bearing    # course bearing in degrees, when the parser derived one
+
+
+def parse_report(msg: dict, ts: float) -> Optional[Report]:
+    """Turn a stored message into a report, or None if it is not a tracked threat."""
+    text = msg.get('text') or ''
+    lower = text.lower()
+    classified = classify_threat(lower)
+    if not classified:
+        return None
+    family, quantity = classified
+    destroyed = 0
+    match = _DESTROYED_RE.search(lower)
+    if match:
+        destroyed = int(match.group(1) or match.group(2))
+    if any(w in lower for w in _ENDED_WORDS):
+        status = 'destroyed' if destroyed == 0 or destroyed >= quantity else 'partially_destroyed'
+    elif any(w in lower for w in _PASSED_WORDS):
+        status = 'passed'
+    else:
+        status = 'active'
+    coords = None
+    try:
+        lat, lng = msg.get('lat'), msg.get('lng')
+        if lat is not None and lng is not None:
+            coords = (float(lat), float(lng))
+    except (TypeError, ValueError):
+        coords = None
+    direction = None
+    trajectory = msg.get('trajectory') or msg.get('enhanced_trajectory')
+    route = trajectory if isinstance(trajectory, dict) and trajectory.get('start') and trajectory.get('end') else None
+    bearing = None
+    try:
+        if msg.get('course_bearing') is not None:
+            bearing = float(msg['course_bearing'])
+    except (TypeError, ValueError):
+        bearing = None
+    if isinstance(trajectory, dict) and trajectory.get('target_name'):
+        direction = trajectory['target_name']
+    else:
+        course = _COURSE_RE.search(lower)
+        if course:
+            direction = course.group(1)
+    return Report(
+        str(msg.get('id') or ''), msg.get('channel') or '', ts, TYPE_BY_FAMILY[family], quantity,
+        destroyed, status, coords, msg.get('region') or msg.get('location') or '', direction, text[:200],
+        route, bearing,
+    )
+
+
+class Track:
+    """A fused event: one threat group seen by one or more channels."""
+
+    __slots__ = ('id', 'threat_type', 'quantity', 'quantity_destroyed', 'status', 'regions', 'direction',
+                 'coords', 'cell', 'region_key', 'trajectory', 'channels', 'messages', 'msg_ids',
+                 'created_at', 'last_update', 'stamp', 'route', 'bearing')
+
+    def __init__(self, track_id: str, report: Report) -> None:
+        self.id = track_id
+        self.threat_type = report.threat_type
+        self.quantity = report.quantity
+        self.quantity_destroyed = report.destroyed
+        self.status = report.status
+        self.regions: list[str] = [report.region] if report.region else []
+        self.direction = report.direction
+        self.coords = report.coords
+        self.cell: Optional[tuple[int, int]] = None
+        self.region_key = ''
+        self.trajectory: list[list] = [[report.coords[0], report.coords[1], report.ts]] if report.coords else []
+        self.channels: dict[str, int] = {}
+        self.messages: list[dict] = []
+        self.msg_ids: list[str] = []
+        self.created_at = report.ts
+        self.last_update = report.ts
+        self.stamp = 0
+        self.route = report.route
+        self.bearing = report.bearing
+
+    def confidence(self, reliability: dict) -> float:
+        if not self.channels:
+            return 0.3
+        weight = sum(reliability.get(ch, CHANNEL_PRIORITY_DEFAULT) for ch in self.channels)
+        return round(min(0.95, 0.35 + 0.2 * weight), 2)
+
+    def to_dict(self, reliability: dict) -> dict:
+        return {
+            'id': self.id,
+            'threat_type': self.threat_type,
+            'quantity': self.quantity,
+            'quantity_destroyed': self.quantity_destroyed,
+            'quantity_remaining': max(0, self.quantity - self.quantity_destroyed),
+            'regions': list(self.regions),
+            'direction': self.direction,
+            'status': self.status,
+            'confidence': self.confidence(reliability),
+            'coordinates': list(self.coords) if self.coords else None,
+            'trajectory_points': len(self.trajectory),
+            'source_count': len(self.channels),
+            'sources': list(self.channels),
+            'created_at': self.created_at,
+            'last_update': self.last_update,
+        }
+
+
+class ThreatEngine:
+    """Single tracking engine behind /api/threats and /api/fusion/*."""
+
+    def __init__(
+        self,
+        tz=None,
+        max_tracks: int = 2000,
+        max_messages_per_track: int = 20,
+        max_points_per_track: int = 50,
+        channel_reliability: Optional[dict] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._tz = tz
+        self._clock = clock
+        self.max_tracks = max_tracks
+        self.max_messages_per_track = max_messages_per_track
+        self.max_points_per_track = max_points_per_track
+        self.channel_reliability: dict[str, float] = dict(channel_reliability or {})
+        self._tracks: dict[str, Track] = {}
+        self._grid: dict[tuple[str, int, int], set] = {}
+        self._by_region: dict[tuple[str, str], set] = {}
+        self._expiry: list[tuple[float, int, str]] = []  # (deadline, stamp, track id)
+        self._msg_to_track: dict[str, str] = {}
+        self._alarmed_keys: set = set()
+        self._ids = itertools.count(1)
+        self._stamps = itertools.count(1)
+        self._lock = threading.RLock()
+        self._listeners: list[Callable[[Track, bool], None]] = []
+        self.version = 0
+        self.reports = 0
+        self.correlated = 0
+        self.expired = 0
+
+    def subscribe(self, fn: Callable[[Track, bool], None]) -> None:
+        """``fn(track, removed)`` runs under the engine lock after every track change."""
+        self._listeners.append(fn)
+
+    def _notify(self, track: Track, removed: bool = False) -> None:
+        for fn in self._listeners:
+            fn(track, removed)
+
+    # ----- Indexes -----
+    def _index(self, track: Track) -> None:
+        if track.coords:
+            cell = _cell(*track.coords)
+            if cell != track.cell:
+                self._unindex_cell(track)
+                track.cell = cell
+                self._grid.setdefault((track.threat_type, *cell), set()).add(track.id)
+        key = _region_key(track.regions[-1]) if track.regions else ''
+        if key and key != track.region_key:
+            self._unindex_region(track)
+            track.region_key = key
+            self._by_region.setdefault((track.threat_type, key), set()).add(track.id)
+        track.stamp = next(self._stamps)
+        deadline = track.last_update + IDLE_TTL.get(track.threat_type, 30 * 60)
+        heapq.heappush(self._expiry, (deadline, track.stamp, track.id))
+
+    def _unindex_cell(self, track: Track) -> None:
+        if track.cell is None:
+            return
+        bucket = self._grid.get((track.threat_type, *track.cell))
+        if bucket is not None:
+            bucket.discard(track.id)
+            if not bucket:
+                del self._grid[(track.threat_type, *track.cell)]
+        track.cell = None
+
+    def _unindex_region(self, track: Track) -> None:
+        if not track.region_key:
+            return
+        bucket = self._by_region.get((track.threat_type, track.region_key))
+        if bucket is not None:
+            bucket.discard(track.id)
+            if not bucket:
+                del self._by_region[(track.threat_type, track.region_key)]
+        track.region_key = ''
+
+    def _remove(self, track: Track) -> None:
+        self._unindex_cell(track)
+        self._unindex_region(track)
+        for msg_id in track.msg_ids:
+            if self._msg_to_track.get(msg_id) == track.id:
+                del self._msg_to_track[msg_id]
+        del self._tracks[track.id]
+        self.version += 1
+        self._notify(track, removed=True)
+
+    def _expire(self, now: float) -> int:
+        removed = 0
+        while self._expiry and (self._expiry[0][0] <= now or len(self._tracks) > self.max_tracks):
+            _deadline, stamp, track_id = heapq.heappop(self._expiry)
+            track = self._tracks.get(track_id)
+            if track is None or track.stamp != stamp:
+                continue  # superseded heap entry
+            self._remove(track)
+            removed += 1
+        self.expired += removed
+        # Heap holds one stale entry per track update; compact when it gets loose
+        if len(self._expiry) > 4 * max(64, len(self._tracks)):
+            self._expiry = [(d, s, t) for d, s, t in self._expiry
+                            if t in self._tracks and self._tracks[t].stamp == s]
+            heapq.heapify(self._expiry)
+        return removed
+
+    # ----- Correlation -----
+    def _candidates(self, report: Report) -> set:
+        ids: set = set()
+        if report.coords:
+            radius = CORRELATION_RADIUS_KM.get(report.threat_type, 50)
+            rings_lat = math.ceil(radius / (_KM_PER_DEG_LAT * CELL_DEG))
+            rings_lng = math.ceil(radius / (_KM_PER_DEG_LNG * CELL_DEG))
+            clat, clng = _cell(*report.coords)
+            for dlat in range(-rings_lat, rings_lat + 1):
+                for dlng in range(-rings_lng, rings_lng + 1):
+                    bucket = self._grid.get((report.threat_type, clat + dlat, clng + dlng))
+                    if bucket:
+                        ids.update(bucket)
+        key = _region_key(report.region)
+        if key:
+            bucket = self._by_region.get((report.threat_type, key))
+            if bucket:
+                ids.update(bucket)
+        return ids
+
+    def _best_match(self, report: Report) -> Optional[Track]:
+        window = CORRELATION_WINDOW.get(report.threat_type, 10 * 60)
+        radius = CORRELATION_RADIUS_KM.get(report.threat_type, 50)
+        key = _region_key(report.region)
+        best, best_score = None, None
+        for track_id in self._candidates(report):
+            track = self._tracks[track_id]
+            age = abs(report.ts - track.last_update)
+            if age > window:
+                continue
+            if report.coords and track.coords:
+                distance = _haversine_km(report.coords, track.coords)
+                if distance > radius:
+                    continue
+                score = distance / radius + age / window
+            elif key and key == track.region_key:
+                score = 1.0 + age / window
+            else:
+                continue
+            if best_score is None or score < best_score:
+                best, best_score = track, score
+        return best
+
+    def _merge(self, track: Track, report: Report) -> None:
+        track.quantity = max(track.quantity, report.quantity)
+        track.quantity_destroyed = max(track.quantity_destroyed, report.destroyed)
+        if report.status != 'active':
+            track.status = report.status
+        elif track.status == 'passed':
+            track.status = 'active'
+        if track.quantity_destroyed and track.quantity_destroyed >= track.quantity:
+            track.status = 'destroyed'
+        if report.region and (not track.regions or track.regions[-1] != report.region):
+            track.regions.append(report.region)
+            if len(track.regions) > 10:
+                del track.regions[0]
+        if report.direction:
+            track.direction = report.direction
+        if report.route:
+            track.route = report.route
+        if report.bearing is not None:
+            track.bearing = report.bearing
+        if report.coords and report.coords != track.coords:
+            track.coords = report.coords
+            track.trajectory.append([report.coords[0], report.coords[1], report.ts])
+            if len(track.trajectory) > self.max_points_per_track:
+                del track.trajectory[0]
+        track.last_update = max(track.last_update, report.ts)
+
+    def _attach(self, track: Track, report: Report) -> None:
+        track.channels[report.channel] = track.channels.get(report.channel, 0) + 1
+        track.messages.append({'id': report.msg_id, 'channel': report.channel, 'ts': report.ts, 'text': report.text})
+        if len(track.messages) > self.max_messages_per_track:
+            del track.messages[0]
+        if report.msg_id:
+            track.msg_ids.append(report.msg_id)
+            self._msg_to_track[report.msg_id] = track.id
+            if len(track.msg_ids) > 10 * self.max_messages_per_track:
+                dropped = track.msg_ids.pop(0)
+                if self._msg_to_track.get(dropped) == track.id:
+                    del self._msg_to_track[dropped]
+
+    # ----- Public API -----
+    def ingest(self, msg: dict, ts: Optional[float] = None) -> Optional[dict]:
+        """Correlate one message; returns ``{'action', 'event_id', ...}`` or None."""
+        if not isinstance(msg, dict):
+            return None
+        now = self._clock()
+        if ts is None:
+            ts = message_timestamp(msg, self._tz, now)
+            if ts is None:
+                ts = now
+        ts = min(ts, now)
+        report = parse_report(msg, ts)
+        if report is None:
+            return None
+        with self._lock:
+            self._expire(now)
+            if ts + IDLE_TTL.get(report.threat_type, 30 * 60) <= now:
+                return None  # already stale (e.g. seeding from old messages)
+            if report.msg_id and report.msg_id in self._msg_to_track:
+                return {'action': 'duplicate', 'event_id': self._msg_to_track[report.msg_id]}
+            self.reports += 1
+            track = self._best_match(report)
+            if track is not None:
+                self._merge(track, report)
+                action = 'updated'
+                self.correlated += 1
+            else:
+                track = Track(f"evt-{next(self._ids)}", report)
+                self._tracks[track.id] = track
+                action = 'created'
+            self._attach(track, report)
+            self._index(track)
+            self.version += 1
+            self._notify(track)
+            if len(self._tracks) > self.max_tracks:
+                self._expire(now)
+            return {'action': action, 'event_id': track.id, 'threat_type': track.threat_type,
+                    'sources': len(track.channels)}
+
+    def seed(self, messages: list) -> 'ThreatEngine':
+        for msg in messages:
+            self.ingest(msg)
+        return self
+
+    def close_regions(self, alarmed_regions, grace_seconds: float = 300) -> int:
+        """Drop tracks in regions whose air alarm has just been lifted.
+
+        Only regions that were alarmed on the previous call are considered, so
+        region names that never appear in the alarm feed (cities, raions) are
+        left to idle expiry.
+        """
+        now = self._clock()
+        alarmed = {_region_key(r) for r in alarmed_regions if r}
+        removed = 0
+        with self._lock:
+            lifted = self._alarmed_keys - alarmed
+            self._alarmed_keys = alarmed
+            for key in [k for k in self._by_region if k[1] in lifted]:
+                for track_id in list(self._by_region.get(key, ())):
+                    track = self._tracks.get(track_id)
+                    if track is not None and now - track.last_update > grace_seconds:
+                        self._remove(track)
+                        removed += 1
+        return removed
+
+    def cleanup(self, max_age_seconds: Optional[float] = None) -> int:
+        now = self._clock()
+        with self._lock:
+            removed = self._expire(now)
+            if max_age_seconds is not None:
+                for track in [t for t in self._tracks.values() if now - t.last_update > max_age_seconds]:
+                    self._remove(track)
+                    removed += 1
+        return removed
+
+    def active_tracks(self) -> list[Track]:
+        with self._lock:
+            self._expire(self._clock())
+            return list(self._tracks.values())
+
+    def active_events(self) -> list[dict]:
+        with self._lock:
+            self._expire(self._clock())
+            events = [t.to_dict(self.channel_reliability) for t in self._tracks.values()]
+        events.sort(key=lambda e: e['last_update'], reverse=True)
+        return events
+
+    def summary(self) -> dict:
+        """Per-type totals over active (not destroyed) tracks."""
+        out: dict[str, dict] = {}
+        by_region: dict[str, dict] = {}
+        with self._lock:
+            self._expire(self._clock())
+            for track in self._tracks.values():
+                remaining = max(0, track.quantity - track.quantity_destroyed)
+                entry = out.setdefault(track.threat_type, {'tracks': 0, 'quantity': 0, 'remaining': 0,
+                                                           'destroyed': 0, 'since': track.created_at})
+                entry['tracks'] += 1
+                entry['quantity'] += track.quantity
+                entry['destroyed'] += track.quantity_destroyed
+                entry['since'] = min(entry['since'], track.created_at)
+                if track.status in ('active', 'partially_destroyed'):
+                    entry['remaining'] += remaining
+                    if track.regions:
+                        region = by_region.setdefault(track.regions[-1], {})
+                        region[track.threat_type] = region.get(track.threat_type, 0) + remaining
+        return {'by_type': out, 'by_region': by_region}
+
+    def event_for_message(self, msg_id: str) -> Optional[str]:
+        with self._lock:
+            return self._msg_to_track.get(str(msg_id))
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_channel: dict[str, int] = {}
+            for track in self._tracks.values():
+                for ch, n in track.channels.items():
+                    by_channel[ch] = by_channel.get(ch, 0) + n
+            return {
+                'tracks': len(self._tracks),
+                'messages_indexed': len(self._msg_to_track),
+                'grid_cells': len(self._grid),
+                'region_keys': len(self._by_region),
+                'heap_entries': len(self._expiry),
+                'reports': self.reports,
+                'correlated': self.correlated,
+                'expired': self.expired,
+                'version': self.version,
+                'by_channel': by_channel,
+            }
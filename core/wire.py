@@ -0,0 +1,373 @@
+"""
+Compact MessagePack encoding of the map payloads, next to the JSON.
+
+Clients opt in with ``Accept: application/msgpack`` (or ``?format=msgpack``).
+Items are encoded against integer-keyed :class:`Schema` layouts instead of
+repeating field names: timestamps become epoch seconds, coordinates become
+fixed-point integers (1e-5 degree, ~1 m) and empty fields are left out.
+Fields a schema does not list are not sent. The layouts are published
+(:func:`describe`) so the Flutter app and the web map decode by tag.
+
+Encoding uses the ``msgpack`` package when it is installed and a small
+built-in packer otherwise (identical bytes, just slower).
+
+Usage:
+    from core.wire import DOCUMENTS, encode, negotiate
+
+    if negotiate(request.headers.get('Accept', ''), request.args.get('format')) == 'msgpack':
+        body = encode(DOCUMENTS['data'], response_data)   # cache it next to the JSON
+"""
+
+import struct
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pytz
+except ImportError:
+    pytz = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+MSGPACK_TYPES = frozenset({'application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack'})
+SCHEMA_VERSION = 1
+COORD_SCALE = 100000
+
+_KYIV = pytz.timezone('Europe/Kyiv') if pytz is not None else None
+_TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M')
+
+
+# ----- Negotiation -----
+def negotiate(accept: str, format_arg: Optional[str] = None) -> str:
+    """``'msgpack'`` when the client asks for it (``?format=`` wins over Accept), else ``'json'``."""
+    if format_arg:
+        return 'msgpack' if format_arg.lower() in ('msgpack', 'mp') else 'json'
+    for part in (accept or '').lower().split(','):
+        media, _, params = part.partition(';')
+        if media.strip() not in MSGPACK_TYPES:
+            continue
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        return 'msgpack'
+    return 'json'
+
+
+# ----- Field conversions -----
+def epoch_seconds(value: Any) -> Optional[int]:
+    """Stored dates are Kyiv local time ('YYYY-mm-dd HH:MM:SS'); ISO strings may carry an offset."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value)
+    try:
+        dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        dt = None
+        for fmt in _TIME_FORMATS:
+            try:
+                dt = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+        if dt is None:
+            return None
+    if dt.tzinfo is None:
+        dt = _KYIV.localize(dt) if _KYIV is not None else dt.astimezone()
+    return int(dt.timestamp())
+
+
+def fixed_point(value: Any) -> int:
+    return int(round(float(value) * COORD_SCALE))
+
+
+def _number(value: Any):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else float(value)
+
+
+_CONVERT: dict[str, Callable[[Any], Any]] = {
+    'str': str,
+    'int': int,
+    'num': _number,
+    'bool': bool,
+    'time': epoch_seconds,
+    'coord': fixed_point,
+    'raw': lambda v: v,
+}
+
+
+class Schema:
+    """Integer-keyed item layout; ``fields`` is ``[(tag, name, kind), ...]``."""
+
+    __slots__ = ('name', 'fields', '_compiled')
+
+    def __init__(self, name: str, fields: list[tuple[int, str, str]]) -> None:
+        self.name = name
+        self.fields = fields
+        self._compiled = [(tag, field, _CONVERT[kind]) for tag, field, kind in fields]
+
+    def encode(self, item: dict) -> dict:
+        out = {}
+        for tag, field, convert in self._compiled:
+            value = item.get(field)
+            if value is None or value == '' or value is False or value == []:
+                continue
+            try:
+                value = convert(value)
+            except (TypeError, ValueError):
+                continue
+            if value is not None:
+                out[tag] = value
+        return out
+
+    def decode(self, item: dict) -> dict:
+        """Inverse of :meth:`encode` for checks: field names back, coordinates in degrees, times stay epoch."""
+        names = {tag: (field, kind) for tag, field, kind in self.fields}
+        out = {}
+        for tag, value in item.items():
+            field, kind = names[int(tag)]
+            out[field] = value / COORD_SCALE if kind == 'coord' else value
+        return out
+
+    def describe(self) -> dict:
+        return {str(tag): [field, kind] for tag, field, kind in self.fields}
+
+
+class Document:
+    """Top-level layout: tag -> (key in the JSON payload, item schema or None for plain values)."""
+
+    __slots__ = ('name', 'parts', 'root_list')
+
+    def __init__(self, name: str, parts: Optional[list[tuple[int, str, Optional[Schema]]]] = None,
+                 root_list: Optional[Schema] = None) -> None:
+        self.name = name
+        self.parts = parts or []
+        self.root_list = root_list   # payload is a bare list of items
+
+    def compact(self, payload: Any) -> dict:
+        if self.root_list is not None:
+            return {0: SCHEMA_VERSION, 1: [self.root_list.encode(i) for i in payload if isinstance(i, dict)]}
+        out: dict[int, Any] = {0: SCHEMA_VERSION}
+        for tag, key, schema in self.parts:
+            value = payload.get(key)
+            if value is None:
+                continue
+            if schema is None:
+                out[tag] = value
+            elif isinstance(value, list):
+                out[tag] = [schema.encode(i) for i in value if isinstance(i, dict)]
+            elif isinstance(value, dict):
+                out[tag] = schema.encode(value)
+        return out
+
+    def describe(self) -> dict:
+        if self.root_list is not None:
+            return {'1': [None, self.root_list.name]}
+        return {str(tag): [key, schema.name if schema else None] for tag, key, schema in self.parts}
+
+
+# ----- Layouts -----
+MARKER = Schema('marker', [
+    (1, 'id', 'str'), (2, 'lat', 'coord'), (3, 'lng', 'coord'), (4, 'date', 'time'),
+    (5, 'threat_type', 'str'), (6, 'place', 'str'), (7, 'count', 'int'), (8, 'marker_icon', 'str'),
+    (9, 'channel', 'str'), (10, 'text', 'str'), (12, 'source', 'str'),
+    (13, 'target', 'str'), (14, 'manual', 'bool'), (15, 'list_only', 'bool'), (16, 'ttl_expires', 'num'),
+    (17, 'oblast', 'str'), (18, 'trajectory', 'raw'), (19, 'course_direction', 'str'),
+    (20, 'course_source', 'str'), (21, 'course_target', 'str'), (22, 'course_type', 'str'),
+    (23, 'course_bearing', 'num'), (24, 'rotation', 'num'),
+])  # tag 11 (old 'direction') is retired, do not reuse
+EVENT = Schema('event', [
+    (1, 'id', 'str'), (2, 'date', 'time'), (3, 'timestamp', 'time'), (4, 'channel', 'str'),
+    (5, 'region', 'str'), (6, 'status', 'str'), (7, 'emoji', 'str'), (8, 'text', 'str'),
+    (9, 'place', 'str'), (10, 'threat_type', 'str'), (11, 'list_only', 'bool'),
+])
+ALARM_REGION = Schema('alarm_region', [
+    (1, 'regionId', 'str'), (2, 'regionName', 'str'), (3, 'regionType', 'str'), (4, 'activeAlerts', 'raw'),
+])
+DATA_META = Schema('data_meta', [
+    (1, 'tracks_total', 'int'), (2, 'tracks_returned', 'int'), (3, 'tracks_truncated', 'bool'),
+    (4, 'events_total', 'int'), (5, 'events_returned', 'int'), (6, 'events_truncated', 'bool'),
+    (7, 'time_range_minutes', 'int'), (8, 'emergency_truncated', 'bool'),
+])
+
+DOCUMENTS = {
+    'data': Document('data', [
+        (1, 'tracks', MARKER), (2, 'events', EVENT), (3, 'all_sources', None),
+        (4, 'ballistic_threat', None), (5, 'threat_tracking', None), (6, '_meta', DATA_META),
+    ]),
+    'events': Document('events', root_list=EVENT),
+    'alarms': Document('alarms', root_list=ALARM_REGION),
+}
+SCHEMAS = {s.name: s for s in (MARKER, EVENT, ALARM_REGION, DATA_META)}
+
+
+def describe() -> dict:
+    """Tag tables for clients (served as JSON)."""
+    return {
+        'version': SCHEMA_VERSION,
+        'coord_scale': COORD_SCALE,
+        'time': 'epoch seconds',
+        'documents': {name: doc.describe() for name, doc in DOCUMENTS.items()},
+        'schemas': {name: schema.describe() for name, schema in SCHEMAS.items()},
+    }
+
+
+# ----- MessagePack -----
+def _pack(obj: Any, out: bytearray) -> None:
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True:
+        out.append(0xc3)
+    elif obj is False:
+        out.append(0xc2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif obj >= 0:
+            for limit, code, fmt in ((0xff, 0xcc, '>B'), (0xffff, 0xcd, '>H'), (0xffffffff, 0xce, '>I')):
+                if obj <= limit:
+                    out.append(code)
+                    out += struct.pack(fmt, obj)
+                    return
+            out.append(0xcf)
+            out += struct.pack('>Q', obj)
+        else:
+            for limit, code, fmt in ((-0x80, 0xd0, '>b'), (-0x8000, 0xd1, '>h'), (-0x80000000, 0xd2, '>i')):
+                if obj >= limit:
+                    out.append(code)
+                    out += struct.pack(fmt, obj)
+                    return
+            out.append(0xd3)
+            out += struct.pack('>q', obj)
+    elif isinstance(obj, float):
+        out.append(0xcb)
+        out += struct.pack('>d', obj)
+    elif isinstance(obj, str):
+        raw = obj.encode('utf-8')
+        n = len(raw)
+        if n < 32:
+            out.append(0xa0 | n)
+        elif n <= 0xff:
+            out += bytes((0xd9, n))
+        elif n <= 0xffff:
+            out.append(0xda)
+            out += struct.pack('>H', n)
+        else:
+            out.append(0xdb)
+            out += struct.pack('>I', n)
+        out += raw
+    elif isinstance(obj, (bytes, bytearray)):
+        n = len(obj)
+        if n <= 0xff:
+            out += bytes((0xc4, n))
+        elif n <= 0xffff:
+            out.append(0xc5)
+            out += struct.pack('>H', n)
+        else:
+            out.append(0xc6)
+            out += struct.pack('>I', n)
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n <= 0xffff:
+            out.append(0xdc)
+            out += struct.pack('>H', n)
+        else:
+            out.append(0xdd)
+            out += struct.pack('>I', n)
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n <= 0xffff:
+            out.append(0xde)
+            out += struct.pack('>H', n)
+        else:
+            out.append(0xdf)
+            out += struct.pack('>I', n)
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        _pack(str(obj), out)
+
+
+def packb(obj: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True, default=str)
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def _unpack(data: bytes, pos: int) -> tuple[Any, int]:
+    code = data[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xe0:
+        return code - 0x100, pos
+    if 0x80 <= code <= 0x8f or code in (0xde, 0xdf):
+        if code <= 0x8f:
+            n = code & 0x0f
+        else:
+            size = 2 if code == 0xde else 4
+            n, pos = int.from_bytes(data[pos:pos + size], 'big'), pos + size
+        out = {}
+        for _ in range(n):
+            key, pos = _unpack(data, pos)
+            out[key], pos = _unpack(data, pos)
+        return out, pos
+    if 0x90 <= code <= 0x9f or code in (0xdc, 0xdd):
+        if code <= 0x9f:
+            n = code & 0x0f
+        else:
+            size = 2 if code == 0xdc else 4
+            n, pos = int.from_bytes(data[pos:pos + size], 'big'), pos + size
+        items = []
+        for _ in range(n):
+            item, pos = _unpack(data, pos)
+            items.append(item)
+        return items, pos
+    if 0xa0 <= code <= 0xbf or code in (0xd9, 0xda, 0xdb, 0xc4, 0xc5, 0xc6):
+        if code <= 0xbf:
+            n = code & 0x1f
+        else:
+            size = {0xd9: 1, 0xda: 2, 0xdb: 4, 0xc4: 1, 0xc5: 2, 0xc6: 4}[code]
+            n, pos = int.from_bytes(data[pos:pos + size], 'big'), pos + size
+        raw = bytes(data[pos:pos + n])
+        return (raw if code in (0xc4, 0xc5, 0xc6) else raw.decode('utf-8')), pos + n
+    if code in (0xc0, 0xc2, 0xc3):
+        return {0xc0: None, 0xc2: False, 0xc3: True}[code], pos
+    fixed = {0xca: '>f', 0xcb: '>d', 0xcc: '>B', 0xcd: '>H', 0xce: '>I', 0xcf: '>Q',
+             0xd0: '>b', 0xd1: '>h', 0xd2: '>i', 0xd3: '>q'}
+    if code in fixed:
+        fmt = fixed[code]
+        size = struct.calcsize(fmt)
+        return struct.unpack(fmt, data[pos:pos + size])[0], pos + size
+    raise ValueError(f'unsupported msgpack type 0x{code:02x} at {pos - 1}')
+
+
+def unpackb(data: bytes) -> Any:
+    """Decode a body produced by :func:`packb` (checks and benchmarks; clients use their own decoder)."""
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    value, _ = _unpack(data, 0)
+    return value
+
+
+def encode(document: Document, payload: Any) -> bytes:
+    return packb(document.compact(payload))
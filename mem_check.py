@@ -32,7 +32,6 @@ objects_to_check = [
     'UKRAINE_ADDRESSES_DB',
     'UKRAINE_CITIES',
     'REGION_MAPPING',
-    'request_counts',
     '_groq_cache',
     '_mapstransler_geocode_cache',
     'ACTIVE_VISITORS',
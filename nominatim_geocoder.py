@@ -10,6 +10,7 @@ import os
 
 # Cache file
 NOMINATIM_CACHE_FILE = 'nominatim_cache.json'
+NOMINATIM_URL = os.environ.get('NOMINATIM_URL', 'https://nominatim.openstreetmap.org/search')
 NOMINATIM_CACHE_TTL = 60 * 60 * 24 * 30  # 30 days
 
 _nominatim_cache = None
@@ -95,7 +96,7 @@ def get_coordinates_nominatim(city_name: str, region: str = None):
     queries.append(f"{city_name}, Україна")
     queries.append(f"{city_name}, Ukraine")
     
-    url = 'https://nominatim.openstreetmap.org/search'
+    url = NOMINATIM_URL
     headers = {
         'User-Agent': 'NeptunAlarm/2.0 (https://neptun.in.ua; contact@neptun.in.ua)'
     }
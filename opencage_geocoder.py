@@ -7,9 +7,11 @@ OpenCage Geocoder with MAXIMUM economy mode
 
 import json
 import os
+import threading
 import requests
 
 OPENCAGE_API_KEY = os.environ.get('OPENCAGE_API_KEY', 'c30fbe219d5d49ada3657da3326ca9b7')
+OPENCAGE_URL = os.environ.get('OPENCAGE_URL', 'https://api.opencagedata.com/geocode/v1/json')
 
 # Hardcoded coordinates for ambiguous cities that confuse geocoder
 # These override geocoder results to prevent wrong locations
@@ -28,9 +30,11 @@ def _get_cache_path(filename):
 CACHE_FILE = _get_cache_path('geocode_cache.json')
 NEGATIVE_CACHE_FILE = _get_cache_path('geocode_cache_negative.json')
 
-# Global caches
+# Global caches (loaded lazily on first use, see ensure_cache_loaded)
 _cache = {}  # city_key -> (lat, lon)
 _negative_cache = set()  # city_keys that were not found
+_cache_loaded = False
+_cache_load_lock = threading.Lock()
 
 # Stats
 _stats = {'hits': 0, 'misses': 0, 'api_calls': 0}
@@ -194,6 +198,17 @@ def _load_cache():
         _negative_cache = set()
 
 
+def ensure_cache_loaded() -> int:
+    """Load caches from disk once. Returns number of cached cities."""
+    global _cache_loaded
+    if not _cache_loaded:
+        with _cache_load_lock:
+            if not _cache_loaded:
+                _load_cache()
+                _cache_loaded = True
+    return len(_cache)
+
+
 def _save_cache():
     """Save positive cache to disk"""
     try:
@@ -276,7 +291,7 @@ def _call_api(city: str, region: str = None) -> tuple:
     print(f"[OPENCAGE] API call #{_stats['api_calls']}: '{query}'", flush=True)
     
     try:
-        url = "https://api.opencagedata.com/geocode/v1/json"
+        url = OPENCAGE_URL
         params = {
             'q': query,
             'key': OPENCAGE_API_KEY,
@@ -354,6 +369,7 @@ def geocode(city: str, region: str = None) -> tuple:
     cache_key = _normalize_key(city, region)
     if not cache_key:
         return None
+    ensure_cache_loaded()
     
     # === STEP 0: Check hardcoded coordinates (for ambiguous cities) ===
     if cache_key in HARDCODED_COORDS:
@@ -391,6 +407,7 @@ def geocode(city: str, region: str = None) -> tuple:
 
 def get_cache_stats() -> dict:
     """Get geocoding statistics"""
+    ensure_cache_loaded()
     return {
         'cached': len(_cache),
         'negative_cached': len(_negative_cache),
@@ -402,6 +419,7 @@ def get_cache_stats() -> dict:
 
 def preload_from_dict(coords_dict: dict):
     """Preload cache from existing coordinates dictionary (e.g., CITY_COORDS)"""
+    ensure_cache_loaded()
     count = 0
     for key, coords in coords_dict.items():
         if coords and isinstance(coords, (tuple, list)) and len(coords) >= 2:
@@ -413,6 +431,3 @@ def preload_from_dict(coords_dict: dict):
         _save_cache()
         print(f"[OPENCAGE] Preloaded {count} entries from existing coords", flush=True)
 
-
-# Load cache on module import
-_load_cache()
@@ -0,0 +1,43 @@
+"""Region polygons (core.geometry): interior points resolve, border towns are known to drift."""
+import os
+
+import pytest
+
+from core.geometry import RegionGeometry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILES = [os.path.join(ROOT, 'static', name) for name in (
+    'ukraine_states.svg', 'ukraine_districts_detailed.svg', 'geoBoundaries-UKR-ADM0_simplified.geojson')]
+
+
+@pytest.fixture(scope='module')
+def geo():
+    return RegionGeometry.from_files(*FILES)
+
+
+@pytest.mark.parametrize('lat, lng, oblast', [
+    (50.45, 30.52, 'м. Київ'),
+    (49.84, 24.03, 'Львівська область'),
+    (49.99, 36.23, 'Харківська область'),
+    (46.48, 30.72, 'Одеська область'),
+    (49.59, 34.55, 'Полтавська область'),
+    (50.25, 28.66, 'Житомирська область'),
+])
+def test_oblast_centres(geo, lat, lng, oblast):
+    assert geo.locate(lat, lng)['oblast'] == oblast
+
+
+def test_outside_ukraine(geo):
+    assert geo.locate(43.0, 32.0) is None
+
+
+@pytest.mark.parametrize('lat, lng, wrong', [
+    (50.51, 30.79, 'м. Київ'),                  # Бровари (Київська область)
+    (50.51, 30.60, 'Київська область'),         # Троєщина (м. Київ)
+    (47.50, 34.65, 'Дніпропетровська область'), # Енергодар (Запорізька область)
+    (49.05, 33.24, 'Полтавська область'),       # Світловодськ (Кіровоградська область)
+    (48.51, 26.49, 'Хмельницька область'),      # Хотин (Чернівецька область)
+])
+def test_border_towns_drift(geo, lat, lng, wrong):
+    """Why push routing does not trust the polygons: the simplified map borders misplace these."""
+    assert geo.locate(lat, lng)['oblast'] == wrong
@@ -0,0 +1,19 @@
+"""process_message still produces the recorded output for the seed corpus (offline)."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('flask')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'benchmarks', 'parser_corpus.py')
+CORPUS = os.path.join(ROOT, 'benchmarks', 'corpus', 'parser.jsonl')
+
+
+def test_corpus_unchanged():
+    proc = subprocess.run([sys.executable, SCRIPT, 'check', '--corpus', CORPUS, '--show', '5', '--slowest', '0'],
+                          capture_output=True, text=True, timeout=600)
+    assert proc.returncode == 0, proc.stdout[-4000:] + proc.stderr[-2000:]
+    assert ' 0 differ' in proc.stdout
@@ -0,0 +1,36 @@
+"""Push routing resolves the oblast from names; the region polygons never decide it."""
+import pytest
+
+pytest.importorskip('flask')
+
+import app as neptun  # noqa: E402
+
+
+@pytest.fixture(scope='module', autouse=True)
+def geometry_loaded():
+    neptun.STARTUP.get('region_geometry')
+
+
+@pytest.mark.parametrize('place, oblast_id', [
+    ('Бровари', 'UA-32'),
+    ('м. Бориспіль', 'UA-32'),
+    ('Вишгород (Київська обл.)', 'UA-32'),
+    ('Київ', 'UA-30'),
+    ('Троєщина', 'UA-30'),
+])
+def test_settlement_oblast_id(place, oblast_id):
+    assert neptun.settlement_oblast_id(place) == oblast_id
+
+
+@pytest.mark.parametrize('place, coords, oblast_id', [
+    ('Бровари', (50.51, 30.79), 'UA-32'),   # polygons: м. Київ
+    ('Троєщина', (50.51, 30.60), 'UA-30'),  # polygons: Київська область
+    ('Київ', (50.45, 30.52), 'UA-30'),
+])
+def test_names_win_over_polygons(place, coords, oblast_id):
+    assert neptun.get_region_ids_from_place(place, '', coords)[0] == oblast_id
+
+
+@pytest.mark.parametrize('coords', [(47.50, 34.65), (49.05, 33.24), (48.51, 26.49)])
+def test_unknown_place_is_not_routed_by_polygons(coords):
+    assert neptun.get_region_ids_from_place('Невідоме поселення', '', coords) == (None, None)